@@ -0,0 +1,189 @@
+"""Allocations and time per command dispatch: per-message command objects vs shared handlers.
+
+The "per-message" side mirrors how commands used to be dispatched, a command object built for
+every message from the event data and the bot's services, restriction checked afterwards.
+
+Run with `python -m benchmarks.bench_command_dispatch --messages 100000` from the root of the repo.
+"""
+import argparse
+import time
+import tracemalloc
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping
+
+from chatbot.commands import (
+    AddZodiacSignCommand,
+    BaseCommand,
+    CommandContext,
+    SayHelloCommand,
+    SetTodayCommand,
+)
+from chatbot.storage import InMemoryDbConnector
+
+ELEVATED_BADGES = {"broadcaster"}
+SERVICES: Dict[str, Any] = {
+    name: object()
+    for name in [
+        "unknown_commands",
+        "drop_results",
+        "activity",
+        "plugins",
+        "flood_filter",
+        "load_shedder",
+        "announcements",
+        "user_profiles",
+        "horoscopes",
+        "channel_lookups",
+    ]
+}
+
+
+class Config:
+    channel = "datafrittata"
+
+
+class PerMessageSayHelloCommand:
+    def __init__(self, db_connector, config, user_name: str, **kwargs):
+        self.db_connector = db_connector
+        self.config = config
+        self.user_name = user_name
+
+    @property
+    def is_restricted(self):
+        return False
+
+    def run(self):
+        return f"Welcome to the stream, {self.user_name}"
+
+
+class PerMessageSetTodayCommand:
+    def __init__(self, db_connector, config, command_input: str, **kwargs):
+        self.db_connector = db_connector
+        self.config = config
+        self.today_text = command_input
+
+    @property
+    def is_restricted(self):
+        return True
+
+    def run(self):
+        self.db_connector.update_command(command_name="today", command_response=self.today_text)
+
+
+class PerMessageAddZodiacSignCommand:
+    def __init__(self, db_connector, config, command_input: str, **kwargs):
+        self.db_connector = db_connector
+        self.config = config
+        self.user_id = kwargs.get("user_id")
+        self.user_sign = command_input.lower()
+        self.acceptable_signs = [
+            "aquarius",
+            "pisces",
+            "aries",
+            "taurus",
+            "gemini",
+            "cancer",
+            "leo",
+            "virgo",
+            "libra",
+            "scorpio",
+            "sagittarius",
+            "capricorn",
+        ]
+
+    @property
+    def is_restricted(self):
+        return False
+
+    def run(self):
+        if self.user_sign in self.acceptable_signs:
+            self.db_connector.update_user_sign(user_id=self.user_id, zodiac_sign=self.user_sign)
+        else:
+            return f"{self.user_sign} is not a valid zodiac sign"
+
+
+def per_message_dispatch(command_class, connector, event_data, badges: List[str]):
+    command = command_class(connector, Config, **event_data, **SERVICES)
+    if command.is_restricted and not set(badges).intersection(ELEVATED_BADGES):
+        return None
+    return command.run()
+
+
+def shared_handler_dispatch(
+    command: BaseCommand, connector, event_data, badges: List[str], services: Mapping[str, Any]
+):
+    if command.is_restricted and ELEVATED_BADGES.isdisjoint(badges):
+        return None
+    context = CommandContext(
+        connector,
+        Config,  # type: ignore
+        command_name=event_data["command_name"],
+        command_input=event_data["command_input"],
+        user_name=event_data["user_name"],
+        user_id=event_data["user_id"],
+        services=services,
+    )
+    return command.run(context)
+
+
+def measure(label: str, dispatch: Callable[[], object], n_messages: int) -> None:
+    # peak traced memory above the baseline while a single dispatch runs, averaged.
+    tracemalloc.start()
+    peaks = 0
+    for _ in range(n_messages):
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        dispatch()
+        peaks += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(n_messages):
+        dispatch()
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<52} {peaks / n_messages:>8.0f} B/dispatch "
+        f"{elapsed / n_messages * 1e6:>8.2f} us/dispatch"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100_000)
+    args = parser.parse_args()
+
+    connector = InMemoryDbConnector()
+    connector.add_new_user(user_id="1", user_name="viewer")
+    event_data = {
+        "message": "!command",
+        "color": "#fff44f",
+        "badges": "subscriber/12",
+        "user_name": "viewer",
+        "user_id": "1",
+        "sent_at": "1627822645000",
+        "command_name": "",
+        "command_input": "taurus",
+    }
+    badges = ["subscriber"]
+
+    services = MappingProxyType(SERVICES)
+    cases = [
+        ("hello", PerMessageSayHelloCommand, SayHelloCommand()),
+        ("restricted !settoday by a viewer", PerMessageSetTodayCommand, SetTodayCommand()),
+        ("addzodiacsign", PerMessageAddZodiacSignCommand, AddZodiacSignCommand()),
+    ]
+    for label, command_class, handler in cases:
+        measure(
+            f"{label} per-message object",
+            lambda: per_message_dispatch(command_class, connector, event_data, badges),
+            args.messages,
+        )
+        measure(
+            f"{label} shared handler",
+            lambda: shared_handler_dispatch(handler, connector, event_data, badges, services),
+            args.messages,
+        )
+
+
+if __name__ == "__main__":
+    main()
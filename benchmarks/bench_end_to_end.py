@@ -0,0 +1,147 @@
+"""End to end latency and throughput of the bot, over irc against the local fake twitch server.
+
+Chat is replayed at increasing rates, every line from a different viewer so the flood filter
+lets it through. Every `--probe-every`th line is a `!hello` from a probe user, the time from the
+probe going out to the bot's answer reaching the server is its latency. A rate counts as
+sustained when every probe got answered and p95 stayed under `--max-p95` seconds.
+
+Run with `python -m benchmarks.bench_end_to_end --rates 50,100,200,400 --duration 5` from the
+root of the repo, `--in-memory` swaps the sqlite db for the in-memory connector and
+`--profile PATH` samples the bot while under load, see chatbot/profiler.py.
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from io import StringIO
+from typing import Dict, Iterator, List
+
+from chatbot.bot import Bot
+from chatbot.config import Config
+from chatbot.db import DbConnector
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+
+CHANNEL = "#benchmark"
+PROBE_PREFIX = "Welcome to the stream, "
+
+
+class LocalConfig(Config):
+    def __init__(self, server: FakeTwitchIRC, tmp_dir: str) -> None:
+        super().__init__()
+        self.bot_name = "bench_bot"
+        self.channel = CHANNEL[1:]
+        self.oauth_token = "oauth:bench"
+        self.irc_server = server.host
+        self.irc_port = server.port
+        self.cache_snapshot_path = f"{tmp_dir}/cache_snapshot.json.gz"
+
+    def get_bot_api_token(self):
+        return ""
+
+
+def traffic(
+    step: int, n_lines: int, probe_every: int, probes: Dict[str, int]
+) -> Iterator[ChatLine]:
+    for i in range(n_lines):
+        if i % probe_every == 0:
+            probe = f"probe{step}x{i}"
+            probes[probe] = i
+            yield ChatLine(probe, "!hello")
+        else:
+            yield ChatLine(f"viewer{step}x{i}", f"chat line number {i} of step {step} Kappa")
+
+
+def percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def report(line: str) -> None:
+    # stdout is swallowed while the bot runs, see main
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def load(server: FakeTwitchIRC, args: argparse.Namespace, done: threading.Event) -> None:
+    try:
+        for step, rate in enumerate(args.rates):
+            n_lines = int(rate * args.duration)
+            probes: Dict[str, int] = {}
+            first_response = len(server.responses)
+            start = time.perf_counter()
+            sent_at = server.replay(
+                CHANNEL, traffic(step, n_lines, args.probe_every, probes), rate=rate
+            )
+            achieved = n_lines / (time.perf_counter() - start)
+
+            def answered() -> Dict[str, float]:
+                return {
+                    r.text[len(PROBE_PREFIX) :]: r.received_at
+                    for r in server.responses[first_response:]
+                    if r.text.startswith(PROBE_PREFIX)
+                }
+
+            server.wait_for(lambda: len(answered()) >= len(probes), timeout=args.drain)
+            replies = answered()
+            latencies = [replies[p] - sent_at[i] for p, i in probes.items() if p in replies]
+            if not latencies:
+                report(f"{rate:>8} {achieved:>10.0f} {0:>5}/{len(probes):<5} no answers")
+                break
+            sustained = len(latencies) == len(probes) and percentile(latencies, 0.95) < args.max_p95
+            report(
+                f"{rate:>8} {achieved:>10.0f} {len(latencies):>5}/{len(probes):<5}"
+                f" {percentile(latencies, 0.5) * 1000:>9.1f}"
+                f" {percentile(latencies, 0.95) * 1000:>9.1f}"
+                f" {max(latencies) * 1000:>9.1f}  {'yes' if sustained else 'no'}"
+            )
+            if not sustained:
+                break
+    finally:
+        done.set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rates", type=lambda s: [float(r) for r in s.split(",")], default="50,100,200,400,800"
+    )
+    parser.add_argument("--duration", type=float, default=5, help="seconds of chat per rate")
+    parser.add_argument("--probe-every", type=int, default=10)
+    parser.add_argument("--max-p95", type=float, default=1.0)
+    parser.add_argument("--drain", type=float, default=10, help="seconds to wait for answers")
+    parser.add_argument("--in-memory", action="store_true")
+    parser.add_argument("--profile", metavar="PATH")
+    args = parser.parse_args()
+
+    header = (
+        f"{'rate':>8} {'achieved':>10} {'answered':>11} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"
+    )
+    report(header)
+    done = threading.Event()
+    with tempfile.TemporaryDirectory() as tmp_dir, FakeTwitchIRC() as server:
+        # the bot renders every chat line to the terminal, that's part of the cost but not of
+        # the output.
+        with redirect_stdout(StringIO()):
+            db_connector = (
+                InMemoryDbConnector() if args.in_memory else DbConnector(db_path=f"{tmp_dir}/")
+            )
+            bot = Bot(LocalConfig(server, tmp_dir), db_connector)
+            if not run_bot(bot, lambda: CHANNEL in server.joined, timeout=10):
+                raise RuntimeError("the bot never joined the fake server")
+            # the greeting isn't part of any step
+            run_bot(bot, lambda: len(server.responses) > 0, timeout=10)
+            generator = threading.Thread(target=load, args=(server, args, done), daemon=True)
+            generator.start()
+            if args.profile:
+                bot.profiler.start()
+            run_bot(bot, done.is_set, timeout=float("inf"))
+            if args.profile:
+                bot.profiler.stop()
+                bot.profiler.write(args.profile)
+            bot.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Helix lookups against the local mock server: a new connection per call vs the pooled client,
+and one user per request vs batches of MAX_BATCH_SIZE.
+
+The mock is plain http on localhost so this only shows the tcp side of things, against twitch
+every fresh connection also pays a tls handshake and a real round trip.
+
+Run with `python -m benchmarks.bench_helix --lookups 1000` from the root of the repo.
+"""
+import argparse
+import time
+from typing import Callable
+
+import httpx
+
+from chatbot.helix import HelixClient
+from chatbot.helix_mock import MockHelix
+
+
+def timeit(label: str, func: Callable[[], object], n_lookups: int) -> None:
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {elapsed:>8.3f} s {elapsed / n_lookups * 1000:>8.3f} ms/lookup")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lookups", type=int, default=1_000)
+    args = parser.parse_args()
+
+    mock = MockHelix(rate_limit=10**9)
+    logins = [f"user{i}" for i in range(args.lookups)]
+    for login in logins:
+        mock.add_user(login)
+    server = mock.serve()
+    base_url = f"http://127.0.0.1:{server.server_port}/helix"
+
+    try:
+        with HelixClient("id", "token", base_url=base_url) as client:
+            timeit(
+                "one httpx.get per lookup",
+                lambda: [
+                    httpx.get(f"{base_url}/users", params={"login": login}) for login in logins
+                ],
+                args.lookups,
+            )
+            timeit(
+                "pooled client, one user per request",
+                lambda: [client.get_users(logins=[login]) for login in logins],
+                args.lookups,
+            )
+            timeit(
+                "pooled client, batched",
+                lambda: client.get_users(logins=logins),
+                args.lookups,
+            )
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Checking chat lines against banned term lists of growing size.
+
+Compares a substring loop over the terms and one big regex alternation, both on pre-normalised
+text, with the Aho-Corasick automaton in chatbot/moderation.py, which normalises as it goes.
+
+Run with `python -m benchmarks.bench_moderation --messages 10000` from the root of the repo.
+"""
+import argparse
+import random
+import re
+import string
+import time
+from typing import Callable, List
+
+from chatbot.moderation import TermAutomaton, normalise
+
+TERM_COUNTS = [10, 100, 1_000, 5_000]
+
+
+def random_word(rng: random.Random, min_length: int, max_length: int) -> str:
+    return "".join(rng.choices(string.ascii_lowercase, k=rng.randint(min_length, max_length)))
+
+
+def timeit(label: str, check: Callable[[str], bool], messages: List[str]) -> int:
+    start = time.perf_counter()
+    hits = sum(1 for message in messages if check(message))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<20} {elapsed / len(messages) * 1e6:>10.1f} us/message {hits:>7} hits")
+    return hits
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [random_word(rng, 2, 9) for _ in range(5_000)]
+    messages = [
+        " ".join(rng.choices(vocabulary, k=rng.randint(3, 20))) for _ in range(args.messages)
+    ]
+    for n_terms in TERM_COUNTS:
+        terms = [f"{random_word(rng, 4, 10)}{i}" for i in range(n_terms)]
+        # sprinkle a few hits in
+        for i in rng.sample(range(len(messages)), k=len(messages) // 100):
+            messages[i] += f" {normalise(rng.choice(terms))}"
+        print(f"{n_terms} terms")
+
+        normalised_terms = [normalise(term) for term in terms]
+        pattern = re.compile(
+            r"\b(?:" + "|".join(re.escape(term) for term in normalised_terms) + r")\b"
+        )
+        automaton = TermAutomaton()
+        for term in terms:
+            automaton.add(term)
+
+        def substring_loop(message: str) -> bool:
+            message = normalise(message)
+            return any(term in message for term in normalised_terms)
+
+        expected = timeit("substring loop", substring_loop, messages)
+        timeit("regex alternation", lambda m: pattern.search(normalise(m)) is not None, messages)
+        assert (
+            timeit("aho-corasick", lambda m: next(automaton.search(m), None) is not None, messages)
+            == expected
+        )
+        start = time.perf_counter()
+        automaton.add("newlybanned")
+        list(automaton.search("relinks the trie"))
+        print(f"  adding a term        {(time.perf_counter() - start) * 1000:>10.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Quotes lookups over a large synthetic corpus: fts5 vs LIKE and id sampling vs ORDER BY RANDOM().
+
+Run with `python -m benchmarks.bench_quotes --quotes 200000` from the root of the repo.
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import func, insert, select
+
+from chatbot.db import DbConnector
+
+WORDS = (
+    "frittata chat stream bot python data egg pan burn cheese onion potato pepper salt "
+    "omelette kitchen code bug deploy test cast pizza pasta coffee lurk raid hype clip"
+).split()
+
+
+def make_corpus(connector: DbConnector, n_quotes: int, seed: int) -> None:
+    rng = random.Random(seed)
+    # the made up words make for rare terms, like real quotes have.
+    vocabulary = WORDS + [f"word{i}" for i in range(5_000)]
+    now = datetime.now()
+    rows = [
+        {
+            "quote_text": " ".join(rng.choice(vocabulary) for _ in range(rng.randint(5, 25))),
+            "added_by": f"user{rng.randint(0, 1_000)}",
+            "added_at": now,
+        }
+        for _ in range(n_quotes)
+    ]
+    with connector.engine.begin() as conn:
+        conn.execute(insert(connector.quotes), rows)
+
+
+def timeit(label: str, func: Callable[[], object], repeat: int) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<40} {elapsed * 1000:>10.3f} ms")
+
+
+def like_search(connector: DbConnector, words: List[str]):
+    stmt = select(connector.quotes.c.quote_id, connector.quotes.c.quote_text)
+    for word in words:
+        stmt = stmt.where(connector.quotes.c.quote_text.like(f"%{word}%"))
+    with connector.engine.connect() as conn:
+        return conn.execute(stmt.limit(1)).fetchall()
+
+
+def order_by_random(connector: DbConnector):
+    stmt = (
+        select(connector.quotes.c.quote_id, connector.quotes.c.quote_text)
+        .order_by(func.random())
+        .limit(1)
+    )
+    with connector.engine.connect() as conn:
+        return conn.execute(stmt).fetchone()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--quotes", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        connector = DbConnector(db_path=f"{db_dir}/")
+        start = time.perf_counter()
+        make_corpus(connector, args.quotes, args.seed)
+        print(f"inserted {args.quotes} quotes in {time.perf_counter() - start:.2f} s\n")
+
+        for words in (["frittata"], ["frittata", "cheese"], ["word4242"], ["zucchini"]):
+            timeit(f"fts5 search {words}", lambda: connector.search_quotes(words), args.repeat)
+            timeit(f"LIKE search {words}", lambda: like_search(connector, words), args.repeat)
+        timeit("random quote by id sampling", connector.get_random_quote, args.repeat)
+        timeit("random quote ORDER BY RANDOM()", lambda: order_by_random(connector), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@
 datafrittata-twitch-chatbot: chatbot for Twitch that is developed on stream.
 """
 
+import argparse
 import sys
 
 if __name__ == "__main__":
@@ -24,6 +25,14 @@ if __name__ == "__main__":
         print("You're using Python version %s" % (pyversion))
         sys.exit(1)
 
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="sample the bot for its whole run and write collapsed stacks to PATH on exit",
+    )
+    args = parser.parse_args()
+
     import chatbot.bot
 
-    chatbot.bot.main()
+    chatbot.bot.main(profile_path=args.profile)
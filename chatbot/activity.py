@@ -0,0 +1,90 @@
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+from chatbot.storage import StorageBackend
+
+
+@dataclass
+class UserActivity:
+    stored_message_count: int = 0
+    pending_message_count: int = 0
+    last_stream_date: Optional[date] = None
+    stream_streak: int = 0
+    first_chatted_at: Optional[datetime] = None
+
+    @property
+    def message_count(self) -> int:
+        return self.stored_message_count + self.pending_message_count
+
+
+class ActivityTracker:
+    """Per-user chat activity counters kept in memory and persisted as coalesced deltas.
+
+    A user's stored totals are read the first time they chat in a session. From then on a
+    message only bumps an in-memory counter, and `flush` writes all pending deltas in one
+    batch. A stream is identified by its date, and the streak counts consecutive streams.
+    """
+
+    def __init__(self, db_connector: StorageBackend, stream_date: Optional[date] = None):
+        self.db_connector = db_connector
+        self.stream_date = stream_date or date.today()
+        self.previous_stream_date = self.db_connector.register_stream(self.stream_date)
+        self.users: Dict[str, UserActivity] = {}
+        self._dirty: Set[str] = set()
+
+    def _get_or_load(self, user_id: str) -> UserActivity:
+        activity = self.users.get(user_id)
+        if activity is None:
+            (
+                message_count,
+                last_stream_date,
+                stream_streak,
+                first_chatted_at,
+            ) = self.db_connector.get_user_activity(user_id)
+            activity = UserActivity(
+                stored_message_count=message_count,
+                last_stream_date=last_stream_date,
+                stream_streak=stream_streak,
+                first_chatted_at=first_chatted_at,
+            )
+            self.users[user_id] = activity
+        return activity
+
+    def record_message(self, user_id: str) -> None:
+        activity = self._get_or_load(user_id)
+        activity.pending_message_count += 1
+        if activity.last_stream_date != self.stream_date:
+            if (
+                activity.last_stream_date is not None
+                and activity.last_stream_date == self.previous_stream_date
+            ):
+                activity.stream_streak += 1
+            else:
+                activity.stream_streak = 1
+            activity.last_stream_date = self.stream_date
+        self._dirty.add(user_id)
+
+    def get_stats(self, user_id: str) -> UserActivity:
+        return self._get_or_load(user_id)
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        rows = [
+            {
+                "user_id": user_id,
+                "message_count": self.users[user_id].pending_message_count,
+                "last_stream_date": self.users[user_id].last_stream_date,
+                "stream_streak": self.users[user_id].stream_streak,
+            }
+            for user_id in self._dirty
+        ]
+        # pending counts stay pending, and their users dirty, until they're stored.
+        if not self.db_connector.upsert_user_activity(rows):
+            return
+        for user_id in self._dirty:
+            activity = self.users[user_id]
+            activity.stored_message_count += activity.pending_message_count
+            activity.pending_message_count = 0
+        self._dirty = set()
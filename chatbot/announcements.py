@@ -0,0 +1,104 @@
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from chatbot.storage import StorageBackend
+
+
+@dataclass
+class Timer:
+    name: str
+    message: str
+    interval_minutes: int
+    min_lines: int = 0
+    # chat line count when the timer last posted, see `AnnouncementScheduler.bump`
+    lines_at_last_post: int = 0
+    version: int = 0
+
+
+class AnnouncementScheduler:
+    """Posts recurring messages from the `timers` table, every timer sharing one heap.
+
+    The heap holds (due_at, sequence, timer name, version) so checking whether anything is due
+    is a peek at its top, which is all `tick` does most of the time. It is meant to be called
+    every second or so by the irc reactor's scheduler. A timer only posts if at least
+    `min_lines` chat lines happened since its last post, otherwise it waits for its next turn.
+    Removing or redefining a timer bumps its version and stale heap entries are skipped when
+    they come up.
+
+    A message starting with `!` is looked up as a text command (aliases included) when the timer
+    fires, so `!bot` always posts the current !bot text, its `{variables}` filled in by
+    `render_response(command_name, response)` when given.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        send: Callable[[str], None],
+        render_response: Optional[Callable[[str, str], str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db_connector = db_connector
+        self.send = send
+        self.render_response = render_response
+        self.clock = clock
+        self.lines = 0
+        self.timers: Dict[str, Timer] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._sequence = itertools.count()
+        self._versions = itertools.count()
+        self.load()
+
+    def load(self) -> None:
+        for timer_name, message, interval_minutes, min_lines in self.db_connector.get_timers():
+            self._schedule(Timer(timer_name, message, interval_minutes, min_lines))
+
+    def bump(self) -> None:
+        # called for every chat line, keep it this cheap.
+        self.lines += 1
+
+    def _schedule(self, timer: Timer, now: Optional[float] = None) -> None:
+        previous = self.timers.get(timer.name)
+        if previous is not timer:
+            timer.version = next(self._versions)
+            timer.lines_at_last_post = (
+                self.lines if previous is None else previous.lines_at_last_post
+            )
+        self.timers[timer.name] = timer
+        due_at = (self.clock() if now is None else now) + timer.interval_minutes * 60
+        heapq.heappush(self._heap, (due_at, next(self._sequence), timer.name, timer.version))
+
+    def set_timer(self, timer_name: str, message: str, interval_minutes: int, min_lines: int):
+        self.db_connector.upsert_timer(timer_name, message, interval_minutes, min_lines)
+        self._schedule(Timer(timer_name, message, interval_minutes, min_lines))
+
+    def remove_timer(self, timer_name: str) -> bool:
+        self.db_connector.remove_timer(timer_name)
+        # dropping it from `timers` is enough, its heap entry is skipped once it comes up.
+        return self.timers.pop(timer_name, None) is not None
+
+    def render(self, timer: Timer) -> Optional[str]:
+        if not timer.message.startswith("!"):
+            return timer.message
+        command_name = timer.message[1:].split()[0] if timer.message[1:] else ""
+        command_name = self.db_connector.get_original_command(command_name) or command_name
+        response = self.db_connector.retrive_command_response(command_name)
+        if response is None or self.render_response is None:
+            return response
+        return self.render_response(command_name, response)
+
+    def tick(self) -> None:
+        now = self.clock()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, timer_name, version = heapq.heappop(self._heap)
+            timer = self.timers.get(timer_name)
+            if timer is None or timer.version != version:
+                continue
+            if self.lines - timer.lines_at_last_post >= timer.min_lines:
+                message = self.render(timer)
+                if message:
+                    self.send(message)
+                timer.lines_at_last_post = self.lines
+            self._schedule(timer, now=now)
@@ -1,14 +1,45 @@
+import logging
 import re
+import time
 from datetime import datetime
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Optional
 
+import httpx
 import irc.bot
 from rich.console import Console
 from rich.emoji import EMOJI
+from rich.logging import RichHandler
 
-from chatbot.commands import COMMANDS_TO_IGNORE, commands_factory, send_message
+from chatbot.activity import ActivityTracker
+from chatbot.announcements import AnnouncementScheduler
+from chatbot.cache import TTLCache, load_snapshot, save_snapshot
+from chatbot.circuit_breaker import CircuitBreaker
+from chatbot.commands import CommandContext, commands_factory, render_template, send_message
 from chatbot.config import Config
 from chatbot.db import DbConnector
+from chatbot.drops import DEFAULT_DROP_RESULT_PATTERN, DropResultsTracker
+from chatbot.emotes import EmoteTracker
+from chatbot.flood import FloodFilter
+from chatbot.helix import shared_client
+from chatbot.json_log import configure_logging, set_levels, stop_logging
+from chatbot.load_shedding import (
+    ELEVATED_COMMANDS_ONLY,
+    SKIP_DECORATION,
+    SKIP_RENDERING,
+    LoadShedder,
+)
+from chatbot.moderation import DELETE, TIMEOUT, ModerationFilter
+from chatbot.plugin_registry import BUILTIN_PLUGINS_DIR, PluginRegistry
+from chatbot.points import PointsBank
+from chatbot.polls import PollManager
+from chatbot.presence import PresenceTracker
+from chatbot.profiler import SamplingProfiler
+from chatbot.raffles import RaffleManager
+from chatbot.storage import StorageBackend
+from chatbot.unknown_commands import UnknownCommandsTracker
+
+logger = logging.getLogger(__name__)
 
 console = Console()
 
@@ -20,23 +51,197 @@ START_TIME = datetime.now()
 class Bot(irc.bot.SingleServerIRCBot):
     ELEVATED_BADGES = {"broadcaster"}
 
-    def __init__(self, config: Config, db_connector: DbConnector):
+    def __init__(self, config: Config, db_connector: StorageBackend):
         self._config = config
         self.token = self._config.oauth_token
         self.channel = f"#{self._config.channel}"
         self.bot_name = self._config.bot_name
         self.db_connector = db_connector
+        # nobody watches the terminal in production, chat and command results go to the log only.
+        self.headless = self._config.headless
+        self.flood_filter = FloodFilter(
+            user_window=self._config.flood_user_window,
+            user_max_messages=self._config.flood_user_max_messages,
+            channel_window=self._config.flood_channel_window,
+            channel_max_duplicates=self._config.flood_channel_max_duplicates,
+        )
+        self.load_shedder = LoadShedder(thresholds=self._config.load_shedding_thresholds)
+        self.unknown_commands = UnknownCommandsTracker(self.db_connector)
+        self.drop_bot_name = (self._config.drop_bot_name or "").lower()
+        self.drop_results = DropResultsTracker(
+            self.db_connector,
+            result_pattern=self._config.drop_result_pattern or DEFAULT_DROP_RESULT_PATTERN,
+        )
+        self.activity = ActivityTracker(self.db_connector, stream_date=START_TIME.date())
+        self.emotes = EmoteTracker(
+            self.db_connector,
+            capacity=self._config.emotes_capacity,
+            stream_date=START_TIME.date(),
+        )
+        self.presence = PresenceTracker(
+            self.db_connector, idle_timeout=self._config.presence_idle_timeout
+        )
+        self.points = PointsBank(
+            self.db_connector,
+            per_message=self._config.points_per_message,
+            per_minute=self._config.points_per_minute,
+            active_window=self._config.points_active_window,
+        )
+        self.plugins = PluginRegistry(plugin_dirs=[BUILTIN_PLUGINS_DIR] + self._config.plugin_dirs)
+        self.announcements = AnnouncementScheduler(
+            self.db_connector, send=self.announce, render_response=self.render_response
+        )
+        self.raffles = RaffleManager(
+            self.db_connector, badge_weights=self._config.raffle_badge_weights
+        )
+        self.polls = PollManager(
+            self.db_connector,
+            send=self.announce,
+            results_interval=self._config.poll_results_interval,
+            last_vote_wins=self._config.poll_last_vote_wins,
+        )
+        self.moderation = ModerationFilter(self.db_connector)
+        self.profiler = SamplingProfiler(interval=self._config.profile_interval)
+        self.breakers = {
+            upstream: CircuitBreaker(
+                upstream,
+                failure_rate=self._config.breaker_failure_rate,
+                min_calls=self._config.breaker_min_calls,
+                open_for=self._config.breaker_open_for,
+                failure_exceptions=(httpx.HTTPError,),
+            )
+            for upstream in ["ohmanda", "twitch"]
+        }
+        # same pooled client the config got its token through
+        self.helix = shared_client(self._config.client_id_api, self._config.bot_api_token)
+        self.helix.breaker = self.breakers["twitch"]
+        self.user_profiles = TTLCache(ttl=self._config.user_profiles_ttl)
+        self.horoscopes = TTLCache(
+            ttl=self._config.horoscopes_ttl,
+            maxsize=12,
+            stale_for=self._config.horoscopes_stale_for,
+        )
+        self.channel_lookups = TTLCache(
+            ttl=self._config.channel_lookups_ttl,
+            stale_for=self._config.channel_lookups_stale_for,
+        )
+        # what gets snapshotted to disk between runs, TTLCaches only.
+        self.caches: Dict[str, TTLCache] = {
+            "user_profiles": self.user_profiles,
+            "horoscopes": self.horoscopes,
+            "channel_lookups": self.channel_lookups,
+        }
+        restored = load_snapshot(
+            self._config.cache_snapshot_path,
+            self.caches,
+            max_age=self._config.cache_snapshot_max_age,
+        )
+        logger.info(f"Restored {restored} cached entries from the last run")
+        # things commands may need on top of the db connector and the config, handed to them
+        # through `CommandContext.services`.
+        self.command_services: Dict[str, Any] = {
+            "unknown_commands": self.unknown_commands,
+            "drop_results": self.drop_results,
+            "activity": self.activity,
+            "emotes": self.emotes,
+            "presence": self.presence,
+            "points": self.points,
+            "plugins": self.plugins,
+            "flood_filter": self.flood_filter,
+            "load_shedder": self.load_shedder,
+            "announcements": self.announcements,
+            "polls": self.polls,
+            "raffles": self.raffles,
+            "user_profiles": self.user_profiles,
+            "horoscopes": self.horoscopes,
+            "channel_lookups": self.channel_lookups,
+            "breakers": self.breakers,
+            "helix": self.helix,
+            "profiler": self.profiler,
+            "moderation": self.moderation,
+        }
+        # read only view shared by every command context, later additions still show up in it.
+        self._services = MappingProxyType(self.command_services)
+        self._flushers: List[Callable[[], Any]] = []
 
         # Create IRC bot connection
-        server = "irc.chat.twitch.tv"
-        port = 6667
-        print("Connecting to " + server + " on port " + str(port) + "...")
+        server = self._config.irc_server
+        port = self._config.irc_port
+        logger.info(f"Connecting to {server} on port {port}...")
         irc.bot.SingleServerIRCBot.__init__(
             self, [(server, port, self.token)], self.bot_name, self.bot_name
         )
+        self.schedule_flush(
+            self._config.unknown_commands_flush_interval, self.unknown_commands.flush
+        )
+        self.schedule_flush(self._config.drop_results_flush_interval, self.drop_results.flush)
+        self.schedule_flush(self._config.activity_flush_interval, self.activity.flush)
+        self.schedule_flush(self._config.emotes_snapshot_interval, self.emotes.snapshot)
+        self.schedule_flush(self._config.presence_flush_interval, self.presence.flush)
+        # minutes of activity get paid by the tick, only message points are left on shutdown.
+        self.schedule(60, self.points.tick)
+        self._flushers.append(self.points.flush)
+        self.schedule(1, self.announcements.tick)
+        self.schedule(1, self.polls.tick)
+        # a poll or raffle still running on shutdown gets closed so its result isn't lost.
+        self._flushers.append(self.polls.end)
+        self._flushers.append(self.raffles.close)
+        self.schedule_flush(self._config.cache_snapshot_interval, self.save_caches)
+
+    def schedule(self, interval: int, job: Callable[[], Any]) -> None:
+        # the scheduler runs jobs inside the reactor loop, one that raises would take the bot
+        # down with it. Failures are logged and the job runs again next interval.
+        def guarded_job() -> None:
+            try:
+                job()
+            except Exception:
+                logger.exception(f"Scheduled job {job} failed")
+
+        self.reactor.scheduler.execute_every(period=interval, func=guarded_job)
+
+    def schedule_flush(self, interval: int, flush: Callable[[], Any]) -> None:
+        # in-memory aggregates get written out on the reactor's scheduler so we never block or
+        # spawn threads, and once more on shutdown so that nothing is lost.
+        self.schedule(interval, flush)
+        self._flushers.append(flush)
+
+    def flush(self) -> None:
+        for flush in self._flushers:
+            try:
+                flush()
+            except Exception as e:
+                logger.error(f"Could not flush {flush}: {e}")
+
+    def get_user_profile(self, user_id: str) -> Dict[str, Optional[str]]:
+        user_profile = self.user_profiles.get(user_id)
+        if user_profile is None:
+            user_profile = {
+                "country": self.db_connector.get_user_country(user_id=user_id),
+                "emoji": self.db_connector.get_user_emoji(user_id=user_id),
+            }
+            self.user_profiles.set(user_id, user_profile)
+        return user_profile
+
+    def save_caches(self) -> None:
+        save_snapshot(self._config.cache_snapshot_path, self.caches)
+
+    def announce(self, text: str) -> None:
+        if self.connection.is_connected():
+            send_message(connection=self.connection, channel=self.channel, text=text)
+
+    def render_response(self, command_name: str, response: str) -> str:
+        # timers post text commands as if the bot had typed them.
+        context = CommandContext(
+            self.db_connector,
+            self._config,
+            command_name=command_name,
+            user_name=self.bot_name,
+            services=self._services,
+        )
+        return render_template(context, command_name, response)
 
     def on_welcome(self, connection, event):
-        print("Joining " + self.channel)
+        logger.info(f"Joining {self.channel}")
 
         # You must request specific capabilities before you can use them
         connection.cap("REQ", ":twitch.tv/membership")
@@ -45,9 +250,28 @@ class Bot(irc.bot.SingleServerIRCBot):
         connection.join(self.channel)
         connection.privmsg(self.channel, text="Hello, I am the bot")
 
+    def on_join(self, connection, event):
+        # needs the twitch.tv/membership capability, twitch batches these every few seconds.
+        if event.source.nick != connection.get_nickname():
+            self.presence.join(event.target, event.source.nick)
+
+    def on_part(self, connection, event):
+        self.presence.part(event.target, event.source.nick)
+
+    def on_disconnect(self, connection, event):
+        self.presence.leave_all()
+
     @staticmethod
     def structure_message(event) -> Dict[str, str]:
-        keys_to_retain = ["color", "display-name", "badges", "user-id"]
+        keys_to_retain = [
+            "color",
+            "display-name",
+            "badges",
+            "user-id",
+            "tmi-sent-ts",
+            "id",
+            "emotes",
+        ]
         data = {"message": event.arguments[0]}
 
         # TODO: find a way to rename the keys in a not so fucky way.
@@ -57,6 +281,10 @@ class Bot(irc.bot.SingleServerIRCBot):
                     data.update({"user_name": tag["value"]})
                 elif tag["key"] == "user-id":
                     data.update({"user_id": tag["value"]})
+                elif tag["key"] == "tmi-sent-ts":
+                    data.update({"sent_at": tag["value"]})
+                elif tag["key"] == "id":
+                    data.update({"message_id": tag["value"]})
                 else:
                     data.update({tag["key"]: tag["value"]})
 
@@ -96,22 +324,91 @@ class Bot(irc.bot.SingleServerIRCBot):
             return "".join(badges_str)
         return ""
 
+    def moderate(self, connection, event_data: Dict[str, str], action: str) -> bool:
+        # returns whether the message is gone and shouldn't be processed any further.
+        if action == TIMEOUT:
+            send_message(
+                connection=connection,
+                channel=self.channel,
+                text=(
+                    f"/timeout {event_data['user_name']} "
+                    f"{self._config.moderation_timeout_seconds} banned term"
+                ),
+            )
+            return True
+        if action == DELETE and event_data.get("message_id"):
+            send_message(
+                connection=connection,
+                channel=self.channel,
+                text=f"/delete {event_data['message_id']}",
+            )
+            return True
+        return False
+
     def on_pubmsg(self, connection, event):
+        # during a poll most lines are a lone digit, hundreds of identical ones the flood filter
+        # would take for copypasta. They are counted in memory and go no further.
+        if self.polls.poll is not None:
+            choice = self.polls.parse_vote(event.arguments[0])
+            if choice is not None:
+                user_id = next(
+                    (tag["value"] for tag in event.tags if tag["key"] == "user-id"),
+                    event.source.nick,
+                )
+                self.polls.vote(user_id, choice)
+                return
+        # spam and copypasta get dropped before we parse tags, hit the db or render anything. The
+        # drop bot posts results in bursts and the broadcaster repeats commands on purpose, both
+        # skip it, told apart by the raw badges tag.
+        if event.source.nick.lower() != self.drop_bot_name:
+            raw_badges = next((tag["value"] for tag in event.tags if tag["key"] == "badges"), None)
+            if (
+                self.ELEVATED_BADGES.isdisjoint(self.process_badges(raw_badges))
+                and self.flood_filter.check(event.source.nick, event.arguments[0]) is not None
+            ):
+                return
+        self.announcements.bump()
         event_data = self.structure_message(event)
+        user_badges = self.process_badges(event_data["badges"])
         message_text = event_data["message"]
         user_name = event_data["user_name"]
         user_id = event_data["user_id"]
         user_colour = event_data["color"]
-        user_badges = self.process_badges(event_data["badges"])
-        # add a placeholder that gets filled in later on if needed
-        event_data["command_input"] = ""
-        badges_str = self.generate_badge_string(user_badges)
+        is_command = message_text.startswith("!")
+
+        # the broadcaster gets to say whatever, everyone else goes through the banned terms.
+        if self.ELEVATED_BADGES.isdisjoint(user_badges):
+            verdict = self.moderation.check(message_text)
+            if verdict is not None and self.moderate(connection, event_data, verdict[0]):
+                return
+
+        # twitch timestamps are in ms since the epoch
+        if event_data.get("sent_at"):
+            self.load_shedder.observe(int(event_data["sent_at"]) / 1000, now=time.time())
+        load_level = self.load_shedder.level
+        if load_level >= ELEVATED_COMMANDS_ONLY and not (
+            is_command and not self.ELEVATED_BADGES.isdisjoint(user_badges)
+        ):
+            return
+
+        if event_data.get("emotes"):
+            self.emotes.record(event.target, event_data["emotes"], message_text)
+
+        if self.drop_bot_name and user_name.lower() == self.drop_bot_name:
+            self.drop_results.ingest(message_text)
 
+        logger.debug(
+            "chat message",
+            extra={"user_id": user_id, "user_name": user_name, "text": message_text},
+        )
         # do the country emoji thingie
-        user_country_emoji = self.db_connector.get_user_country(user_id=user_id)
+        user_profile = (
+            {} if self.headless or load_level >= SKIP_DECORATION else self.get_user_profile(user_id)
+        )
+        user_country_emoji = user_profile.get("country")
         if user_country_emoji is not None:
             user_country_emoji = user_country_emoji.strip(":")
-            if user_country_emoji in list(EMOJI.keys()):
+            if user_country_emoji in EMOJI:
                 user_country_emoji = f":{user_country_emoji}: "
             else:
                 user_country_emoji = ""
@@ -119,10 +416,10 @@ class Bot(irc.bot.SingleServerIRCBot):
             user_country_emoji = ""
 
         # do the user emoji thingie
-        user_emoji = self.db_connector.get_user_emoji(user_id=user_id)
+        user_emoji = user_profile.get("emoji")
         if user_emoji:
             user_emoji.strip(":")
-            if user_emoji in list(EMOJI.keys()):
+            if user_emoji in EMOJI:
                 user_emoji = f":{user_emoji}: "
             else:
                 user_emoji = ""
@@ -130,50 +427,96 @@ class Bot(irc.bot.SingleServerIRCBot):
             user_emoji = ""
 
         # printing to the terminal stuff
-        if not user_colour:
-            user_colour = "#fff44f"
-        console.print(
-            f"{badges_str}[{user_colour}][bold]{user_name}[/bold][/{user_colour}] "
-            f"{user_country_emoji}{user_emoji}:"
-            f"[#00BFFF]{message_text}[/#00BFFF]"
-        )
+        if not self.headless and (load_level < SKIP_RENDERING or is_command):
+            if not user_colour:
+                user_colour = "#fff44f"
+            badges_str = self.generate_badge_string(user_badges)
+            console.print(
+                f"{badges_str}[{user_colour}][bold]{user_name}[/bold][/{user_colour}] "
+                f"{user_country_emoji}{user_emoji}:"
+                f"[#00BFFF]{message_text}[/#00BFFF]"
+            )
         # attempt to add the uer to the database.
         self.db_connector.add_new_user(user_id=user_id, user_name=user_name)
+        self.activity.record_message(user_id)
+        self.points.record_message(user_id, user_name)
+        # twitch stops sending membership events in big channels, chatting is proof enough.
+        self.presence.chatted(self.channel, event.source.nick)
         command_match = re.match(r"^!(?P<command_name>\w+)\s?(?P<command_text>.*)", message_text)
         if command_match is None:
             return
 
         command_name, command_input = command_match.groups()
 
-        command = commands_factory(command_name)
-        if command_input:
-            event_data.update({"command_input": command_input})
-        if command_name:
-            event_data.update({"command_name": command_name})
+        command = commands_factory(command_name, plugins=self.plugins)
         if command:
-            command_output = ""
-            command = command(self.db_connector, self._config, **event_data)  # type: ignore
-            if command.is_restricted and not set(user_badges).intersection(self.ELEVATED_BADGES):
-                pass
-            else:
-                command_output = command.run()
+            # handlers are shared, restricted ones get turned down before we build anything.
+            if command.is_restricted and self.ELEVATED_BADGES.isdisjoint(user_badges):
+                return
+            cost = None
+            if self._config.points_costs:
+                # an alias costs what the command it points at does.
+                original_name = self.db_connector.get_original_command(command_name)
+                cost = self._config.points_costs.get(original_name or command_name)
+            if cost and not self.points.spend(user_id, cost):
+                send_message(
+                    connection=connection,
+                    channel=self.channel,
+                    text=(
+                        f"{user_name}, !{command_name} costs {cost} points and you have "
+                        f"{self.points.balance(user_id)}"
+                    ),
+                )
+                return
+            context = CommandContext(
+                self.db_connector,
+                self._config,
+                command_name=command_name,
+                command_input=command_input,
+                user_name=user_name,
+                user_login=event.source.nick,
+                user_id=user_id,
+                user_badges=tuple(user_badges),
+                services=self._services,
+            )
+            with self.profiler.attribute(f"command:{command_name}"):
+                command_output = command.run(context)
+            logger.info(
+                f"!{command_name} run",
+                extra={"command": command_name, "user_id": user_id, "output": command_output},
+            )
             if command_output:
                 send_message(connection=connection, channel=self.channel, text=command_output)
-        elif not command and command_name not in COMMANDS_TO_IGNORE:
-            command_output = (
-                f"Looks like the bot doesn't know {command_name}. "
-                "Do !commands to find out what it can do."
-            )
-            # TODO: add the unknown command to a db table of non-imple commands
-            # so that we can, maybe, add it later.
-            send_message(connection=connection, channel=self.channel, text=command_output)
 
 
-def main():
+def main(profile_path: Optional[str] = None):
     config = Config()
-    db_connector = DbConnector()
+    if config.headless:
+        log_listener = configure_logging(
+            config.log_path,
+            max_bytes=config.log_max_bytes,
+            backup_count=config.log_backup_count,
+            level=config.log_level,
+            levels=config.log_levels,
+        )
+    else:
+        log_listener = None
+        logging.getLogger().addHandler(RichHandler(console=console))
+        set_levels(config.log_level, config.log_levels)
+    db_connector = DbConnector(db_url=config.database_url)
     bot = Bot(config, db_connector=db_connector)
-    bot.start()
+    if profile_path:
+        bot.profiler.start()
+    try:
+        bot.start()
+    finally:
+        if profile_path:
+            bot.profiler.stop()
+            bot.profiler.write(profile_path)
+        bot.flush()
+        bot.helix.close()
+        if log_listener is not None:
+            stop_logging(log_listener)
 
 
 if __name__ == "__main__":
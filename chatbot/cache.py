@@ -0,0 +1,127 @@
+import gzip
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# bump when the layout of the snapshot file itself changes, every entry gets thrown away then.
+SNAPSHOT_VERSION = 1
+_MISSING = object()
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire `ttl` seconds after they were set.
+
+    Expiries are wall clock timestamps so that they still mean something after a restart,
+    see `save_snapshot`/`load_snapshot`, which is also why keys are strings and values have to
+    be json friendly. Bump `version` whenever what a cache stores changes shape, snapshots of
+    an older version of the cache are then ignored.
+
+    Expired entries are kept around for another `stale_for` seconds, `get` ignores them but
+    `get_stale` doesn't, for when a stale answer beats no answer (the upstream is down).
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10_000, version: int = 1, stale_for: float = 0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.version = version
+        self.stale_for = stale_for
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        now = time.time()
+        if entry is _MISSING or entry[1] <= now:  # type: ignore
+            if entry is not _MISSING and entry[1] + self.stale_for <= now:  # type: ignore
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[0]  # type: ignore
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        self._data[key] = (value, time.time() + self.ttl if expires_at is None else expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_stale(self, key: str, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING or entry[1] + self.stale_for <= time.time():  # type: ignore
+            return default
+        return entry[0]  # type: ignore
+
+    def invalidate(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def items(self) -> List[Tuple[str, Any, float]]:
+        now = time.time()
+        return [
+            (key, value, expires_at)
+            for key, (value, expires_at) in self._data.items()
+            if expires_at > now
+        ]
+
+
+def save_snapshot(path: str, caches: Dict[str, TTLCache]) -> None:
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": time.time(),
+        "caches": {
+            name: {"version": cache.version, "entries": cache.items()}
+            for name, cache in caches.items()
+        },
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # write next to the target and swap, a crash mid-write never leaves a truncated snapshot.
+    tmp_path = f"{path}.tmp"
+    try:
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"), default=str)
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError) as e:
+        logger.error(f"Could not save the cache snapshot to {path}: {e}")
+
+
+def load_snapshot(path: str, caches: Dict[str, TTLCache], max_age: float) -> int:
+    """Fills `caches` from the snapshot at `path` and returns how many entries were restored.
+
+    The whole file is ignored when it's unreadable, of another `SNAPSHOT_VERSION` or older
+    than `max_age` seconds. A cache whose version changed is skipped, as are expired entries.
+    """
+    if not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable cache snapshot {path}: {e}")
+        return 0
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring cache snapshot {path} of version {snapshot.get('version')}")
+        return 0
+    now = time.time()
+    if now - snapshot.get("created_at", 0) > max_age:
+        logger.info(f"Ignoring stale cache snapshot {path}")
+        return 0
+
+    restored = 0
+    for name, cache_snapshot in snapshot.get("caches", {}).items():
+        cache = caches.get(name)
+        if cache is None or cache_snapshot.get("version") != cache.version:
+            continue
+        for key, value, expires_at in cache_snapshot.get("entries", []):
+            if expires_at > now:
+                cache.set(key, value, expires_at=expires_at)
+                restored += 1
+    return restored
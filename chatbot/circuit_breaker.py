@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple, Type, TypeVar
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, name: str):
+        super().__init__(f"circuit {name} is open")
+        self.name = name
+
+
+class CircuitBreaker:
+    """Stops calling an upstream that keeps failing so callers fail fast instead of timing out.
+
+    The outcome of the last `window` calls is kept. Once at least `min_calls` of them are in and
+    `failure_rate` of them failed, the circuit opens and every call is rejected with
+    `CircuitOpenError` for `open_for` seconds. After that it goes half open and lets
+    `half_open_calls` probe calls through, closing again if they all succeed and reopening as
+    soon as one fails. Only the exceptions in `failure_exceptions` count as failures, anything
+    else is the caller's problem, it's raised as is and the call counts as a success.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        open_for: float = 30,
+        half_open_calls: int = 1,
+        failure_exceptions: Tuple[Type[BaseException], ...] = (Exception,),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_for = open_for
+        self.half_open_calls = half_open_calls
+        self.failure_exceptions = failure_exceptions
+        self.clock = clock
+        self._state = CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.open_for:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        return self._state
+
+    @property
+    def current_failure_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    def _open(self) -> None:
+        if self._state != OPEN:
+            logger.warning(
+                f"Circuit {self.name} opened, {self.current_failure_rate:.0%} of the last "
+                f"{len(self._outcomes)} calls failed"
+            )
+        self._state = OPEN
+        self._opened_at = self.clock()
+        self.times_opened += 1
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._probes < self.half_open_calls:
+            self._probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record(self, success: bool) -> None:
+        self.calls += 1
+        if not success:
+            self.failures += 1
+        if self._state == HALF_OPEN:
+            if not success:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                logger.info(f"Circuit {self.name} closed again")
+                self._state = CLOSED
+                self._outcomes.clear()
+            return
+        self._outcomes.append(success)
+        if len(self._outcomes) >= self.min_calls and self.current_failure_rate >= self.failure_rate:
+            self._open()
+
+    def call(self, func: Callable[[], T]) -> T:
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = func()
+        except self.failure_exceptions:
+            self.record(False)
+            raise
+        except Exception:
+            # the upstream answered, whatever went wrong isn't its health's business.
+            self.record(True)
+            raise
+        self.record(True)
+        return result
+
+    async def call_async(self, func: Callable[[], Awaitable[T]]) -> T:
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            result = await func()
+        except self.failure_exceptions:
+            self.record(False)
+            raise
+        except Exception:
+            # the upstream answered, whatever went wrong isn't its health's business.
+            self.record(True)
+            raise
+        self.record(True)
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failure_rate": self.current_failure_rate,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened,
+        }
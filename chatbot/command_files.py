@@ -0,0 +1,214 @@
+"""Imports and exports a channel's text commands and aliases as a JSON or YAML file.
+
+The file looks like
+
+    {"commands": {"socials": "follow me on ..."}, "aliases": {"twitter": "socials"}}
+
+Everything is checked before anything is written: names have to be something `!name` can
+reach, can't take over one of the bot's special or plugin commands, a name the bot ignores or
+an alias already in the database, and aliases have to point at a text command, either in the
+file or already in the database. The import then goes in as one
+transaction, commands already there get their response replaced.
+
+Run with `python -m chatbot.command_files import commands.yaml --dry-run` to see what an import
+would change, drop `--dry-run` to apply it, `export` writes the current ones out. YAML needs
+PyYAML installed.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from dataclasses import dataclass, field
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from chatbot.commands import COMMANDS_TO_IGNORE, SPECIAL_COMMANDS
+from chatbot.db import DbConnector
+from chatbot.plugin_registry import BUILTIN_PLUGINS_DIR, PluginRegistry
+from chatbot.storage import StorageBackend
+
+NAME_PATTERN = re.compile(r"^\w+$")
+
+
+class CommandFileError(ValueError):
+    def __init__(self, errors: List[str]):
+        super().__init__("\n".join(errors))
+        self.errors = errors
+
+
+@dataclass
+class ImportPlan:
+    commands: Dict[str, str]
+    aliases: Dict[str, str]
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    def diff(self) -> str:
+        lines = self.added + self.changed
+        lines.append(
+            f"{len(self.added)} added, {len(self.changed)} changed, {self.unchanged} unchanged"
+        )
+        return "\n".join(lines)
+
+
+def is_yaml(path: str) -> bool:
+    return path.endswith((".yaml", ".yml"))
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError as e:
+        raise RuntimeError("YAML command files need PyYAML, pip install pyyaml") from e
+    return yaml
+
+
+def read_file(path: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    with open(path) as f:
+        content: Any = _yaml().safe_load(f) if is_yaml(path) else json.load(f)
+    if not isinstance(content, dict) or set(content) - {"commands", "aliases"}:
+        raise CommandFileError([f"{path} should only have a commands and an aliases mapping"])
+    commands = content.get("commands") or {}
+    aliases = content.get("aliases") or {}
+    if not isinstance(commands, dict) or not isinstance(aliases, dict):
+        raise CommandFileError([f"commands and aliases in {path} should be mappings"])
+    return commands, aliases
+
+
+def write_file(path: str, commands: Dict[str, str], aliases: Dict[str, str]) -> None:
+    content = {"commands": commands, "aliases": aliases}
+    with open(path, "w") as f:
+        if is_yaml(path):
+            _yaml().safe_dump(content, f, allow_unicode=True, sort_keys=False)
+        else:
+            json.dump(content, f, indent=2, ensure_ascii=False)
+
+
+def _taken(name: str, plugin_commands: Collection[str]) -> Optional[str]:
+    # the bot answers these names itself, a text command or alias with them never runs.
+    if name in SPECIAL_COMMANDS:
+        return f"!{name} is a special command"
+    if name in plugin_commands:
+        return f"!{name} is a plugin command"
+    if name in COMMANDS_TO_IGNORE:
+        return f"!{name} is ignored by the bot"
+    return None
+
+
+def validate(
+    commands: Dict[str, Any],
+    aliases: Dict[str, Any],
+    existing_commands: Dict[str, str],
+    existing_aliases: Dict[str, str],
+    plugin_commands: Collection[str] = (),
+) -> List[str]:
+    errors = []
+    for name, response in commands.items():
+        taken = _taken(name, plugin_commands)
+        if not NAME_PATTERN.match(str(name)):
+            errors.append(f"!{name} can't be typed as a command")
+        elif taken:
+            errors.append(taken)
+        elif name in aliases:
+            errors.append(f"!{name} is both a command and an alias")
+        elif name in existing_aliases:
+            errors.append(f"!{name} is already an alias of !{existing_aliases[name]}")
+        if not isinstance(response, str) or not response.strip():
+            errors.append(f"!{name} needs a text response")
+    for name, aliased in aliases.items():
+        taken = _taken(name, plugin_commands)
+        if not NAME_PATTERN.match(str(name)):
+            errors.append(f"!{name} can't be typed as a command")
+        elif taken:
+            errors.append(taken)
+        elif name in existing_commands and name not in commands:
+            errors.append(f"!{name} is already a command")
+        if aliased in SPECIAL_COMMANDS:
+            errors.append(f"!{name}: !{aliased} is a special command and cannot be aliased")
+        elif aliased not in commands and aliased not in existing_commands:
+            errors.append(f"!{name}: !{aliased} does not exist, so it can't be aliased")
+    return errors
+
+
+def plan_import(
+    db_connector: StorageBackend, path: str, plugins: Optional[PluginRegistry] = None
+) -> ImportPlan:
+    commands, aliases = read_file(path)
+    existing_commands, existing_aliases = db_connector.export_commands()
+    plugins = PluginRegistry() if plugins is None else plugins
+    errors = validate(
+        commands, aliases, existing_commands, existing_aliases, set(plugins.command_names)
+    )
+    if errors:
+        raise CommandFileError(errors)
+
+    plan = ImportPlan(commands, aliases)
+    for name, response in commands.items():
+        if name not in existing_commands:
+            plan.added.append(f"+ !{name}: {response}")
+        elif existing_commands[name] != response:
+            plan.changed.append(f"~ !{name}: {existing_commands[name]} => {response}")
+        else:
+            plan.unchanged += 1
+    for name, aliased in aliases.items():
+        if name not in existing_aliases:
+            plan.added.append(f"+ alias !{name} -> !{aliased}")
+        elif existing_aliases[name] != aliased:
+            plan.changed.append(f"~ alias !{name} -> !{existing_aliases[name]} => !{aliased}")
+        else:
+            plan.unchanged += 1
+    return plan
+
+
+def import_file(
+    db_connector: StorageBackend,
+    path: str,
+    dry_run: bool = False,
+    plugins: Optional[PluginRegistry] = None,
+) -> ImportPlan:
+    plan = plan_import(db_connector, path, plugins=plugins)
+    if not dry_run:
+        db_connector.import_commands(plan.commands, plan.aliases)
+    return plan
+
+
+def export_file(db_connector: StorageBackend, path: str) -> Tuple[int, int]:
+    commands, aliases = db_connector.export_commands()
+    write_file(path, commands, aliases)
+    return len(commands), len(aliases)
+
+
+def main() -> None:
+    load_dotenv(os.path.join(os.path.dirname(__file__), "bot_env_vars.env"))
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path", help="a .json, .yaml or .yml file")
+    parser.add_argument("--dry-run", action="store_true", help="only show what would change")
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    db_connector = DbConnector(db_url=args.db_url)
+    if args.action == "export":
+        n_commands, n_aliases = export_file(db_connector, args.path)
+        print(f"Exported {n_commands} commands and {n_aliases} aliases to {args.path}")
+        return
+    # the same plugins the bot loads, see PLUGIN_DIRS in chatbot/config.py
+    plugin_dirs = [d for d in os.getenv("PLUGIN_DIRS", "").split(os.pathsep) if d]
+    plugins = PluginRegistry(plugin_dirs=[BUILTIN_PLUGINS_DIR] + plugin_dirs)
+    try:
+        plan = import_file(db_connector, args.path, dry_run=args.dry_run, plugins=plugins)
+    except CommandFileError as e:
+        print(f"Nothing imported, {args.path} has problems:\n{e}", file=sys.stderr)
+        sys.exit(1)
+    print(plan.diff())
+    if args.dry_run:
+        print("Dry run, nothing was written")
+
+
+if __name__ == "__main__":
+    main()
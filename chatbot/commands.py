@@ -1,134 +1,194 @@
 import logging
+import os
 import re
+import shlex
 from abc import ABC
+from collections import Counter
 from datetime import datetime
-from typing import Dict, List, Optional, Type
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Tuple, TypeVar
 
 import httpx
 from irc.client import ServerConnection
 from rich.emoji import EMOJI
 
+from chatbot.circuit_breaker import CircuitOpenError
 from chatbot.config import Config
-from chatbot.db import DbConnector
+from chatbot.helix import HelixClient, shared_client
+from chatbot.moderation import ACTIONS, DELETE
+from chatbot.plugin_registry import PluginRegistry
+from chatbot.storage import StorageBackend
+from chatbot.templates import TemplateCache
+
+logger = logging.getLogger(__name__)
 
 START_TIME = datetime.now()
 RICH_EMOJI_URL = "https://github.com/willmcgugan/rich/blob/master/rich/_emoji_codes.py"
+NO_SERVICES: Mapping[str, Any] = MappingProxyType({})
+
+T = TypeVar("T")
 
 
 def send_message(connection: ServerConnection, channel: str, text: str):
     connection.privmsg(channel, text=f"{text}")
 
 
+class CommandContext(NamedTuple):
+    # everything a single invocation of a command knows about. It's a tuple so it is cheap to
+    # build and can't be changed under a handler's feet.
+    db_connector: StorageBackend
+    config: Config
+    command_name: str = ""
+    command_input: str = ""
+    # the display name, `user_login` is the name membership events and presence go by.
+    user_name: Optional[str] = None
+    user_login: Optional[str] = None
+    user_id: Optional[str] = None
+    user_badges: Tuple[str, ...] = ()
+    # the bot's in-memory subsystems (trackers, caches, registries...) by name, read only.
+    services: Mapping[str, Any] = NO_SERVICES
+
+
+def get_helix(context: CommandContext) -> HelixClient:
+    # the bot hands its client over as a service, anything else shares the process wide one.
+    helix = context.services.get("helix")
+    if helix is None:
+        helix = shared_client(context.config.client_id_api, context.config.bot_api_token)
+    return helix
+
+
+def call_upstream(context: CommandContext, upstream: str, func: Callable[[], T]) -> T:
+    # goes through the upstream's circuit breaker when the bot gave us one.
+    breaker = context.services.get("breakers", {}).get(upstream)
+    if breaker is None:
+        return func()
+    return breaker.call(func)
+
+
 class BaseCommand(ABC):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        self.db_connector = db_connector
-        self.config = config
+    """Handler for a chat command. `SPECIAL_COMMANDS` holds a single long-lived instance of each.
 
-    @property
-    def is_restricted(self):
-        return False
+    Handlers don't keep any state of their own, whatever an invocation needs comes in through the
+    `CommandContext` handed to `run`. `is_restricted` is a class attribute so the bot can turn
+    down a command before building anything for it.
+    """
 
-    def run(self):
+    __slots__ = ()
+    is_restricted: bool = False
+
+    def run(self, context: CommandContext) -> Optional[str]:
         raise NotImplementedError
 
 
 class ShoutoutCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        self.db_connector = db_connector
-        self.config = config
-        self.command_input = command_input
-
-    @property
-    def is_restricted(self):
-        return True
-
-    def run(self) -> Optional[str]:
-        user_name = self.command_input.strip("@")
-        search_channel_url = f"https://api.twitch.tv/helix/search/channels?query={user_name}"
-        headers = {
-            "Authorization": f"Bearer {self.config.bot_api_token}",
-            "Client-ID": self.config.client_id_api,
-        }
-        channel_search_response = httpx.get(search_channel_url, headers=headers)
-
-        if channel_search_response.status_code == 200:
-            channel_search_response_json = channel_search_response.json()
-            if channel_search_response_json.get("data"):
-                user_info = [
-                    user if user["broadcaster_login"] == user_name.lower() else None
-                    for user in channel_search_response_json["data"]
-                ]
-                found_user = list(filter(None, user_info))
-                if found_user:
-                    channel_data = found_user[0]
-                    display_name = channel_data["display_name"]
-                    url_suffix = channel_data["broadcaster_login"]
-                    return (
-                        f"You should check out {display_name} or give them a follow here: "
-                        f"https://twitch.tv/{url_suffix} <3"
-                    )
-                else:
-                    return f"{user_name} is not a valid user. Or could not be found"
+    __slots__ = ()
+    is_restricted = True
+
+    @staticmethod
+    def shoutout_message(channel_data: Dict[str, str]) -> str:
+        display_name = channel_data["display_name"]
+        url_suffix = channel_data["broadcaster_login"]
+        return (
+            f"You should check out {display_name} or give them a follow here: "
+            f"https://twitch.tv/{url_suffix} <3"
+        )
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        user_name = context.command_input.strip("@")
+        channel_lookups = context.services.get("channel_lookups")
+        if channel_lookups is not None:
+            channel_data = channel_lookups.get(user_name.lower())
+            if channel_data is not None:
+                return self.shoutout_message(channel_data)
+        try:
+            channels = get_helix(context).search_channels(user_name)
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Could not search helix for {user_name}: {e}")
+            if channel_lookups is not None:
+                channel_data = channel_lookups.get_stale(user_name.lower())
+                if channel_data is not None:
+                    return self.shoutout_message(channel_data)
+            return None
+
+        if channels:
+            found_user = [
+                channel for channel in channels if channel["broadcaster_login"] == user_name.lower()
+            ]
+            if found_user:
+                channel_data = {
+                    "display_name": found_user[0]["display_name"],
+                    "broadcaster_login": found_user[0]["broadcaster_login"],
+                }
+                if channel_lookups is not None:
+                    channel_lookups.set(user_name.lower(), channel_data)
+                return self.shoutout_message(channel_data)
             else:
-                return f"{user_name} doesn't seem to exist"
+                return f"{user_name} is not a valid user. Or could not be found"
         else:
-            return None
+            return f"{user_name} doesn't seem to exist"
+
+
+def get_uptime(context: CommandContext) -> Optional[str]:
+    # how long the channel has been live, None when it isn't. Helix errors are for the caller.
+    if not context.config.channel:
+        # without a channel configured there's nothing to ask helix about.
+        return None
+    streams = get_helix(context).get_streams(user_logins=[context.config.channel])
+    if not streams:
+        return None
+    # timestamp comes back in UTC so we need to compare to a UTC now later.
+    start_time = datetime.strptime(streams[0]["started_at"], "%Y-%m-%dT%H:%M:%SZ")
+    delta = (datetime.utcnow() - start_time).seconds
+    hours = delta // 3600
+    # we only do it for hours since that's the only one that's likely to be 0 for long
+    if hours:
+        hours_str = f"{hours} hours, "
+    else:
+        hours_str = ""
+    minutes = (delta // 60) % 60
+    seconds = delta % 60
+    return f"{hours_str}{minutes} minutes and {seconds} seconds"
 
 
 class UptimeCommand(BaseCommand):
     # TODO: introduce a cool down period for the api call but this might be hard
     # to test without having to introduce sleep and make the tests slow as hell to run.
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        self.db_connector = db_connector
-        self.config = config
-
-    def run(self):
-        url = f"https://api.twitch.tv/helix/streams?user_login={self.config.channel}"
-        headers = {
-            "Authorization": f"Bearer {self.config.bot_api_token}",
-            "Client-ID": self.config.client_id_api,
-        }
-        response = httpx.get(url, headers=headers)
-        response_json = response.json()
-        if response_json.get("data", []):
-            start_time = response_json["data"][0]["started_at"]
-            # timestamp comes back in UTC so we need to compare to a UTC now later.
-            start_time = datetime.strptime(
-                start_time,
-                "%Y-%m-%dT%H:%M:%SZ",
-            )
-            delta = (datetime.utcnow() - start_time).seconds
-            hours = delta // 3600
-            # we only do it for hours since that's the only one that's likely to be 0 for long
-            if hours:
-                hours_str = f"{hours} hours, "
-            else:
-                hours_str = ""
-            minutes = (delta // 60) % 60
-            seconds = delta % 60
-            return f"We've been online for {hours_str}{minutes} minutes and {seconds} seconds"
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        try:
+            uptime = get_uptime(context)
+        except (httpx.HTTPError, CircuitOpenError) as e:
+            logger.error(f"Could not get the stream of {context.config.channel}: {e}")
+            return None
+        if uptime is not None:
+            return f"We've been online for {uptime}"
         else:
-            return f"{self.config.channel} is not currently streaming"
+            return f"{context.config.channel} is not currently streaming"
 
 
 class SayHelloCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, user_name: str, **kwargs):
-        super().__init__(db_connector, config=config)
-        self.user_name = user_name
+    __slots__ = ()
 
-    def run(self):
-        message = f"Welcome to the stream, {self.user_name}"
+    def run(self, context: CommandContext) -> Optional[str]:
+        message = f"Welcome to the stream, {context.user_name}"
         return message
 
 
 class ListCommandsCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
+    __slots__ = ()
 
-    def run(self):
+    def run(self, context: CommandContext) -> Optional[str]:
         # TODO: find a way to get commands from the db too
-        db_commands, aliased_commands = self.db_connector.get_all_commands()
+        db_commands, aliased_commands = context.db_connector.get_all_commands()
         special_comands = list(SPECIAL_COMMANDS.keys())
+        plugins = context.services.get("plugins")
+        if plugins is not None:
+            special_comands += [
+                command_name
+                for command_name in plugins.command_names
+                if command_name not in SPECIAL_COMMANDS
+            ]
         if db_commands is None:
             db_commands = []
         all_commands = " !".join(db_commands + special_comands)
@@ -140,236 +200,255 @@ class ListCommandsCommand(BaseCommand):
 
 
 class TodayCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
+    __slots__ = ()
 
-    def run(self):
-        today_text = self.db_connector.retrive_command_response("today")
+    def run(self, context: CommandContext) -> Optional[str]:
+        today_text = context.db_connector.retrive_command_response("today")
         if today_text:
             return f"{START_TIME.strftime('%m/%d/%Y')} | {today_text}"
+        return None
 
 
 class SetTodayCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.today_text = command_input
-
-    @property
-    def is_restricted(self):
-        return True
+    __slots__ = ()
+    is_restricted = True
 
-    def run(self):
-        self.db_connector.update_command(command_name="today", command_response=self.today_text)
-        logging.info("Today has been set")
+    def run(self, context: CommandContext) -> Optional[str]:
+        context.db_connector.update_command(
+            command_name="today", command_response=context.command_input
+        )
+        logger.info("Today has been set")
+        return None
 
 
 class BotCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
+    __slots__ = ()
 
-    def run(self):
-        return self.db_connector.retrive_command_response("bot")
+    def run(self, context: CommandContext) -> Optional[str]:
+        return context.db_connector.retrive_command_response("bot")
 
 
 class SourceCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
+    __slots__ = ()
 
-    def run(self):
-        return self.db_connector.retrive_command_response("source")
+    def run(self, context: CommandContext) -> Optional[str]:
+        return context.db_connector.retrive_command_response("source")
 
 
 class SetSourceCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.source_text = command_input
-
-    @property
-    def is_restricted(self):
-        return True
+    __slots__ = ()
+    is_restricted = True
 
-    def run(self):
-        self.db_connector.update_command(command_name="source", command_response=self.source_text)
+    def run(self, context: CommandContext) -> Optional[str]:
+        context.db_connector.update_command(
+            command_name="source", command_response=context.command_input
+        )
+        return None
 
 
 class SetUserCountryCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.user_id = kwargs.get("user_id")
-        self.user_country = command_input.lower()
+    __slots__ = ()
 
-    @property
-    def is_restricted(self):
-        return False
-
-    def run(self):
+    def run(self, context: CommandContext) -> Optional[str]:
         try:
-            assert self.user_id is not None
-            self.db_connector.update_user_country(
-                user_id=self.user_id, user_country=self.user_country
+            assert context.user_id is not None
+            context.db_connector.update_user_country(
+                user_id=context.user_id, user_country=context.command_input.lower()
             )
+            user_profiles = context.services.get("user_profiles")
+            if user_profiles is not None:
+                user_profiles.invalidate(context.user_id)
         except AssertionError:
             return None
+        return None
 
 
 class SetUserEmojiCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.user_id = kwargs.get("user_id")
-        self.emoji_code = command_input.lower()
+    __slots__ = ()
 
-    @property
-    def is_restricted(self):
-        return False
-
-    def run(self):
+    def run(self, context: CommandContext):
+        emoji_code = context.command_input.lower()
         try:
-            assert self.user_id, "Could not get user_id"
-            assert self.emoji_code, (
+            assert context.user_id, "Could not get user_id"
+            assert emoji_code, (
                 "Please provide an emoji code after !setemoji. "
                 f"You can find the full list here: {RICH_EMOJI_URL}"
             )
-            assert self.emoji_code in list(EMOJI.keys()), (
+            assert emoji_code in EMOJI, (
                 "This emoji is invalid. Please choose one from this list: " f"{RICH_EMOJI_URL}"
             )
-            self.db_connector.update_user_emoji(user_id=self.user_id, user_emoji=self.emoji_code)
+            context.db_connector.update_user_emoji(user_id=context.user_id, user_emoji=emoji_code)
+            user_profiles = context.services.get("user_profiles")
+            if user_profiles is not None:
+                user_profiles.invalidate(context.user_id)
         except AssertionError as e:
             return e
+        return None
 
 
 class ListEmojisCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        self.message = "You can find the list of supported emojis here: " f"{RICH_EMOJI_URL}"
+    __slots__ = ()
+    MESSAGE = "You can find the list of supported emojis here: " f"{RICH_EMOJI_URL}"
 
-    @property
-    def is_restricted(self):
-        return False
+    def run(self, context: CommandContext) -> Optional[str]:
+        return self.MESSAGE
 
-    def run(self):
-        return self.message
+
+def _touser(context: CommandContext, command_name: str) -> str:
+    # `!hug @someone` hugs someone, a bare `!hug` the caller. What chat typed can't turn the
+    # response into a chat command like /ban or .timeout.
+    words = context.command_input.split()
+    return words[0].lstrip("@/.") if words else context.user_name or ""
+
+
+def _template_count(context: CommandContext, command_name: str) -> str:
+    count = context.db_connector.increment_command_count(command_name)
+    return str(count) if count is not None else "?"
+
+
+def _template_uptime(context: CommandContext, command_name: str) -> str:
+    try:
+        uptime = get_uptime(context)
+    except (httpx.HTTPError, CircuitOpenError) as e:
+        logger.error(f"Could not get the stream of {context.config.channel}: {e}")
+        return "?"
+    return uptime if uptime is not None else "offline"
+
+
+# what `{name}` in a text command's response turns into. A resolver only runs when its
+# variable is in the response, `{count}` writes to the db and `{uptime}` calls twitch.
+TEMPLATE_VARIABLES: Dict[str, Callable[[CommandContext, str], str]] = {
+    "user": lambda context, command_name: context.user_name or "",
+    "touser": _touser,
+    "channel": lambda context, command_name: context.config.channel or "",
+    "count": _template_count,
+    "uptime": _template_uptime,
+}
+TEMPLATES = TemplateCache(TEMPLATE_VARIABLES)
+
+
+def render_template(context: CommandContext, command_name: str, response: str) -> str:
+    return TEMPLATES.get(command_name, response).render(
+        lambda variable: TEMPLATE_VARIABLES[variable](context, command_name)
+    )
 
 
 class TextCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
-        self.command_name = kwargs.get("command_name", "no command name")
+    __slots__ = ()
 
-    def run(self) -> Optional[str]:
+    def run(self, context: CommandContext) -> Optional[str]:
+        command_name = context.command_name or "no command name"
         # check if command is an alias
-        aliased_command = self.db_connector.get_original_command(self.command_name)
+        aliased_command = context.db_connector.get_original_command(command_name)
         if aliased_command:
-            print(f"{self.command_name} is mapped to {aliased_command}")
-            self.command_name = aliased_command
-        command_response = self.db_connector.retrive_command_response(
-            command_name=self.command_name
-        )
+            logger.debug(f"{command_name} is mapped to {aliased_command}")
+            command_name = aliased_command
+        command_response = context.db_connector.retrive_command_response(command_name=command_name)
         if command_response is not None:
-            return command_response
+            return render_template(context, command_name, command_response)
         else:
-            return f"{self.command_name} does not exist"
+            unknown_commands = context.services.get("unknown_commands")
+            if unknown_commands is not None:
+                unknown_commands.record(command_name, context.user_id)
+            return f"{command_name} does not exist"
 
 
 class TextCommandSetter(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.command_input = command_input
-
-    @property
-    def is_restricted(self):
-        return True
-
-    def match_command(self):
-        self.mactched_command = re.match(
-            r"^(?P<command_name>\w+)\s?(?P<command_response>.*)", self.command_input
-        )
-        if self.mactched_command is not None:
-            self.command_name, self.command_response = self.mactched_command.groups()
-
-    def run(self):
-        pass
+    __slots__ = ()
+    is_restricted = True
+    COMMAND_PATTERN = re.compile(r"^(?P<command_name>\w+)\s?(?P<command_response>.*)")
+
+    @classmethod
+    def match_command(cls, command_input: str) -> Tuple[Optional[str], Optional[str]]:
+        matched_command = cls.COMMAND_PATTERN.match(command_input)
+        if matched_command is None:
+            return None, None
+        command_name, command_response = matched_command.groups()
+        return command_name, command_response
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        return None
 
 
 class SetTextCommand(TextCommandSetter):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config, command_input)
-        self.match_command()
+    __slots__ = ()
 
-    def run(self):
-        if self.command_name and self.command_response:
+    def run(self, context: CommandContext) -> Optional[str]:
+        command_name, command_response = self.match_command(context.command_input)
+        if command_name and command_response:
             # TODO: maybe we want to load the commands in a global so that we don't query the db every time
-            command_exists = self.db_connector.retrive_command_response(
-                command_name=self.command_name
+            command_exists = context.db_connector.retrive_command_response(
+                command_name=command_name
             )
             if command_exists:
-                self.db_connector.update_command(
-                    command_name=self.command_name, command_response=self.command_response
+                context.db_connector.update_command(
+                    command_name=command_name, command_response=command_response
                 )
-                return f"{self.command_name} command successfully updated"
+                TEMPLATES.invalidate(command_name)
+                return f"{command_name} command successfully updated"
             else:
-                return f"{self.command_name} does not exist yet"
+                return f"{command_name} does not exist yet"
         else:
             return None
 
 
 class AddTextCommand(TextCommandSetter):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config, command_input, **kwargs)
-        self.match_command()
-
-    def run(self):
-        if self.command_name and self.command_input:
-            command_exists = self.db_connector.retrive_command_response(
-                command_name=self.command_name
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        command_name, command_response = self.match_command(context.command_input)
+        if command_name and context.command_input:
+            command_exists = context.db_connector.retrive_command_response(
+                command_name=command_name
             )
             if command_exists:
-                return f"{self.command_name} already exist use !set to update it"
+                return f"{command_name} already exist use !set to update it"
             else:
-                self.db_connector.add_new_command(
-                    command_name=self.command_name, command_response=self.command_response
+                context.db_connector.add_new_command(
+                    command_name=command_name, command_response=command_response
                 )
-                return f"{self.command_name} command successfully added"
+                return f"{command_name} command successfully added"
+        return None
 
 
 class AddAliasCommand(TextCommandSetter):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config, command_input, **kwargs)
-        self.match_command()
+    __slots__ = ()
 
-    def run(self):
+    def run(self, context: CommandContext) -> Optional[str]:
         # DON'T MISS THIS:
         # command name maps to the ALIAS
         # command_response mapts to the MAPPED/OG Command
-        if self.command_name and self.command_response:
-            if self.command_response in SPECIAL_COMMANDS.keys():
-                return f"'{self.command_response}' is a special command and cannot be aliased"
-            command_exists = self.db_connector.retrive_command_response(
-                command_name=self.command_response
+        command_name, command_response = self.match_command(context.command_input)
+        if command_name and command_response:
+            if command_response in SPECIAL_COMMANDS:
+                return f"'{command_response}' is a special command and cannot be aliased"
+            command_exists = context.db_connector.retrive_command_response(
+                command_name=command_response
             )
             if command_exists:
-                self.db_connector.add_command_alias(self.command_name, self.command_response)
-                return f"You can now get !{self.command_response} by typing !{self.command_name}"
+                context.db_connector.add_command_alias(command_name, command_response)
+                return f"You can now get !{command_response} by typing !{command_name}"
             else:
-                return f"{self.command_response} does not exist, so it can't be aliased..."
+                return f"{command_response} does not exist, so it can't be aliased..."
+        return None
 
 
 class RemoveTextCommand(TextCommandSetter):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config, command_input, **kwargs)
-        self.match_command()
-
-    def run(self) -> Optional[str]:
-        if self.command_name:
-            self.db_connector.remove_command(self.command_name)
-            return f"{self.command_name} successfully removed"
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        command_name, _ = self.match_command(context.command_input)
+        if command_name:
+            context.db_connector.remove_command(command_name)
+            TEMPLATES.invalidate(command_name)
+            return f"{command_name} successfully removed"
+        return None
 
 
 class AddZodiacSignCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, command_input: str, **kwargs):
-        super().__init__(db_connector, config)
-        self.user_id = kwargs.get("user_id")
-        self.user_name = kwargs.get("user_name")
-        self.user_sign = command_input.lower()
-        self.acceptable_signs = [
+    __slots__ = ()
+    ACCEPTABLE_SIGNS = frozenset(
+        [
             "aquarius",
             "pisces",
             "aries",
@@ -383,78 +462,553 @@ class AddZodiacSignCommand(BaseCommand):
             "sagittarius",
             "capricorn",
         ]
+    )
 
-    @property
-    def is_restricted(self):
-        return False
-
-    def run(self):
+    def run(self, context: CommandContext) -> Optional[str]:
+        user_sign = context.command_input.lower()
         try:
-            assert self.user_id is not None
-            if self.user_sign in self.acceptable_signs:
-                self.db_connector.update_user_sign(user_id=self.user_id, zodiac_sign=self.user_sign)
+            assert context.user_id is not None
+            if user_sign in self.ACCEPTABLE_SIGNS:
+                context.db_connector.update_user_sign(
+                    user_id=context.user_id, zodiac_sign=user_sign
+                )
             else:
-                return f"{self.user_sign} is not a valid zodiac sign"
+                return f"{user_sign} is not a valid zodiac sign"
         except AssertionError:
-            logging.error(f"{self.user_name} could not be found in the database")
+            logger.error(f"{context.user_name} could not be found in the database")
             return None
+        return None
 
 
 class HoroscopeCommand(BaseCommand):
-    def __init__(self, db_connector: DbConnector, config: Config, **kwargs):
-        super().__init__(db_connector, config)
-        self.user_id = kwargs.get("user_id")
-        self.user_name = kwargs.get("user_name")
+    __slots__ = ()
+    BASE_URL = "https://ohmanda.com/api/horoscope/"
 
-    def run(self) -> Optional[str]:
-        base_url = "https://ohmanda.com/api/horoscope/"
+    @classmethod
+    def fetch_horoscope(cls, user_sign: str) -> Dict[str, Any]:
+        response = httpx.get(f"{cls.BASE_URL}{user_sign}")
+        response.raise_for_status()
+        return response.json()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        horoscopes = context.services.get("horoscopes")
         try:
-            assert self.user_id is not None
+            assert context.user_id is not None
 
-            user_sign = self.db_connector.get_user_sign(self.user_id)
+            user_sign = context.db_connector.get_user_sign(context.user_id)
 
+            if user_sign and horoscopes is not None:
+                cached_horoscope = horoscopes.get(user_sign)
+                if cached_horoscope is not None:
+                    return cached_horoscope
             if user_sign:
-                horoscope_data = httpx.get(f"{base_url}{user_sign}")
-                if horoscope_data.status_code == 200:
-                    horoscope_data = horoscope_data.json()
-                    horoscope_text = (
-                        f"{user_sign.title()}: "
-                        f"{horoscope_data.get('horoscope', 'Did not get a horoscope from the API')}"
+                try:
+                    horoscope_data = call_upstream(
+                        context, "ohmanda", lambda: self.fetch_horoscope(user_sign)
                     )
-                    return horoscope_text
-                else:
+                except (httpx.HTTPError, CircuitOpenError) as e:
+                    logger.error(f"Could not get the horoscope for {user_sign}: {e}")
+                    # yesterday's horoscope beats no horoscope
+                    if horoscopes is not None:
+                        stale_horoscope = horoscopes.get_stale(user_sign)
+                        if stale_horoscope is not None:
+                            return stale_horoscope
                     return (
                         f"Something went wrong with the API when getting horoscope for {user_sign}"
                     )
+                horoscope_text = (
+                    f"{user_sign.title()}: "
+                    f"{horoscope_data.get('horoscope', 'Did not get a horoscope from the API')}"
+                )
+                if horoscopes is not None and horoscope_data.get("horoscope"):
+                    horoscopes.set(user_sign, horoscope_text)
+                return horoscope_text
             else:
-                return f"could not find {self.user_name}'s sign in the database"
+                return f"could not find {context.user_name}'s sign in the database"
         except Exception:
             raise
 
 
-SPECIAL_COMMANDS: Dict[str, Type[BaseCommand]] = {
-    "hello": SayHelloCommand,
-    "commands": ListCommandsCommand,
-    "uptime": UptimeCommand,
-    "setcountry": SetUserCountryCommand,
-    "setemoji": SetUserEmojiCommand,
-    "listemojis": ListEmojisCommand,
-    "set": SetTextCommand,
-    "add": AddTextCommand,
-    "remove": RemoveTextCommand,
-    "so": ShoutoutCommand,
-    "addzodiacsign": AddZodiacSignCommand,
-    "horoscope": HoroscopeCommand,
-    "alias": AddAliasCommand,
+class ListUnknownCommandsCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    DEFAULT_LIMIT = 5
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        unknown_commands = context.services.get("unknown_commands")
+        if unknown_commands is None:
+            return None
+        command_input = context.command_input.strip()
+        limit = (
+            int(command_input)
+            if command_input.isascii() and command_input.isdigit()
+            else self.DEFAULT_LIMIT
+        )
+        top_commands = unknown_commands.top(limit=limit)
+        if not top_commands:
+            return "Nobody tried a command the bot doesn't know yet"
+        top_commands_str = ", ".join(
+            f"!{command_name} ({attempts}x by {users} users)"
+            for command_name, attempts, users in top_commands
+        )
+        return f"Most requested missing commands: {top_commands_str}"
+
+
+class DropLeaderboardCommand(BaseCommand):
+    __slots__ = ()
+    DEFAULT_LIMIT = 5
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        drop_results = context.services.get("drop_results")
+        if drop_results is None:
+            return None
+        leaderboard = drop_results.leaderboard(limit=self.DEFAULT_LIMIT)
+        if not leaderboard:
+            return "Nobody landed a drop yet"
+        leaderboard_str = " | ".join(
+            f"{rank}. {user_name} ({score:g} pts)"
+            for rank, (user_name, score) in enumerate(leaderboard, start=1)
+        )
+        return f"Drop leaderboard: {leaderboard_str}"
+
+
+class StatsCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        activity = context.services.get("activity")
+        if activity is None or context.user_id is None:
+            return None
+        stats = activity.get_stats(context.user_id)
+        message = f"{context.user_name}: {stats.message_count} messages"
+        if stats.first_chatted_at:
+            message += f", chatting since {stats.first_chatted_at.strftime('%m/%d/%Y')}"
+        if stats.stream_streak:
+            message += f", {stats.stream_streak} stream(s) in a row"
+        return message
+
+
+class WatchTimeCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        presence = context.services.get("presence")
+        requested = context.command_input.strip().lstrip("@")
+        login = requested or context.user_login or context.user_name
+        user_name = requested or context.user_name or login
+        if presence is None or not login:
+            return None
+        minutes = int(presence.watch_time(login) // 60)
+        if not minutes:
+            return f"{user_name} has only just got here"
+        hours, minutes = divmod(minutes, 60)
+        watched = f"{hours}h {minutes}m" if hours else f"{minutes}m"
+        return f"{user_name} has been watching for {watched}"
+
+
+class PointsCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        points = context.services.get("points")
+        if points is None or context.user_id is None:
+            return None
+        return f"{context.user_name}: {points.balance(context.user_id)} points"
+
+
+class TopPointsCommand(BaseCommand):
+    __slots__ = ()
+    LIMIT = 5
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        points = context.services.get("points")
+        if points is None:
+            return None
+        top = points.top(self.LIMIT)
+        if not top:
+            return "Nobody has any points yet"
+        return " | ".join(
+            f"{rank}. {user_name}: {balance}" for rank, (user_name, balance) in enumerate(top, 1)
+        )
+
+
+class ReloadPluginCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        plugins = context.services.get("plugins")
+        if plugins is None:
+            return None
+        plugin_name = context.command_input.strip() or None
+        reloaded = plugins.reload(plugin_name)
+        if plugin_name is not None and plugin_name not in reloaded:
+            return f"Could not reload {plugin_name}"
+        if not reloaded:
+            return "No plugin was loaded yet, nothing to reload"
+        return f"Reloaded: {', '.join(reloaded)}"
+
+
+class FloodStatsCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        flood_filter = context.services.get("flood_filter")
+        if flood_filter is None:
+            return None
+        suppressed = flood_filter.suppressed
+        suppressed_str = ", ".join(f"{reason}: {count}" for reason, count in suppressed.items())
+        return (
+            f"Suppressed {sum(suppressed.values())} of {flood_filter.seen} lines"
+            f"{f' ({suppressed_str})' if suppressed_str else ''}, "
+            f"chat is at {flood_filter.channel_rate:.1f} lines/s"
+        )
+
+
+class LoadLevelCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        load_shedder = context.services.get("load_shedder")
+        if load_shedder is None:
+            return None
+        return (
+            f"Load level {load_shedder.level} ({load_shedder.level_name}), "
+            f"lagging {load_shedder.lag:.1f}s behind chat"
+        )
+
+
+class AddQuoteCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        quote_text = context.command_input.strip()
+        if not quote_text:
+            return "Please provide the quote after !addquote"
+        quote_id = context.db_connector.add_quote(quote_text, added_by=context.user_name)
+        if quote_id is not None:
+            return f"Quote #{quote_id} added"
+        return None
+
+
+class QuoteCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        command_input = context.command_input.strip()
+        if not command_input:
+            quote = context.db_connector.get_random_quote()
+            if quote is None:
+                return "There are no quotes yet, add one with !addquote"
+        elif command_input.lstrip("#").isascii() and command_input.lstrip("#").isdigit():
+            quote_id = int(command_input.lstrip("#"))
+            # past what an INTEGER column holds there's no such quote, and the query overflows.
+            quote = context.db_connector.get_quote(quote_id) if quote_id < 2**63 else None
+            if quote is None:
+                return f"Quote {command_input} does not exist"
+        else:
+            quotes = context.db_connector.search_quotes(command_input.split(), limit=1)
+            if not quotes:
+                return f"No quote matches '{command_input}'"
+            quote = quotes[0]
+        quote_id, quote_text = quote
+        return f"#{quote_id}: {quote_text}"
+
+
+class TimerCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    USAGE = (
+        "Usage: !timer add <name> <minutes> <min_lines> <message> | "
+        "!timer remove <name> | !timer list"
+    )
+    ADD_PATTERN = re.compile(
+        r"^add\s+(?P<name>\w+)\s+(?P<minutes>\d+)\s+(?P<min_lines>\d+)\s+(?P<message>.+)$"
+    )
+    REMOVE_PATTERN = re.compile(r"^remove\s+(?P<name>\w+)$")
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        announcements = context.services.get("announcements")
+        if announcements is None:
+            return None
+        command_input = context.command_input.strip()
+        add_match = self.ADD_PATTERN.match(command_input)
+        remove_match = self.REMOVE_PATTERN.match(command_input)
+        if add_match is not None:
+            name, minutes, min_lines, message = add_match.groups()
+            if int(minutes) < 1:
+                return "Timers can't run more often than every minute"
+            announcements.set_timer(name, message, int(minutes), int(min_lines))
+            return f"Timer {name} will post every {minutes} minutes (if {min_lines}+ lines)"
+        if remove_match is not None:
+            name = remove_match.group("name")
+            if announcements.remove_timer(name):
+                return f"Timer {name} removed"
+            return f"Timer {name} does not exist"
+        if command_input == "list":
+            if not announcements.timers:
+                return "No timers set"
+            return " | ".join(
+                f"{timer.name}: every {timer.interval_minutes}m, {timer.min_lines}+ lines"
+                for timer in announcements.timers.values()
+            )
+        return self.USAGE
+
+
+class BreakersCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        breakers = context.services.get("breakers")
+        if not breakers:
+            return None
+        breakers_str = []
+        for name, breaker in breakers.items():
+            metrics = breaker.metrics()
+            breakers_str.append(
+                f"{name}: {metrics['state']}, {metrics['failure_rate']:.0%} of recent calls "
+                f"failed, {metrics['rejected']} rejected, opened {metrics['times_opened']}x"
+            )
+        return " | ".join(breakers_str)
+
+
+class ProfileCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    DEFAULT_SECONDS = 30
+    MAX_SECONDS = 600
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        profiler = context.services.get("profiler")
+        if profiler is None:
+            return None
+        command_input = context.command_input.strip()
+        if command_input == "stop":
+            if not profiler.running:
+                return "Not profiling"
+            profiler.stop()
+            output_path = profiler.output_path or self.output_path(context)
+            profiler.write(output_path)
+            return f"Wrote {profiler.samples} samples to {output_path}"
+        seconds = (
+            int(command_input)
+            if command_input.isascii() and command_input.isdigit()
+            else self.DEFAULT_SECONDS
+        )
+        seconds = min(max(seconds, 1), self.MAX_SECONDS)
+        output_path = self.output_path(context)
+        if not profiler.start(duration=seconds, output_path=output_path):
+            return "Already profiling, !profile stop ends it"
+        return f"Profiling for {seconds}s, samples go to {output_path}"
+
+    @staticmethod
+    def output_path(context: CommandContext) -> str:
+        file_name = f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed"
+        return os.path.join(context.config.profile_dir, file_name)
+
+
+class BanTermCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    USAGE = f"Usage: !banterm <term> [{'|'.join(ACTIONS)}], *term* matches inside words"
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        moderation = context.services.get("moderation")
+        if moderation is None:
+            return None
+        term, _, action = context.command_input.strip().rpartition(" ")
+        if action not in ACTIONS:
+            term, action = context.command_input, DELETE
+        try:
+            term = moderation.add_term(term, action, added_by=context.user_id)
+        except ValueError:
+            return self.USAGE
+        return f"Banned {term}, messages with it get the {action} treatment"
+
+
+class UnbanTermCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        moderation = context.services.get("moderation")
+        if moderation is None or not context.command_input.strip():
+            return None
+        if moderation.remove_term(context.command_input):
+            return f"{context.command_input.strip().lower()} is no longer banned"
+        return f"{context.command_input.strip().lower()} wasn't banned"
+
+
+class BannedTermsCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        # counts only, listing the terms would post them in chat.
+        moderation = context.services.get("moderation")
+        if moderation is None:
+            return None
+        per_action = Counter(moderation.actions.values())
+        return (
+            f"{len(moderation.actions)} banned terms "
+            f"({', '.join(f'{action}: {per_action[action]}' for action in ACTIONS)}), "
+            f"caught {sum(moderation.caught.values())} messages"
+        )
+
+
+class PollCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    USAGE = 'Usage: !poll start "question" option1 option2 ... | !poll end | !poll results'
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        polls = context.services.get("polls")
+        if polls is None:
+            return None
+        action, _, rest = context.command_input.strip().partition(" ")
+        if action == "start":
+            try:
+                question, *options = shlex.split(rest)
+                polls.start(question, options, started_by=context.user_id)
+            except ValueError as e:
+                return f"{e}. {self.USAGE}" if rest else self.USAGE
+            return f"Poll: {question} Vote by typing the number: " + " | ".join(
+                f"{position}) {option}" for position, option in enumerate(options, start=1)
+            )
+        if action == "end":
+            poll = polls.end()
+            return f"Poll closed! {poll.results()}" if poll else "No poll running"
+        if action in ("", "results"):
+            return polls.poll.results() if polls.poll else "No poll running"
+        return self.USAGE
+
+
+class RaffleCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        # entering is silent, a reply per entrant would flood chat during the opening burst.
+        raffles = context.services.get("raffles")
+        if raffles is not None and context.user_id:
+            raffles.enter(context.user_id, context.user_name or "", context.user_badges)
+        return None
+
+
+class GiveawayCommand(BaseCommand):
+    __slots__ = ()
+    is_restricted = True
+    USAGE = "Usage: !giveaway open [seed] | !giveaway draw | !giveaway close"
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        raffles = context.services.get("raffles")
+        if raffles is None:
+            return None
+        action, _, seed = context.command_input.strip().partition(" ")
+        if action == "open":
+            seed = seed.strip()
+            if seed and not (seed.isascii() and seed.isdigit()):
+                return self.USAGE
+            try:
+                raffles.open(int(seed) if seed else None)
+            except ValueError as e:
+                return str(e)
+            return "Giveaway open! Type !raffle to enter"
+        if raffles.raffle is None:
+            return "No giveaway running, !giveaway open starts one"
+        if action == "draw":
+            raffle = raffles.raffle
+            winner = raffle.draw()
+            if winner is None:
+                return "Nobody left to draw"
+            return (
+                f"Congrats {raffle.entrants[winner][0]}! Drawn from {len(raffle.entrants)} "
+                f"entrants (seed {raffle.seed})"
+            )
+        if action == "close":
+            raffle = raffles.close()
+            return f"Giveaway closed with {len(raffle.entrants)} entrants"
+        if action == "":
+            return f"{len(raffles.raffle.entrants)} entrants so far"
+        return self.USAGE
+
+
+class TopEmotesCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        emotes = context.services.get("emotes")
+        if emotes is None:
+            return None
+        requested = context.command_input.strip()
+        limit = (
+            min(int(requested), 10)
+            if requested.isascii() and requested.isdigit() and int(requested) > 0
+            else 5
+        )
+        top = emotes.top(f"#{context.config.channel}", limit)
+        if not top:
+            return "No emotes used yet this stream"
+        # ~ marks counts that may be a bit high, the emote got in after the counters filled up.
+        return "Top emotes this stream: " + ", ".join(
+            f"{emote} {'~' if error else ''}{count}" for emote, count, error in top
+        )
+
+
+SPECIAL_COMMANDS: Dict[str, BaseCommand] = {
+    "hello": SayHelloCommand(),
+    "commands": ListCommandsCommand(),
+    "uptime": UptimeCommand(),
+    "setcountry": SetUserCountryCommand(),
+    "setemoji": SetUserEmojiCommand(),
+    "listemojis": ListEmojisCommand(),
+    "set": SetTextCommand(),
+    "add": AddTextCommand(),
+    "remove": RemoveTextCommand(),
+    "so": ShoutoutCommand(),
+    "addzodiacsign": AddZodiacSignCommand(),
+    "horoscope": HoroscopeCommand(),
+    "alias": AddAliasCommand(),
+    "unknowncommands": ListUnknownCommandsCommand(),
+    "droplb": DropLeaderboardCommand(),
+    "stats": StatsCommand(),
+    "watchtime": WatchTimeCommand(),
+    "points": PointsCommand(),
+    "top": TopPointsCommand(),
+    "reload": ReloadPluginCommand(),
+    "floodstats": FloodStatsCommand(),
+    "load": LoadLevelCommand(),
+    "addquote": AddQuoteCommand(),
+    "quote": QuoteCommand(),
+    "timer": TimerCommand(),
+    "breakers": BreakersCommand(),
+    "profile": ProfileCommand(),
+    "banterm": BanTermCommand(),
+    "unbanterm": UnbanTermCommand(),
+    "bannedterms": BannedTermsCommand(),
+    "poll": PollCommand(),
+    "raffle": RaffleCommand(),
+    "giveaway": GiveawayCommand(),
+    "topemotes": TopEmotesCommand(),
 }
+TEXT_COMMAND = TextCommand()
 COMMANDS_TO_IGNORE: List[str] = ["drop"]
 
 
-def commands_factory(command_name: str) -> Optional[Type[BaseCommand]]:
+def commands_factory(
+    command_name: str, plugins: Optional[PluginRegistry] = None
+) -> Optional[BaseCommand]:
     command = SPECIAL_COMMANDS.get(command_name)
     if command is not None:
         return command
-    elif command_name not in COMMANDS_TO_IGNORE:
-        return TextCommand
+    if plugins is not None:
+        command = plugins.get(command_name)
+        if command is not None:
+            return command
+    if command_name not in COMMANDS_TO_IGNORE:
+        return TEXT_COMMAND
     else:
         return None
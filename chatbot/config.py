@@ -1,9 +1,9 @@
-import logging
 import os
 
-import httpx
 from dotenv import load_dotenv
 
+from chatbot.helix import shared_client
+
 load_dotenv(os.path.join(os.path.dirname(__file__), "bot_env_vars.env"))
 
 
@@ -14,22 +14,102 @@ class Config:
         self.bot_name = os.getenv("BOT_NAME")
         self.channel = os.getenv("CHANNEL")
         self.client_id_api = os.getenv("CLIENT_ID_API")
-        self.api_url = (
-            "https://id.twitch.tv/oauth2/token"
-            f"?client_id={self.client_id_api}"
-            f"&client_secret={self.client_secret}"
-            "&grant_type=client_credentials"
+        # point these at chatbot.irc_mock.FakeTwitchIRC to run the bot locally.
+        self.irc_server = os.getenv("IRC_SERVER", "irc.chat.twitch.tv")
+        self.irc_port = int(os.getenv("IRC_PORT", "6667"))
+        # any SQLAlchemy url, defaults to the sqlite file under db/prod/ when not set.
+        self.database_url = os.getenv("DATABASE_URL")
+        self.unknown_commands_flush_interval = int(
+            os.getenv("UNKNOWN_COMMANDS_FLUSH_INTERVAL", "60")
+        )
+        # user that posts the drop game results in chat, drop tracking is off when not set.
+        self.drop_bot_name = os.getenv("DROP_BOT_NAME")
+        self.drop_result_pattern = os.getenv("DROP_RESULT_PATTERN")
+        self.drop_results_flush_interval = int(os.getenv("DROP_RESULTS_FLUSH_INTERVAL", "60"))
+        self.activity_flush_interval = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", "60"))
+        self.presence_flush_interval = int(os.getenv("PRESENCE_FLUSH_INTERVAL", "60"))
+        # chatters we never saw JOIN stop counting as present this long after their last line.
+        self.presence_idle_timeout = int(os.getenv("PRESENCE_IDLE_TIMEOUT", "600"))
+        # extra directories to look for command plugins in, separated like PATH is.
+        self.plugin_dirs = [d for d in os.getenv("PLUGIN_DIRS", "").split(os.pathsep) if d]
+        self.flood_user_window = float(os.getenv("FLOOD_USER_WINDOW", "10"))
+        self.flood_user_max_messages = int(os.getenv("FLOOD_USER_MAX_MESSAGES", "5"))
+        self.flood_channel_window = float(os.getenv("FLOOD_CHANNEL_WINDOW", "10"))
+        self.flood_channel_max_duplicates = int(os.getenv("FLOOD_CHANNEL_MAX_DUPLICATES", "3"))
+        # lag in seconds at which the bot starts shedding work, one per degradation level.
+        self.load_shedding_thresholds = [
+            float(t) for t in os.getenv("LOAD_SHEDDING_THRESHOLDS", "2,5,10").split(",")
+        ]
+        self.cache_snapshot_path = os.getenv(
+            "CACHE_SNAPSHOT_PATH",
+            os.path.join(os.path.dirname(__file__), "../db/prod/cache_snapshot.json.gz"),
+        )
+        self.cache_snapshot_interval = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300"))
+        self.cache_snapshot_max_age = int(os.getenv("CACHE_SNAPSHOT_MAX_AGE", str(24 * 3600)))
+        self.user_profiles_ttl = int(os.getenv("USER_PROFILES_TTL", str(6 * 3600)))
+        self.horoscopes_ttl = int(os.getenv("HOROSCOPES_TTL", "3600"))
+        self.channel_lookups_ttl = int(os.getenv("CHANNEL_LOOKUPS_TTL", str(24 * 3600)))
+        # how long past their ttl cached answers may still be served while their api is down.
+        self.horoscopes_stale_for = int(os.getenv("HOROSCOPES_STALE_FOR", str(24 * 3600)))
+        self.channel_lookups_stale_for = int(
+            os.getenv("CHANNEL_LOOKUPS_STALE_FOR", str(7 * 24 * 3600))
         )
+        # circuit breakers around ohmanda and twitch, see chatbot/circuit_breaker.py
+        self.breaker_failure_rate = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+        self.breaker_min_calls = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+        self.breaker_open_for = float(os.getenv("BREAKER_OPEN_FOR", "30"))
+        # loyalty points, see chatbot/points.py. Costs are "command=points,...", a command
+        # with a cost only runs if its caller can pay for it.
+        self.points_per_message = int(os.getenv("POINTS_PER_MESSAGE", "1"))
+        self.points_per_minute = int(os.getenv("POINTS_PER_MINUTE", "10"))
+        self.points_active_window = int(os.getenv("POINTS_ACTIVE_WINDOW", "600"))
+        self.points_costs = {
+            command_name.strip(): int(cost)
+            for command_name, _, cost in (
+                item.partition("=") for item in os.getenv("POINTS_COSTS", "").split(",") if item
+            )
+        }
+        # how long a message with a banned term set to "timeout" times its author out for.
+        self.moderation_timeout_seconds = int(os.getenv("MODERATION_TIMEOUT_SECONDS", "600"))
+        # polls, see chatbot/polls.py. With POLL_LAST_VOTE_WINS=false first votes stick.
+        self.poll_results_interval = int(os.getenv("POLL_RESULTS_INTERVAL", "30"))
+        self.poll_last_vote_wins = os.getenv("POLL_LAST_VOTE_WINS", "true").lower() in ("1", "true")
+        # raffle entry weight per badge, "badge=weight,...". Everyone else's entry counts once.
+        self.raffle_badge_weights = {
+            badge.strip(): int(weight)
+            for badge, _, weight in (
+                item.partition("=")
+                for item in os.getenv("RAFFLE_BADGE_WEIGHTS", "subscriber=2").split(",")
+                if item
+            )
+        }
+        # emote usage, see chatbot/emotes.py. Memory per channel is fixed by EMOTES_CAPACITY.
+        self.emotes_capacity = int(os.getenv("EMOTES_CAPACITY", "200"))
+        self.emotes_snapshot_interval = int(os.getenv("EMOTES_SNAPSHOT_INTERVAL", "300"))
+        # sampling profiler, started with `python -m chatbot --profile` or the !profile command.
+        self.profile_interval = float(os.getenv("PROFILE_INTERVAL", "0.01"))
+        self.profile_dir = os.getenv(
+            "PROFILE_DIR", os.path.join(os.path.dirname(__file__), "../db/prod/profiles/")
+        )
+        # headless drops the terminal rendering and logs JSON lines to LOG_PATH instead, see
+        # chatbot/json_log.py. Levels per logger are "chatbot.db=WARNING,chatbot.bot=DEBUG,...".
+        self.headless = os.getenv("HEADLESS", "false").lower() in ("1", "true", "yes")
+        self.log_path = os.getenv(
+            "LOG_PATH", os.path.join(os.path.dirname(__file__), "../db/prod/logs/bot.jsonl")
+        )
+        self.log_max_bytes = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.log_backup_count = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+        self.log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.log_levels = {
+            logger_name.strip(): level.strip().upper()
+            for logger_name, _, level in (
+                item.partition("=") for item in os.getenv("LOG_LEVELS", "").split(",") if item
+            )
+        }
         self.bot_api_token = self.get_bot_api_token()
 
     def get_bot_api_token(self):
-        r = httpx.post(self.api_url)
-        if r.status_code == 200 and r.json() and r.json().get("access_token"):
-            return r.json()["access_token"]
-        else:
-            logging.error(
-                f"we did not get an access_token from twitch. Status code: {r.status_code}"
-            )
+        return shared_client(self.client_id_api).get_app_access_token(self.client_secret)
 
 
 if __name__ == "__main__":
@@ -6,35 +6,78 @@
 
 import logging
 import os
-from datetime import datetime
-from typing import List, Optional, Tuple
+import random
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 from sqlalchemy import (
     Column,
+    Date,
     DateTime,
+    Float,
+    ForeignKey,
+    Integer,
     MetaData,
     String,
     Table,
     create_engine,
     delete,
+    func,
     insert,
     select,
+    text,
     update,
 )
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 
+from chatbot.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# full text index over quotes.quote_text. It's an external content table so the text isn't
+# stored twice, the triggers keep the index in sync with whatever happens to the quotes table.
+QUOTES_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS quotes_fts "
+    "USING fts5(quote_text, content='quotes', content_rowid='quote_id')",
+    "CREATE TRIGGER IF NOT EXISTS quotes_ai AFTER INSERT ON quotes BEGIN "
+    "INSERT INTO quotes_fts(rowid, quote_text) VALUES (new.quote_id, new.quote_text); END",
+    "CREATE TRIGGER IF NOT EXISTS quotes_ad AFTER DELETE ON quotes BEGIN "
+    "INSERT INTO quotes_fts(quotes_fts, rowid, quote_text) "
+    "VALUES ('delete', old.quote_id, old.quote_text); END",
+    "CREATE TRIGGER IF NOT EXISTS quotes_au AFTER UPDATE ON quotes BEGIN "
+    "INSERT INTO quotes_fts(quotes_fts, rowid, quote_text) "
+    "VALUES ('delete', old.quote_id, old.quote_text); "
+    "INSERT INTO quotes_fts(rowid, quote_text) VALUES (new.quote_id, new.quote_text); END",
+]
+
+# rows per multi-row insert, 3 bound parameters each.
+POINTS_CHUNK_SIZE = 500
+
 
 # TODO: we might want to have a list of available commands somewhere in the class so that we can
 # quickly check before updating so that we don't crash.
-class DbConnector:
-    def __init__(self, db_path: str = os.path.join(os.path.dirname(__file__), "../db/prod/")):
+class DbConnector(StorageBackend):
+    def __init__(
+        self,
+        db_path: str = os.path.join(os.path.dirname(__file__), "../db/prod/"),
+        db_url: Optional[str] = None,
+    ):
 
         self.db_path = db_path
-        os.makedirs(self.db_path, exist_ok=True)
-        self.engine = create_engine(f"sqlite:///{self.db_path}bot_database.db")
+        if db_url is None:
+            os.makedirs(self.db_path, exist_ok=True)
+            db_url = f"sqlite:///{self.db_path}bot_database.db"
+        self.engine = create_engine(db_url)
         self.metadata = MetaData()
         self.create_db()
 
+    def upsert(self, table: Table):
+        # sqlite and postgres both speak INSERT ... ON CONFLICT, through their own dialect.
+        if self.engine.dialect.name == "postgresql":
+            return postgresql.insert(table)
+        return sqlite.insert(table)
+
     def create_db(self):
         self.commands = Table(
             "commands",
@@ -43,6 +86,14 @@ class DbConnector:
             Column("command_response", String()),
         )
 
+        # how many times text commands using `{count}` in their response were run.
+        self.command_counts = Table(
+            "command_counts",
+            self.metadata,
+            Column("command_name", String(), primary_key=True),
+            Column("count", Integer(), nullable=False, default=0),
+        )
+
         self.users = Table(
             "users",
             self.metadata,
@@ -61,16 +112,156 @@ class DbConnector:
             Column("aliased_command_name", String()),
         )
 
-        self.metadata.create_all(self.engine)
+        self.unknown_commands = Table(
+            "unknown_commands",
+            self.metadata,
+            Column("command_name", String(), primary_key=True),
+            Column("attempts", Integer(), nullable=False, default=0),
+            Column("last_attempted_at", DateTime()),
+        )
+
+        self.unknown_command_users = Table(
+            "unknown_command_users",
+            self.metadata,
+            Column("command_name", String(), primary_key=True),
+            Column("user_id", String(), primary_key=True),
+        )
 
-        self.add_new_command("today", "today is not set yet")
-        self.add_new_command("source", "no source code or repo provided yet")
-        self.add_new_command(
-            "bot",
-            "We're writing the bot on stream, you can find the repo here: "
-            "https://github.com/bastienboutonnet/datafrittata-twitch-chatbot",
+        self.drop_results = Table(
+            "drop_results",
+            self.metadata,
+            Column("user_name", String(), primary_key=True),
+            Column("drops", Integer(), nullable=False, default=0),
+            Column("total_score", Float(), nullable=False, default=0),
+            Column("best_score", Float(), nullable=False, default=0),
+            Column("last_dropped_at", DateTime()),
         )
 
+        self.user_activity = Table(
+            "user_activity",
+            self.metadata,
+            Column("user_id", String(), primary_key=True),
+            Column("message_count", Integer(), nullable=False, default=0),
+            Column("last_stream_date", Date()),
+            Column("stream_streak", Integer(), nullable=False, default=0),
+        )
+
+        self.streams = Table(
+            "streams",
+            self.metadata,
+            Column("stream_date", Date(), primary_key=True),
+        )
+
+        self.watch_time = Table(
+            "watch_time",
+            self.metadata,
+            Column("user_name", String(), primary_key=True),
+            Column("seconds", Float(), nullable=False, default=0),
+            Column("last_seen_at", DateTime()),
+        )
+
+        self.points = Table(
+            "points",
+            self.metadata,
+            Column("user_id", String(), primary_key=True),
+            Column("user_name", String()),
+            # indexed so that !top reads the first rows of the index instead of the table.
+            Column("balance", Integer(), nullable=False, default=0, index=True),
+        )
+
+        self.quotes = Table(
+            "quotes",
+            self.metadata,
+            Column("quote_id", Integer(), primary_key=True, autoincrement=True),
+            Column("quote_text", String(), nullable=False),
+            Column("added_by", String()),
+            Column("added_at", DateTime()),
+        )
+
+        self.timers = Table(
+            "timers",
+            self.metadata,
+            Column("timer_name", String(), primary_key=True),
+            Column("message", String(), nullable=False),
+            Column("interval_minutes", Integer(), nullable=False),
+            Column("min_lines", Integer(), nullable=False, default=0),
+        )
+
+        self.banned_terms = Table(
+            "banned_terms",
+            self.metadata,
+            Column("term", String(), primary_key=True),
+            Column("action", String(), nullable=False),
+            Column("added_by", String()),
+            Column("added_at", DateTime()),
+        )
+
+        self.polls = Table(
+            "polls",
+            self.metadata,
+            Column("poll_id", Integer(), primary_key=True, autoincrement=True),
+            Column("question", String(), nullable=False),
+            Column("started_by", String()),
+            Column("started_at", DateTime()),
+            Column("ended_at", DateTime()),
+        )
+
+        self.poll_options = Table(
+            "poll_options",
+            self.metadata,
+            Column("poll_id", Integer(), ForeignKey("polls.poll_id"), primary_key=True),
+            Column("position", Integer(), primary_key=True),
+            Column("option_text", String(), nullable=False),
+            Column("votes", Integer(), nullable=False, default=0),
+        )
+
+        self.raffles = Table(
+            "raffles",
+            self.metadata,
+            Column("raffle_id", Integer(), primary_key=True, autoincrement=True),
+            # with the entrants in order it's all it takes to replay the draws.
+            Column("seed", Integer(), nullable=False),
+            Column("opened_at", DateTime()),
+            Column("closed_at", DateTime()),
+        )
+
+        self.raffle_entries = Table(
+            "raffle_entries",
+            self.metadata,
+            Column("raffle_id", Integer(), ForeignKey("raffles.raffle_id"), primary_key=True),
+            Column("position", Integer(), primary_key=True),
+            Column("user_id", String(), nullable=False),
+            Column("user_name", String()),
+            Column("weight", Integer(), nullable=False, default=1),
+            Column("won_rank", Integer()),
+        )
+
+        self.emote_snapshots = Table(
+            "emote_snapshots",
+            self.metadata,
+            Column("stream_date", Date(), nullable=False, index=True),
+            Column("channel", String(), primary_key=True),
+            Column("taken_at", DateTime(), primary_key=True),
+            Column("emote", String(), primary_key=True),
+            Column("count", Integer(), nullable=False),
+            # how much of count may belong to emotes it replaced, see chatbot/emotes.py
+            Column("error", Integer(), nullable=False, default=0),
+        )
+
+        self.metadata.create_all(self.engine)
+        self.has_full_text_search = self.engine.dialect.name == "sqlite"
+        if self.has_full_text_search:
+            with self.engine.begin() as conn:
+                for ddl in QUOTES_FTS_DDL:
+                    conn.execute(text(ddl))
+        if self.engine.dialect.name == "sqlite":
+            # readers work off a snapshot instead of locking the bot's writes out, which long
+            # reads like chatbot.export rely on. It sticks to the db file once set.
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+        self.add_default_commands()
+
     def add_new_user(self, user_id: str, user_name: str) -> None:
         try:
             stmt = insert(self.users).values(
@@ -91,7 +282,7 @@ class DbConnector:
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except Exception as e:
-            logging.error(f"Could not update user's zodiac sign: {e}")
+            logger.error(f"Could not update user's zodiac sign: {e}")
         return
 
     def get_user_sign(self, user_id: str) -> Optional[str]:
@@ -115,7 +306,7 @@ class DbConnector:
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except Exception as e:
-            logging.error(f"Could not update user country: {e}")
+            logger.error(f"Could not update user country: {e}")
         return
 
     def update_user_emoji(self, user_id: str, user_emoji: str) -> None:
@@ -126,7 +317,7 @@ class DbConnector:
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except Exception as e:
-            logging.error(f"Could not update user emoji: {e}")
+            logger.error(f"Could not update user emoji: {e}")
         return
 
     def get_user_emoji(self, user_id: str) -> Optional[str]:
@@ -152,23 +343,25 @@ class DbConnector:
             return None
 
     def add_new_command(self, command_name: str, command_response: str) -> None:
-        print(f"Inserting {command_name} with: {command_response}")
+        logger.info(f"Inserting {command_name} with: {command_response}")
         try:
             stmt = insert(self.commands).values((command_name, command_response))
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except IntegrityError:
-            print("command already exists, use a set<command> if you want to change its content")
+            logger.warning(
+                "command already exists, use a set<command> if you want to change its content"
+            )
         return
 
     def add_command_alias(self, alias_name: str, aliased_command_name: str) -> None:
-        print(f"Aliasing '{alias_name}' to '{aliased_command_name}'")
+        logger.info(f"Aliasing '{alias_name}' to '{aliased_command_name}'")
         try:
             stmt = insert(self.aliases).values((alias_name, aliased_command_name))
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except IntegrityError:
-            print(
+            logger.warning(
                 f"Alias: {alias_name} is already assigned, remove it and reassign it, if that's what you want to do"
             )
         return
@@ -187,7 +380,7 @@ class DbConnector:
             return
 
     def update_command(self, command_name: str, command_response: str) -> None:
-        print(f"Updating {command_name} with: {command_response}")
+        logger.info(f"Updating {command_name} with: {command_response}")
         try:
             stmt = (
                 update(self.commands)
@@ -197,7 +390,7 @@ class DbConnector:
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except Exception as e:
-            logging.error(f"Could not update command: {e}")
+            logger.error(f"Could not update command: {e}")
         return
 
     def remove_command(self, command_name: str) -> None:
@@ -206,7 +399,7 @@ class DbConnector:
             self.conn = self.engine.connect()
             self.conn.execute(stmt)
         except Exception as e:
-            logging.error(f"Could not delete {command_name}: {e}")
+            logger.error(f"Could not delete {command_name}: {e}")
         return
 
     def retrive_command_response(self, command_name: str) -> Optional[str]:
@@ -221,11 +414,31 @@ class DbConnector:
                 return row[0]
         return None
 
+    def increment_command_count(self, command_name: str) -> Optional[int]:
+        stmt = self.upsert(self.command_counts).values(command_name=command_name, count=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.command_counts.c.command_name],
+            set_={"count": self.command_counts.c.count + 1},
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt)
+                return conn.execute(
+                    select(self.command_counts.c.count).where(
+                        self.command_counts.c.command_name == command_name
+                    )
+                ).scalar()
+        except Exception as e:
+            logger.error(f"Could not count a use of {command_name}: {e}")
+            return None
+
     def get_all_commands(self) -> Tuple[Optional[List[str]], Optional[List[str]]]:
-        main_commands_stmt = select(self.commands.c.command_name)
+        main_commands_stmt = select(self.commands.c.command_name).order_by(
+            self.commands.c.command_name
+        )
         self.conn = self.engine.connect()
         result = self.conn.execute(main_commands_stmt)
-        aliases_stmt = select(self.aliases.c.alias_name)
+        aliases_stmt = select(self.aliases.c.alias_name).order_by(self.aliases.c.alias_name)
         self.conn = self.engine.connect()
         aliases_result = self.conn.execute(aliases_stmt)
         aliases_list = None
@@ -240,3 +453,509 @@ class DbConnector:
             return None, None
         else:
             return None, None
+
+    def export_commands(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        commands_stmt = select(self.commands).order_by(self.commands.c.command_name)
+        aliases_stmt = select(self.aliases).order_by(self.aliases.c.alias_name)
+        with self.engine.connect() as conn:
+            commands = {name: response for name, response in conn.execute(commands_stmt)}
+            aliases = {name: aliased for name, aliased in conn.execute(aliases_stmt)}
+        return commands, aliases
+
+    def import_commands(
+        self, commands: Dict[str, str], aliases: Dict[str, str], overwrite: bool = True
+    ) -> None:
+        commands_stmt = self.upsert(self.commands)
+        aliases_stmt = self.upsert(self.aliases)
+        if overwrite:
+            commands_stmt = commands_stmt.on_conflict_do_update(
+                index_elements=[self.commands.c.command_name],
+                set_={"command_response": commands_stmt.excluded.command_response},
+            )
+            aliases_stmt = aliases_stmt.on_conflict_do_update(
+                index_elements=[self.aliases.c.alias_name],
+                set_={"aliased_command_name": aliases_stmt.excluded.aliased_command_name},
+            )
+        else:
+            commands_stmt = commands_stmt.on_conflict_do_nothing()
+            aliases_stmt = aliases_stmt.on_conflict_do_nothing()
+        # a list of parameter sets makes these executemany, one round trip per table.
+        with self.engine.begin() as conn:
+            if commands:
+                conn.execute(
+                    commands_stmt,
+                    [
+                        {"command_name": name, "command_response": response}
+                        for name, response in commands.items()
+                    ],
+                )
+            if aliases:
+                conn.execute(
+                    aliases_stmt,
+                    [
+                        {"alias_name": name, "aliased_command_name": aliased}
+                        for name, aliased in aliases.items()
+                    ],
+                )
+
+    def upsert_unknown_commands(
+        self, attempts: Dict[str, int], users: Dict[str, Set[str]], attempted_at: datetime
+    ) -> None:
+        # adds the aggregated counts on top of the stored ones, all in one transaction.
+        if not attempts:
+            return
+        attempts_stmt = self.upsert(self.unknown_commands)
+        attempts_stmt = attempts_stmt.on_conflict_do_update(
+            index_elements=[self.unknown_commands.c.command_name],
+            set_={
+                "attempts": self.unknown_commands.c.attempts + attempts_stmt.excluded.attempts,
+                "last_attempted_at": attempts_stmt.excluded.last_attempted_at,
+            },
+        )
+        users_stmt = self.upsert(self.unknown_command_users).on_conflict_do_nothing()
+        user_rows = [
+            {"command_name": command_name, "user_id": user_id}
+            for command_name, user_ids in users.items()
+            for user_id in user_ids
+        ]
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    attempts_stmt,
+                    [
+                        {
+                            "command_name": command_name,
+                            "attempts": count,
+                            "last_attempted_at": attempted_at,
+                        }
+                        for command_name, count in attempts.items()
+                    ],
+                )
+                if user_rows:
+                    conn.execute(users_stmt, user_rows)
+        except Exception as e:
+            logger.error(f"Could not store unknown commands: {e}")
+
+    def get_top_unknown_commands(self, limit: int) -> List[Tuple[str, int, int]]:
+        # returns (command_name, attempts, distinct_users) tuples, most attempted first.
+        distinct_users = (
+            select(func.count(self.unknown_command_users.c.user_id))
+            .where(
+                self.unknown_command_users.c.command_name == self.unknown_commands.c.command_name
+            )
+            .scalar_subquery()
+        )
+        stmt = (
+            select(
+                self.unknown_commands.c.command_name,
+                self.unknown_commands.c.attempts,
+                distinct_users,
+            )
+            .order_by(
+                self.unknown_commands.c.attempts.desc(),
+                distinct_users.desc(),
+                self.unknown_commands.c.command_name,
+            )
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def get_all_drop_results(self) -> List[Tuple[str, int, float, float]]:
+        stmt = select(
+            self.drop_results.c.user_name,
+            self.drop_results.c.drops,
+            self.drop_results.c.total_score,
+            self.drop_results.c.best_score,
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def upsert_drop_results(self, rows: List[Dict[str, Any]]) -> None:
+        # rows carry the full per-user totals so the upsert simply overwrites what's stored.
+        if not rows:
+            return
+        stmt = self.upsert(self.drop_results)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.drop_results.c.user_name],
+            set_={
+                "drops": stmt.excluded.drops,
+                "total_score": stmt.excluded.total_score,
+                "best_score": stmt.excluded.best_score,
+                "last_dropped_at": stmt.excluded.last_dropped_at,
+            },
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except Exception as e:
+            logger.error(f"Could not store drop results: {e}")
+
+    def register_stream(self, stream_date: date) -> Optional[date]:
+        # records the stream and hands back the date of the one before it, if any.
+        with self.engine.begin() as conn:
+            conn.execute(
+                self.upsert(self.streams).on_conflict_do_nothing(), {"stream_date": stream_date}
+            )
+            stmt = select(func.max(self.streams.c.stream_date)).where(
+                self.streams.c.stream_date < stream_date
+            )
+            return conn.execute(stmt).scalar()
+
+    def get_user_activity(
+        self, user_id: str
+    ) -> Tuple[int, Optional[date], int, Optional[datetime]]:
+        # (message_count, last_stream_date, stream_streak, first_chatted_at)
+        stmt = (
+            select(
+                self.user_activity.c.message_count,
+                self.user_activity.c.last_stream_date,
+                self.user_activity.c.stream_streak,
+                self.users.c.first_chatted_at,
+            )
+            .select_from(
+                self.users.outerjoin(
+                    self.user_activity, self.users.c.user_id == self.user_activity.c.user_id
+                )
+            )
+            .where(self.users.c.user_id == user_id)
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(stmt).fetchone()
+        if row is None:
+            return 0, None, 0, None
+        message_count, last_stream_date, stream_streak, first_chatted_at = row
+        return message_count or 0, last_stream_date, stream_streak or 0, first_chatted_at
+
+    def upsert_user_activity(self, rows: List[Dict[str, Any]]) -> bool:
+        # message_count in the rows is a delta, everything else overwrites what's stored.
+        if not rows:
+            return True
+        stmt = self.upsert(self.user_activity)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.user_activity.c.user_id],
+            set_={
+                "message_count": self.user_activity.c.message_count + stmt.excluded.message_count,
+                "last_stream_date": stmt.excluded.last_stream_date,
+                "stream_streak": stmt.excluded.stream_streak,
+            },
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except Exception as e:
+            logger.error(f"Could not store user activity: {e}")
+            return False
+        return True
+
+    def get_watch_time(self, user_name: str) -> float:
+        stmt = select(self.watch_time.c.seconds).where(self.watch_time.c.user_name == user_name)
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).scalar() or 0.0
+
+    def upsert_watch_time(self, rows: List[Dict[str, Any]]) -> bool:
+        # seconds in the rows is a delta, added to what's stored.
+        if not rows:
+            return True
+        stmt = self.upsert(self.watch_time)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.watch_time.c.user_name],
+            set_={
+                "seconds": self.watch_time.c.seconds + stmt.excluded.seconds,
+                "last_seen_at": stmt.excluded.last_seen_at,
+            },
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(stmt, rows)
+        except Exception as e:
+            logger.error(f"Could not store watch time: {e}")
+            return False
+        return True
+
+    def get_points(self, user_id: str) -> int:
+        stmt = select(self.points.c.balance).where(self.points.c.user_id == user_id)
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).scalar() or 0
+
+    def award_points(self, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        try:
+            with self.engine.begin() as conn:
+                # one multi-row INSERT ... ON CONFLICT per chunk rather than a statement per
+                # user, chunked to stay under sqlite's bound parameter limit.
+                for start in range(0, len(rows), POINTS_CHUNK_SIZE):
+                    stmt = self.upsert(self.points).values(
+                        [
+                            {
+                                "user_id": row["user_id"],
+                                "user_name": row["user_name"],
+                                "balance": row["points"],
+                            }
+                            for row in rows[start : start + POINTS_CHUNK_SIZE]
+                        ]
+                    )
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[self.points.c.user_id],
+                        set_={
+                            "user_name": stmt.excluded.user_name,
+                            "balance": self.points.c.balance + stmt.excluded.balance,
+                        },
+                    )
+                    conn.execute(stmt)
+        except Exception as e:
+            logger.error(f"Could not award points: {e}")
+
+    def spend_points(self, user_id: str, points: int) -> Optional[int]:
+        # the balance check and the update are one statement, nothing can spend in between.
+        stmt = (
+            update(self.points)
+            .where(self.points.c.user_id == user_id, self.points.c.balance >= points)
+            .values(balance=self.points.c.balance - points)
+        )
+        with self.engine.begin() as conn:
+            if conn.execute(stmt).rowcount != 1:
+                return None
+            return conn.execute(
+                select(self.points.c.balance).where(self.points.c.user_id == user_id)
+            ).scalar()
+
+    def get_top_points(self, limit: int) -> List[Tuple[str, int]]:
+        stmt = (
+            select(self.points.c.user_name, self.points.c.balance)
+            .order_by(self.points.c.balance.desc())
+            .limit(limit)
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def add_quote(self, quote_text: str, added_by: Optional[str] = None) -> Optional[int]:
+        stmt = insert(self.quotes).values(
+            quote_text=quote_text, added_by=added_by, added_at=datetime.now()
+        )
+        try:
+            with self.engine.begin() as conn:
+                return conn.execute(stmt).inserted_primary_key[0]
+        except Exception as e:
+            logger.error(f"Could not add quote: {e}")
+            return None
+
+    def get_quote(self, quote_id: int) -> Optional[Tuple[int, str]]:
+        stmt = select(self.quotes.c.quote_id, self.quotes.c.quote_text).where(
+            self.quotes.c.quote_id == quote_id
+        )
+        with self.engine.connect() as conn:
+            row = conn.execute(stmt).fetchone()
+        return tuple(row) if row else None
+
+    def get_random_quote(self) -> Optional[Tuple[int, str]]:
+        # picks a random id between 1 and the largest one and seeks to the first quote at or
+        # after it, two index lookups instead of the full scan ORDER BY RANDOM() does.
+        with self.engine.connect() as conn:
+            max_id = conn.execute(select(func.max(self.quotes.c.quote_id))).scalar()
+            if max_id is None:
+                return None
+            stmt = (
+                select(self.quotes.c.quote_id, self.quotes.c.quote_text)
+                .where(self.quotes.c.quote_id >= random.randint(1, max_id))
+                .order_by(self.quotes.c.quote_id)
+                .limit(1)
+            )
+            row = conn.execute(stmt).fetchone()
+        return tuple(row) if row else None
+
+    def search_quotes(self, words: List[str], limit: int = 1) -> List[Tuple[int, str]]:
+        # quotes containing all the words, best match (fts5's bm25 rank) first.
+        if not words:
+            return []
+        if not self.has_full_text_search:
+            stmt = select(self.quotes.c.quote_id, self.quotes.c.quote_text)
+            for word in words:
+                # % and _ in what chat typed are matched literally, not as wildcards.
+                word = word.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+                stmt = stmt.where(self.quotes.c.quote_text.ilike(f"%{word}%", escape="\\"))
+            stmt = stmt.order_by(self.quotes.c.quote_id).limit(limit)
+        else:
+            # every word is quoted so that whatever chat types can't be read as fts5 syntax.
+            match = " ".join('"{}"'.format(word.replace('"', '""')) for word in words)
+            stmt = text(
+                "SELECT quotes.quote_id, quotes.quote_text FROM quotes_fts "
+                "JOIN quotes ON quotes.quote_id = quotes_fts.rowid "
+                "WHERE quotes_fts MATCH :match ORDER BY quotes_fts.rank LIMIT :limit"
+            ).bindparams(match=match, limit=limit)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def upsert_timer(
+        self, timer_name: str, message: str, interval_minutes: int, min_lines: int
+    ) -> None:
+        stmt = self.upsert(self.timers)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.timers.c.timer_name],
+            set_={
+                "message": stmt.excluded.message,
+                "interval_minutes": stmt.excluded.interval_minutes,
+                "min_lines": stmt.excluded.min_lines,
+            },
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    stmt,
+                    {
+                        "timer_name": timer_name,
+                        "message": message,
+                        "interval_minutes": interval_minutes,
+                        "min_lines": min_lines,
+                    },
+                )
+        except Exception as e:
+            logger.error(f"Could not store timer {timer_name}: {e}")
+
+    def remove_timer(self, timer_name: str) -> None:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(self.timers).where(self.timers.c.timer_name == timer_name))
+        except Exception as e:
+            logger.error(f"Could not delete timer {timer_name}: {e}")
+
+    def get_timers(self) -> List[Tuple[str, str, int, int]]:
+        # (timer_name, message, interval_minutes, min_lines)
+        stmt = select(
+            self.timers.c.timer_name,
+            self.timers.c.message,
+            self.timers.c.interval_minutes,
+            self.timers.c.min_lines,
+        ).order_by(self.timers.c.timer_name)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def add_banned_term(self, term: str, action: str, added_by: Optional[str] = None) -> None:
+        stmt = self.upsert(self.banned_terms)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.banned_terms.c.term],
+            set_={
+                "action": stmt.excluded.action,
+                "added_by": stmt.excluded.added_by,
+                "added_at": stmt.excluded.added_at,
+            },
+        )
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    stmt,
+                    {
+                        "term": term,
+                        "action": action,
+                        "added_by": added_by,
+                        "added_at": datetime.now(),
+                    },
+                )
+        except Exception as e:
+            logger.error(f"Could not store banned term {term}: {e}")
+
+    def remove_banned_term(self, term: str) -> None:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(self.banned_terms).where(self.banned_terms.c.term == term))
+        except Exception as e:
+            logger.error(f"Could not delete banned term {term}: {e}")
+
+    def get_banned_terms(self) -> List[Tuple[str, str]]:
+        stmt = select(self.banned_terms.c.term, self.banned_terms.c.action).order_by(
+            self.banned_terms.c.term
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
+
+    def save_poll(
+        self,
+        question: str,
+        results: List[Tuple[str, int]],
+        started_by: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        ended_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        try:
+            with self.engine.begin() as conn:
+                poll_id = conn.execute(
+                    insert(self.polls).values(
+                        question=question,
+                        started_by=started_by,
+                        started_at=started_at,
+                        ended_at=ended_at,
+                    )
+                ).inserted_primary_key[0]
+                conn.execute(
+                    insert(self.poll_options),
+                    [
+                        {
+                            "poll_id": poll_id,
+                            "position": position,
+                            "option_text": option,
+                            "votes": votes,
+                        }
+                        for position, (option, votes) in enumerate(results, start=1)
+                    ],
+                )
+            return poll_id
+        except Exception as e:
+            logger.error(f"Could not save poll {question}: {e}")
+            return None
+
+    def save_raffle(
+        self,
+        seed: int,
+        entries: List[Dict[str, Any]],
+        opened_at: Optional[datetime] = None,
+        closed_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        try:
+            with self.engine.begin() as conn:
+                raffle_id = conn.execute(
+                    insert(self.raffles).values(seed=seed, opened_at=opened_at, closed_at=closed_at)
+                ).inserted_primary_key[0]
+                if entries:
+                    conn.execute(
+                        insert(self.raffle_entries),
+                        [{"raffle_id": raffle_id, **entry} for entry in entries],
+                    )
+            return raffle_id
+        except Exception as e:
+            logger.error(f"Could not save raffle with seed {seed}: {e}")
+            return None
+
+    def add_emote_snapshot(self, rows: List[Dict[str, Any]]) -> bool:
+        if not rows:
+            return True
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(self.emote_snapshots), rows)
+        except Exception as e:
+            logger.error(f"Could not store emote snapshot: {e}")
+            return False
+        return True
+
+    def get_emote_snapshots(
+        self, stream_date: date, channel: str
+    ) -> List[Tuple[datetime, str, int, int]]:
+        stmt = (
+            select(
+                self.emote_snapshots.c.taken_at,
+                self.emote_snapshots.c.emote,
+                self.emote_snapshots.c.count,
+                self.emote_snapshots.c.error,
+            )
+            .where(
+                self.emote_snapshots.c.stream_date == stream_date,
+                self.emote_snapshots.c.channel == channel,
+            )
+            .order_by(
+                self.emote_snapshots.c.taken_at,
+                self.emote_snapshots.c.count.desc(),
+                self.emote_snapshots.c.emote,
+            )
+        )
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(stmt)]
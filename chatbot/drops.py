@@ -0,0 +1,104 @@
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Pattern, Set, Tuple
+
+from chatbot.storage import StorageBackend
+
+# what the drop game posts in chat when someone lands, e.g. "@someone landed for 87.52 points!"
+DEFAULT_DROP_RESULT_PATTERN = (
+    r"@?(?P<user_name>\w+) (?:landed|scored) (?:for|with) (?P<score>\d+(?:\.\d+)?) points"
+)
+LEADERBOARD_SIZE = 10
+
+
+@dataclass
+class DropScore:
+    drops: int = 0
+    total_score: float = 0.0
+    best_score: float = 0.0
+    last_dropped_at: Optional[datetime] = None
+
+
+class DropResultsTracker:
+    """Keeps per-user drop scores and a top-k leaderboard (by total score) in memory.
+
+    Stored totals are read once when the tracker is created, after that the table is only
+    written to, in batches, by `flush`. Since a drop can only ever add to someone's total, the
+    leaderboard can be maintained incrementally: a user either moves up within it or pushes
+    its last entry out.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        result_pattern: str = DEFAULT_DROP_RESULT_PATTERN,
+        leaderboard_size: int = LEADERBOARD_SIZE,
+    ):
+        self.db_connector = db_connector
+        self.result_pattern: Pattern = re.compile(result_pattern, re.IGNORECASE)
+        self.leaderboard_size = leaderboard_size
+        self.scores: Dict[str, DropScore] = {}
+        self._leaderboard: List[Tuple[float, str]] = []
+        self._dirty: Set[str] = set()
+        self.load()
+
+    def load(self) -> None:
+        for user_name, drops, total_score, best_score in self.db_connector.get_all_drop_results():
+            self.scores[user_name] = DropScore(drops, total_score, best_score)
+            self._update_leaderboard(user_name, total_score)
+
+    def ingest(self, message: str) -> bool:
+        match = self.result_pattern.search(message)
+        if match is None:
+            return False
+        self.add_result(match.group("user_name"), float(match.group("score")))
+        return True
+
+    def add_result(self, user_name: str, score: float) -> None:
+        user_name = user_name.lower()
+        user_score = self.scores.setdefault(user_name, DropScore())
+        user_score.drops += 1
+        user_score.total_score += score
+        user_score.best_score = max(user_score.best_score, score)
+        user_score.last_dropped_at = datetime.now()
+        self._dirty.add(user_name)
+        self._update_leaderboard(user_name, user_score.total_score)
+
+    def _update_leaderboard(self, user_name: str, total_score: float) -> None:
+        for i, (_, ranked_user) in enumerate(self._leaderboard):
+            if ranked_user == user_name:
+                del self._leaderboard[i]
+                break
+        else:
+            if (
+                len(self._leaderboard) >= self.leaderboard_size
+                and total_score <= self._leaderboard[-1][0]
+            ):
+                return
+        # the board holds at most `leaderboard_size` entries so a linear insert is plenty.
+        position = len(self._leaderboard)
+        while position > 0 and self._leaderboard[position - 1][0] < total_score:
+            position -= 1
+        self._leaderboard.insert(position, (total_score, user_name))
+        del self._leaderboard[self.leaderboard_size :]
+
+    def leaderboard(self, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        return [(user_name, score) for score, user_name in self._leaderboard[:limit]]
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        self.db_connector.upsert_drop_results(
+            [
+                {
+                    "user_name": user_name,
+                    "drops": self.scores[user_name].drops,
+                    "total_score": self.scores[user_name].total_score,
+                    "best_score": self.scores[user_name].best_score,
+                    "last_dropped_at": self.scores[user_name].last_dropped_at,
+                }
+                for user_name in dirty
+            ]
+        )
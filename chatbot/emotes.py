@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import date, datetime
+from typing import DefaultDict, Dict, Iterator, List, Optional, Set, Tuple
+
+from chatbot.storage import StorageBackend
+
+
+def parse_emotes(emotes_tag: str, text: str) -> Iterator[Tuple[str, int]]:
+    """Yields (emote name, occurrences) from twitch's emotes tag, `25:0-4,12-16/1902:6-10`.
+
+    The tag only has ids and where they are in the message, the name is read off the text.
+    """
+    if not emotes_tag:
+        return
+    for emote in emotes_tag.split("/"):
+        emote_id, _, ranges = emote.partition(":")
+        if not ranges:
+            continue
+        occurrences = ranges.split(",")
+        start, _, end = occurrences[0].partition("-")
+        try:
+            name = text[int(start) : int(end) + 1]
+        except ValueError:
+            name = ""
+        yield name or emote_id, len(occurrences)
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent items of a stream in `capacity` counters.
+
+    Metwally et al.'s Space-Saving: an item that isn't monitored while all counters are taken
+    replaces the one with the lowest count and inherits that count, remembered as its error.
+    Any item seen more than total / capacity times is guaranteed to be monitored, and its true
+    count is between `count - error` and `count`. Counters are kept in buckets by count so
+    every increment, eviction included, is O(1).
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total = 0
+        # count -> items with that count, a dict as an insertion ordered set
+        self._buckets: Dict[int, Dict[str, None]] = {}
+        self._min = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def _unbucket(self, item: str, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[item]
+        if not bucket:
+            del self._buckets[count]
+
+    def add(self, item: str, occurrences: int = 1) -> None:
+        for _ in range(occurrences):
+            self.total += 1
+            count = self.counts.get(item)
+            if count is not None:
+                self._unbucket(item, count)
+            elif len(self.counts) < self.capacity:
+                count = 0
+                self.errors[item] = 0
+            else:
+                # the oldest of the least counted items makes room.
+                count = self._min
+                victim = next(iter(self._buckets[count]))
+                self._unbucket(victim, count)
+                del self.counts[victim]
+                del self.errors[victim]
+                self.errors[item] = count
+            count += 1
+            self.counts[item] = count
+            self._buckets.setdefault(count, {})[item] = None
+            if count == 1 or self._min not in self._buckets:
+                self._min = count
+
+    def top(self, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """The `limit` most counted items as (item, count, error), highest count first."""
+        items = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(item, count, self.errors[item]) for item, count in items]
+
+
+class EmoteTracker:
+    """Emote usage per channel for the current stream, in fixed memory.
+
+    Every chat line's emotes go into the channel's `SpaceSaving` counters, `snapshot` writes the
+    monitored emotes of the channels that chatted since the last one as one batch of rows,
+    which adds up to a history of how the stream's emote usage evolved.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        capacity: int = 200,
+        stream_date: Optional[date] = None,
+    ):
+        self.db_connector = db_connector
+        self.capacity = capacity
+        self.stream_date = stream_date or date.today()
+        self.channels: DefaultDict[str, SpaceSaving] = defaultdict(
+            lambda: SpaceSaving(self.capacity)
+        )
+        self._dirty: Set[str] = set()
+
+    def record(self, channel: str, emotes_tag: str, text: str) -> None:
+        counters = self.channels[channel]
+        for name, occurrences in parse_emotes(emotes_tag, text):
+            counters.add(name, occurrences)
+        self._dirty.add(channel)
+
+    def top(self, channel: str, limit: int = 10) -> List[Tuple[str, int, int]]:
+        counters = self.channels.get(channel)
+        return counters.top(limit) if counters is not None else []
+
+    def snapshot(self) -> None:
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        taken_at = datetime.now()
+        stored = self.db_connector.add_emote_snapshot(
+            [
+                {
+                    "stream_date": self.stream_date,
+                    "channel": channel,
+                    "taken_at": taken_at,
+                    "emote": emote,
+                    "count": count,
+                    "error": error,
+                }
+                for channel in sorted(dirty)
+                for emote, count, error in self.channels[channel].top(self.capacity)
+            ]
+        )
+        if not stored:
+            # the counters are still in memory, the next snapshot takes these channels too.
+            self._dirty |= dirty
@@ -0,0 +1,163 @@
+"""Streams tables out of the bot's database into CSV or Parquet files, one file per table.
+
+Every table is read in primary key order, `--chunk-size` rows at a time, each chunk picking up
+after the last key of the previous one, and written out before the next is read, so memory
+stays flat whatever the size of the table. All tables are read inside one read-only
+transaction: the files agree with each other and the bot keeps writing while the export runs.
+
+Run with `python -m chatbot.export out/ --tables users,commands,command_aliases`, the database
+is the one the bot uses (DATABASE_URL, or the sqlite file under db/prod/). Parquet needs
+pyarrow installed.
+"""
+import argparse
+import csv
+import datetime
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from sqlalchemy import Table, select, tuple_
+from sqlalchemy.engine import Connection
+
+from chatbot.db import DbConnector
+
+DEFAULT_TABLES = ["users", "commands", "command_aliases"]
+FORMATS = ["csv", "parquet"]
+
+
+@contextmanager
+def snapshot(db_connector: DbConnector) -> Iterator[Connection]:
+    """A connection whose reads all see the database as it was on the first one."""
+    with db_connector.engine.connect() as conn:
+        if conn.dialect.name == "sqlite":
+            # pysqlite only opens transactions before writes, open the read transaction
+            # ourselves. With the db in WAL mode it doesn't block the bot's writes.
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            conn.exec_driver_sql("BEGIN")
+            try:
+                yield conn
+            finally:
+                conn.exec_driver_sql("ROLLBACK")
+        else:
+            conn = conn.execution_options(
+                isolation_level="REPEATABLE READ", postgresql_readonly=True
+            )
+            with conn.begin():
+                yield conn
+
+
+def iter_chunks(conn: Connection, table: Table, chunk_size: int) -> Iterator[List[Sequence]]:
+    """Yields the rows of `table` in primary key order, `chunk_size` at a time.
+
+    Keyset pagination, every chunk is an index range scan starting after the previous chunk's
+    last key. Unlike OFFSET it doesn't get slower the further in it gets.
+    """
+    key = list(table.primary_key.columns)
+    if not key:
+        raise ValueError(f"Can't page through {table.name}, it has no primary key")
+    key_positions = [list(table.columns).index(column) for column in key]
+    last_key: Optional[List[Any]] = None
+    while True:
+        stmt = select(table).order_by(*key).limit(chunk_size)
+        if last_key is not None:
+            if len(key) == 1:
+                stmt = stmt.where(key[0] > last_key[0])
+            else:
+                stmt = stmt.where(tuple_(*key) > tuple_(*last_key))
+        rows = conn.execute(stmt).fetchall()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last_key = [rows[-1][position] for position in key_positions]
+
+
+def write_csv(path: str, table: Table, chunks: Iterator[List[Sequence]]) -> int:
+    n_rows = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([column.name for column in table.columns])
+        for rows in chunks:
+            writer.writerows(rows)
+            n_rows += len(rows)
+    return n_rows
+
+
+def write_parquet(path: str, table: Table, chunks: Iterator[List[Sequence]]) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Exporting to parquet needs pyarrow, pip install pyarrow") from e
+
+    arrow_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64(),
+        datetime.datetime: pa.timestamp("us"),
+        datetime.date: pa.date32(),
+    }
+    schema = pa.schema(
+        [(column.name, arrow_types[column.type.python_type]) for column in table.columns]
+    )
+    n_rows = 0
+    # every chunk becomes a row group, nothing but the current chunk is ever held in memory.
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            columns = [[row[i] for row in rows] for i in range(len(schema))]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            n_rows += len(rows)
+    return n_rows
+
+
+def export(
+    db_connector: DbConnector,
+    out_dir: str,
+    tables: Sequence[str] = DEFAULT_TABLES,
+    file_format: str = "csv",
+    chunk_size: int = 10_000,
+) -> Dict[str, int]:
+    """Writes each table to `out_dir`/<table>.<file_format>, returns how many rows each got."""
+    if file_format not in FORMATS:
+        raise ValueError(f"Unknown export format {file_format}, pick one of {FORMATS}")
+    unknown_tables = [name for name in tables if name not in db_connector.metadata.tables]
+    if unknown_tables:
+        raise ValueError(f"No such tables: {', '.join(unknown_tables)}")
+    write = write_csv if file_format == "csv" else write_parquet
+    os.makedirs(out_dir, exist_ok=True)
+    exported = {}
+    with snapshot(db_connector) as conn:
+        for name in tables:
+            table = db_connector.metadata.tables[name]
+            path = os.path.join(out_dir, f"{name}.{file_format}")
+            exported[name] = write(path, table, iter_chunks(conn, table, chunk_size))
+    return exported
+
+
+def main() -> None:
+    load_dotenv(os.path.join(os.path.dirname(__file__), "bot_env_vars.env"))
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("out_dir")
+    parser.add_argument(
+        "--tables",
+        type=lambda s: s.split(","),
+        default=DEFAULT_TABLES,
+        help=f"comma separated, defaults to {','.join(DEFAULT_TABLES)}",
+    )
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--db-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args()
+
+    db_connector = DbConnector(db_url=args.db_url)
+    exported = export(db_connector, args.out_dir, args.tables, args.format, args.chunk_size)
+    for name, n_rows in exported.items():
+        print(f"{name}: {n_rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import time
+from collections import Counter, OrderedDict, deque
+from typing import Deque, Optional, Tuple
+
+USER_DUPLICATE = "user_duplicate"
+USER_RATE = "user_rate"
+CHANNEL_DUPLICATE = "channel_duplicate"
+
+
+class FloodFilter:
+    """Cheap first pass over every chat line so spam never reaches the expensive stages.
+
+    Keeps a rolling window of (timestamp, message hash) per user and one for the whole
+    channel. A line is suppressed when the same user repeats it or sends too many lines within
+    `user_window` seconds, or when it's a copypasta already seen `channel_max_duplicates` times
+    in the channel within `channel_window` seconds. Commands are never suppressed as copypasta
+    since plenty of people typing the same command (hi !drop) is legit.
+
+    Memory is bounded: per-user windows are capped at `user_max_messages` entries and only the
+    `max_users` most recently active users are tracked, the channel window holds at most
+    `channel_max_entries` lines.
+    """
+
+    def __init__(
+        self,
+        user_window: float = 10,
+        user_max_messages: int = 5,
+        channel_window: float = 10,
+        channel_max_duplicates: int = 3,
+        max_users: int = 10_000,
+        channel_max_entries: int = 1_000,
+    ):
+        self.user_window = user_window
+        self.user_max_messages = user_max_messages
+        self.channel_window = channel_window
+        self.channel_max_duplicates = channel_max_duplicates
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Deque[Tuple[float, int]]]" = OrderedDict()
+        self._channel: Deque[Tuple[float, int]] = deque(maxlen=channel_max_entries)
+        self._channel_hashes: Counter = Counter()
+        self.seen = 0
+        self.suppressed: Counter = Counter()
+
+    @staticmethod
+    def message_hash(message: str) -> int:
+        return hash(" ".join(message.casefold().split()))
+
+    def _expire_channel(self, now: float) -> None:
+        while self._channel and now - self._channel[0][0] > self.channel_window:
+            _, message_hash = self._channel.popleft()
+            self._forget_channel_hash(message_hash)
+
+    def _forget_channel_hash(self, message_hash: int) -> None:
+        self._channel_hashes[message_hash] -= 1
+        if self._channel_hashes[message_hash] <= 0:
+            del self._channel_hashes[message_hash]
+
+    def _user_window(self, user: str, now: float) -> Deque[Tuple[float, int]]:
+        window = self._users.get(user)
+        if window is None:
+            window = deque(maxlen=self.user_max_messages)
+            self._users[user] = window
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user)
+            while window and now - window[0][0] > self.user_window:
+                window.popleft()
+        return window
+
+    @property
+    def channel_rate(self) -> float:
+        # lines per second over the channel window
+        return len(self._channel) / self.channel_window if self.channel_window else 0.0
+
+    def check(self, user: str, message: str, now: Optional[float] = None) -> Optional[str]:
+        """Returns why the line should be suppressed, or None when it should go through."""
+        now = time.monotonic() if now is None else now
+        self.seen += 1
+        message_hash = self.message_hash(message)
+
+        window = self._user_window(user, now)
+        reason = None
+        if any(seen_hash == message_hash for _, seen_hash in window):
+            reason = USER_DUPLICATE
+        elif len(window) >= self.user_max_messages:
+            reason = USER_RATE
+        else:
+            window.append((now, message_hash))
+
+        self._expire_channel(now)
+        if (
+            reason is None
+            and not message.startswith("!")
+            and self._channel_hashes[message_hash] >= self.channel_max_duplicates
+        ):
+            reason = CHANNEL_DUPLICATE
+        if len(self._channel) == self._channel.maxlen:
+            self._forget_channel_hash(self._channel[0][1])
+        self._channel.append((now, message_hash))
+        self._channel_hashes[message_hash] += 1
+
+        if reason is not None:
+            self.suppressed[reason] += 1
+        return reason
@@ -0,0 +1,310 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import httpx
+
+from chatbot.circuit_breaker import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+HELIX_URL = "https://api.twitch.tv/helix"
+TOKEN_URL = "https://id.twitch.tv/oauth2/token"
+# helix takes at most this many `login`/`id`/`user_login`... values in one request.
+MAX_BATCH_SIZE = 100
+
+Params = List[Tuple[str, str]]
+
+
+class RateLimitedError(httpx.HTTPError):
+    """The rate limit bucket is empty for longer than the client is willing to wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"helix rate limit reached, resets in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RateLimit:
+    """Keeps track of helix's rate limit bucket from the `Ratelimit-*` headers of its responses.
+
+    Each request takes a point, `acquire` hands out the points the last response said we had
+    left (minus `reserve`) and once they're gone says how long to wait until the bucket resets.
+    """
+
+    def __init__(self, reserve: int = 1, clock: Callable[[], float] = time.time):
+        self.reserve = reserve
+        self.clock = clock
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+    def update(self, headers: httpx.Headers) -> None:
+        try:
+            if "Ratelimit-Limit" in headers:
+                self.limit = int(headers["Ratelimit-Limit"])
+            if "Ratelimit-Remaining" in headers:
+                self.remaining = int(headers["Ratelimit-Remaining"])
+            if "Ratelimit-Reset" in headers:
+                self.reset_at = float(headers["Ratelimit-Reset"])
+        except ValueError:
+            logger.warning(f"Could not parse helix rate limit headers: {dict(headers)}")
+
+    def acquire(self) -> float:
+        """Counts a request about to be sent, returns how many seconds to wait before sending it."""
+        if self.remaining is None:
+            return 0.0
+        if self.remaining > self.reserve:
+            self.remaining -= 1
+            return 0.0
+        wait = max(0.0, self.reset_at - self.clock())
+        # the bucket is full again once it resets, the next response tells us how full.
+        self.remaining = None
+        return wait
+
+
+def batched_params(key: str, values: Iterable[str]) -> List[Params]:
+    values = list(dict.fromkeys(values))
+    return [
+        [(key, value) for value in values[i : i + MAX_BATCH_SIZE]]
+        for i in range(0, len(values), MAX_BATCH_SIZE)
+    ]
+
+
+def response_data(response: httpx.Response) -> List[Dict]:
+    response.raise_for_status()
+    return response.json().get("data", [])
+
+
+class BaseHelixClient:
+    def __init__(
+        self,
+        client_id: Optional[str],
+        token: Optional[str] = None,
+        base_url: str = HELIX_URL,
+        token_url: str = TOKEN_URL,
+        clock: Callable[[], float] = time.time,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.client_id = client_id
+        self.token = token
+        self.base_url = base_url
+        self.token_url = token_url
+        self.rate_limit = RateLimit(clock=clock)
+        # helix failing (5xx, timeouts...) counts against it, a 4xx is on us.
+        self.breaker = breaker
+        self.limits = httpx.Limits(max_connections=10, max_keepalive_connections=10)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}", "Client-ID": f"{self.client_id}"}
+
+    def token_params(self, client_secret: Optional[str]) -> Dict[str, str]:
+        return {
+            "client_id": f"{self.client_id}",
+            "client_secret": f"{client_secret}",
+            "grant_type": "client_credentials",
+        }
+
+    @staticmethod
+    def access_token(response: httpx.Response) -> Optional[str]:
+        if response.status_code == 200 and response.json().get("access_token"):
+            return response.json()["access_token"]
+        logger.error(
+            f"we did not get an access_token from twitch. Status code: {response.status_code}"
+        )
+        return None
+
+    @staticmethod
+    def users_params(logins: Sequence[str], ids: Sequence[str]) -> List[Params]:
+        return batched_params("login", logins) + batched_params("id", ids)
+
+    @staticmethod
+    def streams_params(user_logins: Sequence[str], user_ids: Sequence[str]) -> List[Params]:
+        return batched_params("user_login", user_logins) + batched_params("user_id", user_ids)
+
+
+class HelixClient(BaseHelixClient):
+    """Talks to the Twitch helix API over a single pooled keep-alive connection.
+
+    Lookups of many users or streams are batched `MAX_BATCH_SIZE` at a time and requests wait
+    for the rate limit bucket to reset rather than getting a 429, for up to `max_wait` seconds.
+    It runs on the irc reactor's thread where a longer wait would freeze the bot, past that
+    `RateLimitedError` is raised instead. Helix errors are raised as `httpx.HTTPStatusError`,
+    and as `CircuitOpenError` without even trying while `breaker` is open.
+    """
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        token: Optional[str] = None,
+        base_url: str = HELIX_URL,
+        token_url: str = TOKEN_URL,
+        transport: Optional[httpx.BaseTransport] = None,
+        timeout: float = 10,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+        breaker: Optional[CircuitBreaker] = None,
+        max_wait: float = 1.0,
+    ):
+        super().__init__(
+            client_id,
+            token,
+            base_url=base_url,
+            token_url=token_url,
+            clock=clock,
+            breaker=breaker,
+        )
+        self.sleep = sleep
+        self.max_wait = max_wait
+        self._client = httpx.Client(
+            base_url=base_url, timeout=timeout, limits=self.limits, transport=transport
+        )
+
+    def __enter__(self) -> "HelixClient":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._client.close()
+
+    def _send(self, path: str, params: Optional[Params]) -> httpx.Response:
+        response = self._client.get(path, params=params, headers=self.headers)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    def get(self, path: str, params: Optional[Params] = None) -> httpx.Response:
+        for attempt in range(2):
+            wait = self.rate_limit.acquire()
+            if wait > self.max_wait:
+                # still empty until it resets, the next call finds out again.
+                self.rate_limit.remaining = 0
+                raise RateLimitedError(wait)
+            if wait:
+                self.sleep(wait)
+            if self.breaker is not None:
+                response = self.breaker.call(lambda: self._send(path, params))
+            else:
+                response = self._send(path, params)
+            self.rate_limit.update(response.headers)
+            # somebody else is using the same bucket, give it one more go once it resets.
+            if response.status_code != 429 or attempt:
+                return response
+            self.rate_limit.remaining = 0
+        return response
+
+    def get_app_access_token(self, client_secret: Optional[str]) -> Optional[str]:
+        response = self._client.post(self.token_url, params=self.token_params(client_secret))
+        return self.access_token(response)
+
+    def search_channels(self, query: str) -> List[Dict]:
+        return response_data(self.get("search/channels", params=[("query", query)]))
+
+    def get_users(self, logins: Sequence[str] = (), ids: Sequence[str] = ()) -> List[Dict]:
+        users = []
+        for params in self.users_params(logins, ids):
+            users += response_data(self.get("users", params=params))
+        return users
+
+    def get_streams(
+        self, user_logins: Sequence[str] = (), user_ids: Sequence[str] = ()
+    ) -> List[Dict]:
+        streams = []
+        for params in self.streams_params(user_logins, user_ids):
+            streams += response_data(self.get("streams", params=params))
+        return streams
+
+
+class AsyncHelixClient(BaseHelixClient):
+    """`HelixClient` for asyncio code, batches of a lookup are sent concurrently."""
+
+    def __init__(
+        self,
+        client_id: Optional[str],
+        token: Optional[str] = None,
+        base_url: str = HELIX_URL,
+        token_url: str = TOKEN_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        timeout: float = 10,
+        clock: Callable[[], float] = time.time,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        super().__init__(
+            client_id,
+            token,
+            base_url=base_url,
+            token_url=token_url,
+            clock=clock,
+            breaker=breaker,
+        )
+        self._client = httpx.AsyncClient(
+            base_url=base_url, timeout=timeout, limits=self.limits, transport=transport
+        )
+
+    async def __aenter__(self) -> "AsyncHelixClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def _send(self, path: str, params: Optional[Params]) -> httpx.Response:
+        response = await self._client.get(path, params=params, headers=self.headers)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response
+
+    async def get(self, path: str, params: Optional[Params] = None) -> httpx.Response:
+        for attempt in range(2):
+            wait = self.rate_limit.acquire()
+            if wait:
+                await asyncio.sleep(wait)
+            if self.breaker is not None:
+                response = await self.breaker.call_async(lambda: self._send(path, params))
+            else:
+                response = await self._send(path, params)
+            self.rate_limit.update(response.headers)
+            if response.status_code != 429 or attempt:
+                return response
+            self.rate_limit.remaining = 0
+        return response
+
+    async def get_app_access_token(self, client_secret: Optional[str]) -> Optional[str]:
+        response = await self._client.post(self.token_url, params=self.token_params(client_secret))
+        return self.access_token(response)
+
+    async def search_channels(self, query: str) -> List[Dict]:
+        return response_data(await self.get("search/channels", params=[("query", query)]))
+
+    async def _get_batches(self, path: str, batches: List[Params]) -> List[Dict]:
+        responses = await asyncio.gather(*(self.get(path, params=params) for params in batches))
+        return [item for response in responses for item in response_data(response)]
+
+    async def get_users(self, logins: Sequence[str] = (), ids: Sequence[str] = ()) -> List[Dict]:
+        return await self._get_batches("users", self.users_params(logins, ids))
+
+    async def get_streams(
+        self, user_logins: Sequence[str] = (), user_ids: Sequence[str] = ()
+    ) -> List[Dict]:
+        return await self._get_batches("streams", self.streams_params(user_logins, user_ids))
+
+
+_shared_client: Optional[HelixClient] = None
+
+
+def shared_client(client_id: Optional[str], token: Optional[str] = None) -> HelixClient:
+    # one pool for the whole process, the bot hands it to commands and the config gets its
+    # token through it too.
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = HelixClient(client_id, token)
+    else:
+        _shared_client.client_id = client_id
+        if token is not None:
+            _shared_client.token = token
+    return _shared_client
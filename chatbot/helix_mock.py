@@ -0,0 +1,144 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import httpx
+
+from chatbot.helix import MAX_BATCH_SIZE
+
+
+class MockHelix:
+    """Stand-in for the parts of the helix API the bot uses, for tests and benchmarks.
+
+    Plug `handle` into an httpx client with `httpx.MockTransport(mock.handle)` or run it as an
+    actual http server on localhost with `serve`. It knows about the users and live streams it
+    was given, enforces helix's `MAX_BATCH_SIZE` and hands out `Ratelimit-*` headers from a
+    bucket of `rate_limit` points refilled every `window` seconds, answering 429 once it's empty.
+    """
+
+    def __init__(
+        self,
+        users: Iterable[Dict] = (),
+        streams: Iterable[Dict] = (),
+        rate_limit: int = 800,
+        window: float = 60,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.users = {user["login"]: user for user in users}
+        self.streams = {stream["user_login"]: stream for stream in streams}
+        self.rate_limit = rate_limit
+        self.window = window
+        self.clock = clock
+        self.remaining = rate_limit
+        self.reset_at = clock() + window
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def add_user(self, login: str, display_name: Optional[str] = None, user_id: str = "") -> None:
+        self.users[login] = {
+            "id": user_id or str(len(self.users) + 1),
+            "login": login,
+            "display_name": display_name or login,
+        }
+
+    def _take_point(self) -> Tuple[bool, Dict[str, str]]:
+        with self._lock:
+            self.requests += 1
+            now = self.clock()
+            if now >= self.reset_at:
+                self.remaining = self.rate_limit
+                self.reset_at = now + self.window
+            allowed = self.remaining > 0
+            if allowed:
+                self.remaining -= 1
+            return allowed, {
+                "Ratelimit-Limit": str(self.rate_limit),
+                "Ratelimit-Remaining": str(self.remaining),
+                "Ratelimit-Reset": str(int(self.reset_at)),
+            }
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        params = request.url.params
+        if path.endswith("/oauth2/token"):
+            return httpx.Response(
+                200, json={"access_token": "mock-token", "expires_in": 3600, "token_type": "bearer"}
+            )
+
+        allowed, headers = self._take_point()
+        if not allowed:
+            return httpx.Response(429, headers=headers, json={"error": "Too Many Requests"})
+        lookups = sum(len(params.get_list(key)) for key in ("login", "id", "user_login", "user_id"))
+        if lookups > MAX_BATCH_SIZE:
+            return httpx.Response(400, headers=headers, json={"error": "Bad Request"})
+
+        if path.endswith("/users"):
+            data = [self.users[login] for login in params.get_list("login") if login in self.users]
+            ids = set(params.get_list("id"))
+            if ids:
+                data += [user for user in self.users.values() if user["id"] in ids]
+        elif path.endswith("/streams"):
+            logins = set(params.get_list("user_login"))
+            ids = set(params.get_list("user_id"))
+            data = [
+                stream
+                for stream in self.streams.values()
+                if stream["user_login"] in logins or stream.get("user_id") in ids
+            ]
+        elif path.endswith("/search/channels"):
+            query = params.get("query", "").lower()
+            data = [
+                {"display_name": user["display_name"], "broadcaster_login": user["login"]}
+                for user in self.users.values()
+                if query and query in user["login"]
+            ]
+        else:
+            return httpx.Response(404, headers=headers, json={"error": "Not Found"})
+        return httpx.Response(200, headers=headers, json={"data": data})
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+        """Serves the mock over http in a background thread, `port=0` picks a free port.
+
+        The helix base url is then `http://{host}:{server.server_port}/helix`, call
+        `server.shutdown()` when done.
+        """
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out in separate writes, don't let nagle sit on the body.
+            disable_nagle_algorithm = True
+
+            def _respond(self) -> None:
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                request = httpx.Request(
+                    self.command,
+                    f"http://{host}{self.path}",
+                    headers=dict(self.headers),
+                    content=body,
+                )
+                response = mock.handle(request)
+                content = json.dumps(response.json()).encode()
+                self.send_response(response.status_code)
+                for key, value in response.headers.items():
+                    if key.lower() not in ("content-length", "content-type"):
+                        self.send_header(key, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = _respond
+            do_POST = _respond
+
+            def log_message(self, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
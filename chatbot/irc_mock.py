@@ -0,0 +1,250 @@
+import itertools
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import irc.bot
+
+HOST_NAME = "tmi.twitch.tv"
+
+
+@dataclass
+class ChatLine:
+    user_name: str
+    text: str
+    badges: str = ""
+    color: str = ""
+    user_id: Optional[str] = None
+    # twitch's emotes tag, `emote_id:start-end,.../...`
+    emotes: str = ""
+
+
+@dataclass
+class BotResponse:
+    received_at: float
+    channel: str
+    text: str
+
+
+class FakeTwitchIRC:
+    """Just enough of twitch's irc server to run the bot against it on localhost.
+
+    Answers the registration with a welcome, acks CAP requests, confirms JOIN/PART and PING,
+    and broadcasts the chat lines it's told to send (`send_privmsg`, `replay`) to the clients
+    that joined the channel, tagged like twitch does. Every PRIVMSG a client sends is kept in
+    `responses` with the `clock` time it arrived at, which is what end to end latencies get
+    measured against.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        self.clock = clock
+        self.caps: Set[str] = set()
+        self.joined: Set[str] = set()
+        self.responses: List[BotResponse] = []
+        self.received: List[str] = []
+        self._clients: List["_ClientHandler"] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = socketserver.ThreadingTCPServer((host, port), _ClientHandler)
+        self._server.daemon_threads = True
+        self._server.fake = self  # type: ignore
+        self._thread: Optional[threading.Thread] = None
+        # server_address is typed for every socket family, an AF_INET one is (host, port).
+        self._address: Tuple[str, int] = self._server.socket.getsockname()
+
+    @property
+    def host(self) -> str:
+        return self._address[0]
+
+    @property
+    def port(self) -> int:
+        return self._address[1]
+
+    def start(self) -> "FakeTwitchIRC":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        with self._lock:
+            for client in self._clients:
+                client.close()
+
+    def __enter__(self) -> "FakeTwitchIRC":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def _broadcast(self, channel: str, line: str) -> None:
+        with self._lock:
+            clients = [client for client in self._clients if channel in client.channels]
+        for client in clients:
+            client.send(line)
+
+    def format_privmsg(self, channel: str, chat_line: ChatLine, sent_at: float) -> str:
+        login = chat_line.user_name.lower()
+        user_id = chat_line.user_id or str(abs(hash(login)) % 10**9)
+        tags = ";".join(
+            [
+                "badge-info=",
+                f"badges={chat_line.badges}",
+                f"color={chat_line.color}",
+                f"display-name={chat_line.user_name}",
+                f"emotes={chat_line.emotes}",
+                f"id={next(self._ids)}",
+                "mod=0",
+                "room-id=1",
+                "subscriber=0",
+                f"tmi-sent-ts={int(sent_at * 1000)}",
+                "turbo=0",
+                f"user-id={user_id}",
+                "user-type=",
+            ]
+        )
+        return f"@{tags} :{login}!{login}@{login}.{HOST_NAME} PRIVMSG {channel} :{chat_line.text}"
+
+    def send_privmsg(self, channel: str, chat_line: ChatLine) -> float:
+        """Sends a chat line to whoever joined `channel`, returns the `clock` time it went out."""
+        sent_at = self.clock()
+        self._broadcast(channel, self.format_privmsg(channel, chat_line, time.time()))
+        return sent_at
+
+    def send_join(self, channel: str, user_name: str) -> None:
+        login = user_name.lower()
+        self._broadcast(channel, f":{login}!{login}@{login}.{HOST_NAME} JOIN {channel}")
+
+    def send_part(self, channel: str, user_name: str) -> None:
+        login = user_name.lower()
+        self._broadcast(channel, f":{login}!{login}@{login}.{HOST_NAME} PART {channel}")
+
+    def replay(self, channel: str, chat_lines: Iterable[ChatLine], rate: float) -> List[float]:
+        """Sends `chat_lines` at `rate` lines per second, returns when each one went out.
+
+        Lines are paced against when the replay started rather than the previous line, so a slow
+        send is caught up on instead of lowering the rate.
+        """
+        sent_at = []
+        start = self.clock()
+        for i, chat_line in enumerate(chat_lines):
+            delay = start + i / rate - self.clock()
+            if delay > 0:
+                time.sleep(delay)
+            sent_at.append(self.send_privmsg(channel, chat_line))
+        return sent_at
+
+    def wait_for(self, condition: Callable[[], bool], timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+
+class _ClientHandler(socketserver.StreamRequestHandler):
+    server: socketserver.ThreadingTCPServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.fake: FakeTwitchIRC = self.server.fake  # type: ignore
+        self.nick = "*"
+        self.channels: Set[str] = set()
+        self._write_lock = threading.Lock()
+        with self.fake._lock:
+            self.fake._clients.append(self)
+
+    def finish(self) -> None:
+        with self.fake._lock:
+            if self in self.fake._clients:
+                self.fake._clients.remove(self)
+        super().finish()
+
+    def send(self, line: str) -> None:
+        try:
+            with self._write_lock:
+                self.wfile.write(f"{line}\r\n".encode("utf-8"))
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def handle(self) -> None:
+        for raw_line in self.rfile:
+            line = raw_line.decode("utf-8", errors="replace").rstrip("\r\n")
+            if not line:
+                continue
+            self.fake.received.append(line)
+            command, _, params = line.partition(" ")
+            command = command.upper()
+            if command == "NICK":
+                self.nick = params.strip().lower()
+            elif command == "USER":
+                for numeric, text in [
+                    ("001", "Welcome, GLHF!"),
+                    ("002", f"Your host is {HOST_NAME}"),
+                    ("003", "This server is rather new"),
+                    ("004", "-"),
+                    ("375", "-"),
+                    ("372", "You are in a maze of twisty passages, all alike."),
+                    ("376", ">"),
+                ]:
+                    self.send(f":{HOST_NAME} {numeric} {self.nick} :{text}")
+            elif command == "CAP":
+                subcommand, _, caps = params.partition(" ")
+                if subcommand.upper() == "REQ":
+                    caps = caps.lstrip(":")
+                    self.fake.caps.update(caps.split())
+                    self.send(f":{HOST_NAME} CAP * ACK :{caps}")
+            elif command == "JOIN":
+                for channel in params.split(","):
+                    channel = channel.strip()
+                    self.channels.add(channel)
+                    self.fake.joined.add(channel)
+                    prefix = f":{self.nick}!{self.nick}@{self.nick}.{HOST_NAME}"
+                    self.send(f"{prefix} JOIN {channel}")
+                    self.send(f":{self.nick}.{HOST_NAME} 353 {self.nick} = {channel} :{self.nick}")
+                    self.send(
+                        f":{self.nick}.{HOST_NAME} 366 {self.nick} {channel} :End of /NAMES list"
+                    )
+            elif command == "PART":
+                channel = params.split()[0]
+                self.channels.discard(channel)
+                self.send(f":{self.nick}!{self.nick}@{self.nick}.{HOST_NAME} PART {channel}")
+            elif command == "PING":
+                self.send(f"PONG :{params.lstrip(':')}")
+            elif command == "PRIVMSG":
+                channel, _, text = params.partition(" ")
+                self.fake.responses.append(BotResponse(self.fake.clock(), channel, text[1:]))
+
+
+def run_bot(bot: irc.bot.SingleServerIRCBot, until: Callable[[], bool], timeout: float) -> bool:
+    """Runs `bot`'s reactor in the calling thread until `until()` is true or `timeout` seconds.
+
+    Connects the bot first if it isn't already. The bot's db connection then stays on the
+    thread that created it, the fake server and any load generator run on their own threads.
+    """
+    if not bot.connection.is_connected():
+        bot._connect()
+    deadline = time.monotonic() + timeout
+    while not until():
+        if time.monotonic() > deadline:
+            return False
+        bot.reactor.process_once(timeout=0.01)
+    return True
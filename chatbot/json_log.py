@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# attributes every LogRecord has, anything else on a record came in through `extra=`.
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message and whatever was passed as `extra`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BufferedRotatingFileHandler(RotatingFileHandler):
+    # a plain RotatingFileHandler flushes after every record, this one leaves the lines in the
+    # file object's buffer until `flush_buffer`, which the listener calls once the queue is empty.
+    def flush(self) -> None:
+        pass
+
+    def flush_buffer(self) -> None:
+        super().flush()
+
+    def close(self) -> None:
+        self.flush_buffer()
+        super().close()
+
+
+class BufferedQueueListener(QueueListener):
+    def __init__(self, records: "queue.SimpleQueue[logging.LogRecord]", *handlers: logging.Handler):
+        super().__init__(records, *handlers)
+        # QueueListener only types its queue as something with get/put.
+        self.records = records
+
+    def handle(self, record: logging.LogRecord) -> None:
+        super().handle(record)
+        # a burst of records gets written out with one flush at its end.
+        if self.records.empty():
+            for handler in self.handlers:
+                if isinstance(handler, BufferedRotatingFileHandler):
+                    handler.flush_buffer()
+
+
+def set_levels(level: str, levels: Dict[str, str]) -> None:
+    logging.getLogger().setLevel(level)
+    for logger_name, logger_level in levels.items():
+        logging.getLogger(logger_name).setLevel(logger_level)
+
+
+def configure_logging(
+    path: str,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    level: str = "INFO",
+    levels: Optional[Dict[str, str]] = None,
+) -> QueueListener:
+    """Sends every record to a rotating JSON lines file at `path`, returns the listener to stop.
+
+    Logging calls only put the record on a queue, formatting and writing happen on the
+    listener's thread so a slow disk never holds up the bot. `levels` sets the level of
+    individual loggers (`{"chatbot.db": "WARNING"}`), the others get `level`.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    file_handler = BufferedRotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonLinesFormatter())
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logging.getLogger().addHandler(QueueHandler(records))
+    set_levels(level, levels or {})
+    listener = BufferedQueueListener(records, file_handler)
+    listener.start()
+    return listener
+
+
+def stop_logging(listener: QueueListener) -> None:
+    # drains whatever is still queued before closing the file.
+    listener.stop()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            root.removeHandler(handler)
+    for handler in listener.handlers:
+        handler.close()
@@ -0,0 +1,66 @@
+import logging
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+NORMAL = 0
+SKIP_DECORATION = 1
+SKIP_RENDERING = 2
+ELEVATED_COMMANDS_ONLY = 3
+
+LEVEL_NAMES = {
+    NORMAL: "normal",
+    SKIP_DECORATION: "skipping emoji and country decoration",
+    SKIP_RENDERING: "skipping terminal rendering of chat lines",
+    ELEVATED_COMMANDS_ONLY: "only processing commands from elevated users",
+}
+DEFAULT_THRESHOLDS = [2.0, 5.0, 10.0]
+
+
+class LoadShedder:
+    """Progressively degrades message processing when we fall behind chat, and recovers.
+
+    `observe` is fed the lag between Twitch sending a line (its `tmi-sent-ts` tag) and us
+    handling it. The lag is smoothed, and each of `thresholds` (seconds, ascending) that it
+    crosses bumps the level by one. A level is only left once the smoothed lag is back under
+    `recovery_ratio` times its threshold, so we don't flap around a threshold.
+    """
+
+    def __init__(
+        self,
+        thresholds: Sequence[float] = DEFAULT_THRESHOLDS,
+        smoothing: float = 0.2,
+        recovery_ratio: float = 0.5,
+    ):
+        self.thresholds: List[float] = sorted(thresholds)[:ELEVATED_COMMANDS_ONLY]
+        self.smoothing = smoothing
+        self.recovery_ratio = recovery_ratio
+        self.level = NORMAL
+        self.lag = 0.0
+        # twitch's clock and ours never agree exactly, the smallest lag we've seen is our best
+        # guess of the offset between the two.
+        self._clock_offset: Optional[float] = None
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+    def observe(self, sent_at: float, now: float) -> int:
+        raw_lag = now - sent_at
+        if self._clock_offset is None or raw_lag < self._clock_offset:
+            self._clock_offset = raw_lag
+        lag = raw_lag - self._clock_offset
+        self.lag += self.smoothing * (lag - self.lag)
+
+        level = self.level
+        while level < len(self.thresholds) and self.lag > self.thresholds[level]:
+            level += 1
+        while level > NORMAL and self.lag < self.thresholds[level - 1] * self.recovery_ratio:
+            level -= 1
+        if level != self.level:
+            logger.warning(
+                f"Processing lag is {self.lag:.1f}s, load shedding level {self.level} -> {level} "
+                f"({LEVEL_NAMES[level]})"
+            )
+            self.level = level
+        return self.level
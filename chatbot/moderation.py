@@ -0,0 +1,229 @@
+import logging
+import re
+import unicodedata
+from collections import Counter, deque
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+from chatbot.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+LOG = "log"
+DELETE = "delete"
+TIMEOUT = "timeout"
+# when a message hits several terms the harshest action wins.
+ACTIONS = (LOG, DELETE, TIMEOUT)
+
+WILDCARD = "*"
+
+# what people type to get around filters, mapped back to the letter they mean. Anything with a
+# compatibility decomposition (fullwidth letters, ligatures, accents...) is already taken care of
+# by NFKD, these are the look-alikes unicode doesn't consider equivalent.
+CONFUSABLES = str.maketrans(
+    {
+        "@": "a",
+        "$": "s",
+        "|": "l",
+        # cyrillic
+        "а": "a",
+        "в": "b",
+        "е": "e",
+        "к": "k",
+        "м": "m",
+        "н": "h",
+        "о": "o",
+        "р": "p",
+        "с": "c",
+        "т": "t",
+        "у": "y",
+        "х": "x",
+        "і": "i",
+        "ј": "j",
+        "ѕ": "s",
+        # greek
+        "α": "a",
+        "β": "b",
+        "ε": "e",
+        "ι": "i",
+        "κ": "k",
+        "ν": "v",
+        "ο": "o",
+        "ρ": "p",
+        "τ": "t",
+        "υ": "u",
+        "χ": "x",
+    }
+)
+
+
+# digits standing in for letters, only folded in words that have letters too so that numbers
+# (scores, times, "455 points") stay numbers.
+LEET_DIGITS = str.maketrans({"0": "o", "1": "i", "3": "e", "4": "a", "5": "s", "7": "t", "8": "b"})
+WORD_WITH_DIGITS = re.compile(r"\w*\d\w*")
+
+
+def _fold_digits(match: "re.Match[str]") -> str:
+    word = match.group()
+    return word if word.isdigit() else word.translate(LEET_DIGITS)
+
+
+def normalise(text: str) -> str:
+    """Folds case, accents and look-alike characters so `B4D`, `bäd` and `Ьad`... match `bad`."""
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    text = text.casefold().translate(CONFUSABLES)
+    return WORD_WITH_DIGITS.sub(_fold_digits, text)
+
+
+class TermAutomaton:
+    """Aho-Corasick automaton finding every term in a text in one pass over it.
+
+    Terms are matched as whole words unless they start and/or end with `*`: `*bad*` matches
+    anywhere, `bad*` at the start of a word. Adding or removing a term only touches its path in
+    the trie, the failure links are recomputed lazily by the next search so a batch of edits
+    costs one pass over the trie.
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # terms ending at a node, and once linked, at any of its proper suffixes.
+        self._ends: List[Set[str]] = [set()]
+        self._outputs: List[Tuple[str, ...]] = [()]
+        self._patterns: Dict[str, Tuple[str, bool, bool]] = {}
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self._patterns
+
+    @staticmethod
+    def parse(term: str) -> Tuple[str, bool, bool]:
+        # (normalised pattern, can start mid word, can end mid word)
+        return (
+            normalise(term.strip(WILDCARD)),
+            term.startswith(WILDCARD),
+            term.endswith(WILDCARD),
+        )
+
+    def _node(self, pattern: str) -> int:
+        node = 0
+        for char in pattern:
+            child = self._goto[node].get(char)
+            if child is None:
+                child = len(self._goto)
+                self._goto[node][char] = child
+                self._goto.append({})
+                self._fail.append(0)
+                self._ends.append(set())
+                self._outputs.append(())
+            node = child
+        return node
+
+    def add(self, term: str) -> bool:
+        parsed = self.parse(term)
+        if not parsed[0] or self._patterns.get(term) == parsed:
+            return False
+        self._patterns[term] = parsed
+        self._ends[self._node(parsed[0])].add(term)
+        self._dirty = True
+        return True
+
+    def remove(self, term: str) -> bool:
+        parsed = self._patterns.pop(term, None)
+        if parsed is None:
+            return False
+        # the path stays in the trie, it is only a few dict entries and terms tend to come back.
+        self._ends[self._node(parsed[0])].discard(term)
+        self._dirty = True
+        return True
+
+    def _link(self) -> None:
+        # breadth first so a node's failure target is always linked before the node itself.
+        queue: Deque[int] = deque()
+        for child in self._goto[0].values():
+            self._fail[child] = 0
+            self._outputs[child] = tuple(self._ends[child])
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._outputs[child] = tuple(self._ends[child]) + self._outputs[self._fail[child]]
+                queue.append(child)
+        self._dirty = False
+
+    def search(self, text: str) -> Iterator[str]:
+        """Yields the terms found in `text`, once per occurrence."""
+        if self._dirty:
+            self._link()
+        if not self._patterns:
+            return
+        text = normalise(text)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        node = 0
+        for end, char in enumerate(text, start=1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for term in outputs[node]:
+                pattern, open_start, open_end = self._patterns[term]
+                start = end - len(pattern)
+                if (open_start or start == 0 or not text[start - 1].isalnum()) and (
+                    open_end or end == len(text) or not text[end].isalnum()
+                ):
+                    yield term
+
+
+class ModerationFilter:
+    """Banned terms from the `banned_terms` table, checked against every chat line.
+
+    `check` returns the harshest action of the terms a message contains, acting on it is left
+    to the bot. Terms are stored lowercased as given, with their action.
+    """
+
+    def __init__(self, db_connector: StorageBackend):
+        self.db_connector = db_connector
+        self.automaton = TermAutomaton()
+        self.actions: Dict[str, str] = {}
+        self.caught: Counter = Counter()
+        for term, action in self.db_connector.get_banned_terms():
+            self.actions[term] = action
+            self.automaton.add(term)
+
+    def add_term(self, term: str, action: str = DELETE, added_by: Optional[str] = None) -> str:
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown moderation action {action}")
+        term = term.strip().lower()
+        if not TermAutomaton.parse(term)[0]:
+            raise ValueError(f"Nothing to match in {term!r}")
+        self.db_connector.add_banned_term(term, action, added_by=added_by)
+        self.actions[term] = action
+        self.automaton.add(term)
+        return term
+
+    def remove_term(self, term: str) -> bool:
+        term = term.strip().lower()
+        self.db_connector.remove_banned_term(term)
+        self.actions.pop(term, None)
+        return self.automaton.remove(term)
+
+    def check(self, text: str) -> Optional[Tuple[str, str]]:
+        """Returns (action, term) for the harshest term found in `text`, None if it's clean."""
+        verdict: Optional[Tuple[str, str]] = None
+        for term in self.automaton.search(text):
+            action = self.actions[term]
+            if verdict is None or ACTIONS.index(action) > ACTIONS.index(verdict[0]):
+                verdict = (action, term)
+                if action == TIMEOUT:
+                    break
+        if verdict is not None:
+            self.caught[verdict[0]] += 1
+            logger.warning(f"Message matched banned term {verdict[1]!r}, action: {verdict[0]}")
+        return verdict
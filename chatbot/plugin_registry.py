@@ -0,0 +1,185 @@
+import ast
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+from dataclasses import dataclass, field
+from importlib import metadata
+from types import ModuleType
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_PLUGINS_DIR = os.path.join(os.path.dirname(__file__), "plugins")
+ENTRY_POINTS_GROUP = "datafrittata_chatbot.commands"
+# directory plugins get imported under this prefix so they can't shadow real modules.
+PLUGIN_MODULE_PREFIX = "chatbot_plugins"
+
+
+@dataclass
+class PluginSpec:
+    name: str
+    # maps command names to the name of the class implementing them in the plugin module
+    commands: Dict[str, str]
+    path: Optional[str] = None
+    module_name: Optional[str] = None
+    module: Optional[ModuleType] = field(default=None, repr=False)
+
+
+def read_manifest(path: str) -> Optional[Dict[str, str]]:
+    # a plugin module declares `COMMANDS = {"command_name": "ClassName"}` at the top level. We
+    # read it from the source so that discovering a plugin never imports it.
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "COMMANDS" for target in node.targets
+        ):
+            commands = ast.literal_eval(node.value)
+            if isinstance(commands, dict):
+                return {str(k): str(v) for k, v in commands.items()}
+    return None
+
+
+def _command_entry_points() -> Iterable[metadata.EntryPoint]:
+    entry_points = metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group=ENTRY_POINTS_GROUP)
+    return entry_points.get(ENTRY_POINTS_GROUP, [])  # type: ignore
+
+
+class PluginRegistry:
+    """Finds command plugins up front but only imports them the first time they're invoked.
+
+    Plugins come from python files in the plugin directories (see `read_manifest`) and from
+    the `datafrittata_chatbot.commands` entry points group, where the entry point name is the
+    command name and its value points at the command class. Like the builtin commands, each
+    plugin command gets a single handler instance. `reload` re-imports a plugin so the next
+    invocation of its commands picks up the new code, nothing else is touched.
+    """
+
+    def __init__(self, plugin_dirs: Optional[List[str]] = None, use_entry_points: bool = True):
+        self.plugin_dirs = [BUILTIN_PLUGINS_DIR] if plugin_dirs is None else plugin_dirs
+        self.use_entry_points = use_entry_points
+        self.plugins: Dict[str, PluginSpec] = {}
+        self._command_index: Dict[str, PluginSpec] = {}
+        self._handlers: Dict[str, Any] = {}
+        self.discover()
+
+    @property
+    def command_names(self) -> List[str]:
+        return list(self._command_index.keys())
+
+    def discover(self) -> None:
+        plugins: Dict[str, PluginSpec] = {}
+        for plugin_dir in self.plugin_dirs:
+            if not os.path.isdir(plugin_dir):
+                continue
+            for file_name in sorted(os.listdir(plugin_dir)):
+                stem, extension = os.path.splitext(file_name)
+                if extension != ".py" or stem.startswith("_"):
+                    continue
+                if stem in plugins:
+                    logger.warning(f"Plugin {stem} in {plugin_dir} is shadowed, skipping it")
+                    continue
+                path = os.path.join(plugin_dir, file_name)
+                try:
+                    commands = read_manifest(path)
+                except (SyntaxError, TypeError, ValueError) as e:
+                    logger.error(f"Could not read the COMMANDS of plugin {path}: {e}")
+                    continue
+                if not commands:
+                    logger.warning(f"{path} does not declare any COMMANDS, skipping it")
+                    continue
+                plugins[stem] = PluginSpec(name=stem, commands=commands, path=path)
+
+        if self.use_entry_points:
+            for entry_point in _command_entry_points():
+                module_name, _, class_name = entry_point.value.partition(":")
+                spec = plugins.setdefault(
+                    module_name, PluginSpec(name=module_name, commands={}, module_name=module_name)
+                )
+                spec.commands[entry_point.name] = class_name
+
+        # keep the modules we already imported around so a rediscovery doesn't drop them.
+        for name, spec in plugins.items():
+            previous = self.plugins.get(name)
+            if previous is not None and previous.path == spec.path:
+                spec.module = previous.module
+
+        self.plugins = plugins
+        self._command_index = {
+            command_name: spec
+            for spec in self.plugins.values()
+            for command_name in spec.commands.keys()
+        }
+        self._handlers = {
+            command_name: handler
+            for command_name, handler in self._handlers.items()
+            if command_name in self._command_index
+        }
+
+    def _import(self, spec: PluginSpec, force: bool = False) -> ModuleType:
+        if spec.module is not None and not force:
+            return spec.module
+        if spec.path is not None:
+            module_name = f"{PLUGIN_MODULE_PREFIX}.{spec.name}"
+            module_spec = importlib.util.spec_from_file_location(module_name, spec.path)
+            assert module_spec is not None and module_spec.loader is not None
+            module = importlib.util.module_from_spec(module_spec)
+            previous_module = sys.modules.get(module_name)
+            sys.modules[module_name] = module
+            try:
+                module_spec.loader.exec_module(module)
+            except Exception:
+                if previous_module is not None:
+                    sys.modules[module_name] = previous_module
+                else:
+                    del sys.modules[module_name]
+                raise
+        else:
+            assert spec.module_name is not None
+            module = importlib.import_module(spec.module_name)
+            if force:
+                module = importlib.reload(module)
+        spec.module = module
+        return module
+
+    def get(self, command_name: str) -> Optional[Any]:
+        handler = self._handlers.get(command_name)
+        if handler is not None:
+            return handler
+        spec = self._command_index.get(command_name)
+        if spec is None:
+            return None
+        try:
+            module = self._import(spec)
+            handler = getattr(module, spec.commands[command_name])()
+        except Exception as e:
+            logger.error(f"Could not load !{command_name} from plugin {spec.name}: {e}")
+            return None
+        self._handlers[command_name] = handler
+        return handler
+
+    def reload(self, plugin_name: Optional[str] = None) -> List[str]:
+        # re-reads the manifests (which also picks up new plugins) then re-imports either the
+        # given plugin or all the ones that were already loaded. Returns what got re-imported.
+        self.discover()
+        to_reload = [
+            spec
+            for spec in self.plugins.values()
+            if (plugin_name is None and spec.module is not None) or spec.name == plugin_name
+        ]
+        reloaded = []
+        for spec in to_reload:
+            try:
+                # import the new code first so a broken plugin keeps serving its old handlers.
+                self._import(spec, force=True)
+            except Exception as e:
+                logger.error(f"Could not reload plugin {spec.name}: {e}")
+                continue
+            for command_name in spec.commands:
+                self._handlers.pop(command_name, None)
+            reloaded.append(spec.name)
+        return reloaded
@@ -0,0 +1,12 @@
+from typing import Optional
+
+from chatbot.commands import BaseCommand, CommandContext
+
+COMMANDS = {"lurk": "LurkCommand"}
+
+
+class LurkCommand(BaseCommand):
+    __slots__ = ()
+
+    def run(self, context: CommandContext) -> Optional[str]:
+        return f"Enjoy the lurk {context.user_name}, we'll keep the frittata warm"
@@ -0,0 +1,87 @@
+import time
+from collections import defaultdict
+from typing import Callable, DefaultDict, Dict, List, Optional, Tuple
+
+from chatbot.storage import StorageBackend
+
+
+class PointsBank:
+    """Loyalty points, earned per chat message and per minute of activity.
+
+    Message points pile up in memory. `tick`, meant to run once a minute, hands out
+    `per_minute` to everyone who chatted in the last `active_window` seconds and writes those
+    along with the pending message points as one statement, whatever the number of viewers.
+    Balances are read from storage once and then kept up to date by every write going through
+    here, so `balance` never hits the db twice for the same viewer. `spend` is a conditional
+    update, two commands racing for the same points can't both get them.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        per_message: int = 1,
+        per_minute: int = 10,
+        active_window: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db_connector = db_connector
+        self.per_message = per_message
+        self.per_minute = per_minute
+        self.active_window = active_window
+        self.clock = clock
+        self.pending: DefaultDict[str, int] = defaultdict(int)
+        self.last_active: Dict[str, float] = {}
+        self.user_names: Dict[str, str] = {}
+        self.balances: Dict[str, int] = {}
+
+    def record_message(self, user_id: str, user_name: str, now: Optional[float] = None) -> None:
+        self.pending[user_id] += self.per_message
+        self.last_active[user_id] = self.clock() if now is None else now
+        self.user_names[user_id] = user_name
+
+    def _award(self, awards: Dict[str, int]) -> None:
+        if not awards:
+            return
+        self.db_connector.award_points(
+            [
+                {"user_id": user_id, "user_name": self.user_names[user_id], "points": points}
+                for user_id, points in awards.items()
+            ]
+        )
+        for user_id, points in awards.items():
+            if user_id in self.balances:
+                self.balances[user_id] += points
+
+    def tick(self, now: Optional[float] = None) -> None:
+        now = self.clock() if now is None else now
+        awards, self.pending = self.pending, defaultdict(int)
+        for user_id, last_active in list(self.last_active.items()):
+            if now - last_active > self.active_window:
+                del self.last_active[user_id]
+            else:
+                awards[user_id] += self.per_minute
+        self._award(awards)
+
+    def flush(self) -> None:
+        # pending message points only, minutes are only handed out by ticks.
+        awards, self.pending = self.pending, defaultdict(int)
+        self._award(awards)
+
+    def balance(self, user_id: str) -> int:
+        balance = self.balances.get(user_id)
+        if balance is None:
+            balance = self.balances[user_id] = self.db_connector.get_points(user_id)
+        return balance + self.pending.get(user_id, 0)
+
+    def spend(self, user_id: str, points: int) -> bool:
+        pending = self.pending.pop(user_id, 0)
+        if pending:
+            self._award({user_id: pending})
+        balance = self.db_connector.spend_points(user_id, points)
+        if balance is None:
+            return False
+        self.balances[user_id] = balance
+        return True
+
+    def top(self, limit: int = 5) -> List[Tuple[str, int]]:
+        return self.db_connector.get_top_points(limit)
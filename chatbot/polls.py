@@ -0,0 +1,111 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from chatbot.storage import StorageBackend
+
+MAX_OPTIONS = 9
+
+
+@dataclass
+class Poll:
+    question: str
+    options: List[str]
+    started_by: Optional[str] = None
+    started_at: datetime = field(default_factory=datetime.now)
+    tallies: List[int] = field(default_factory=list)
+    # user_id -> index of the option they voted for
+    votes: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self.tallies = [0] * len(self.options)
+
+    def results(self) -> str:
+        total = len(self.votes)
+        options = " | ".join(
+            f"{position}) {option}: {tally} ({tally / total if total else 0:.0%})"
+            for position, (option, tally) in enumerate(zip(self.options, self.tallies), start=1)
+        )
+        return f"{self.question} {options} ({total} votes)"
+
+
+class PollManager:
+    """One poll at a time, voted on by typing an option's number in chat.
+
+    Votes only touch memory: a dict of who voted for what and a list of tallies, so a vote,
+    or a change of mind when `last_vote_wins`, is a couple of O(1) updates whatever the number
+    of voters. `tick`, meant to be called every second or so, posts the standings at most every
+    `results_interval` seconds and only when they moved. Only the final result gets stored,
+    when the poll ends.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        send: Callable[[str], None],
+        results_interval: float = 30,
+        last_vote_wins: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db_connector = db_connector
+        self.send = send
+        self.results_interval = results_interval
+        self.last_vote_wins = last_vote_wins
+        self.clock = clock
+        self.poll: Optional[Poll] = None
+        self._changed = False
+        self._posted_at = 0.0
+
+    def start(self, question: str, options: List[str], started_by: Optional[str] = None) -> Poll:
+        if self.poll is not None:
+            raise ValueError("A poll is already running, end it first")
+        if not 2 <= len(options) <= MAX_OPTIONS:
+            raise ValueError(f"A poll needs between 2 and {MAX_OPTIONS} options")
+        self.poll = Poll(question, options, started_by=started_by)
+        self._changed = False
+        self._posted_at = self.clock()
+        return self.poll
+
+    def parse_vote(self, text: str) -> Optional[int]:
+        # called on every chat line while a poll runs, before anything else looks at it.
+        text = text.strip()
+        if self.poll is None or len(text) != 1 or text not in "123456789":
+            return None
+        choice = int(text) - 1
+        return choice if 0 <= choice < len(self.poll.options) else None
+
+    def vote(self, user_id: str, choice: int) -> bool:
+        poll = self.poll
+        if poll is None:
+            return False
+        previous = poll.votes.get(user_id)
+        if previous is not None:
+            if previous == choice or not self.last_vote_wins:
+                return False
+            poll.tallies[previous] -= 1
+        poll.votes[user_id] = choice
+        poll.tallies[choice] += 1
+        self._changed = True
+        return True
+
+    def tick(self) -> None:
+        if self.poll is None or not self._changed:
+            return
+        now = self.clock()
+        if now - self._posted_at >= self.results_interval:
+            self.send(self.poll.results())
+            self._changed = False
+            self._posted_at = now
+
+    def end(self) -> Optional[Poll]:
+        poll, self.poll = self.poll, None
+        if poll is not None:
+            self.db_connector.save_poll(
+                poll.question,
+                list(zip(poll.options, poll.tallies)),
+                started_by=poll.started_by,
+                started_at=poll.started_at,
+                ended_at=datetime.now(),
+            )
+        return poll
@@ -0,0 +1,111 @@
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, DefaultDict, Dict, Optional
+
+from chatbot.storage import StorageBackend
+
+
+class PresenceTracker:
+    """Who is in the channel, from JOIN/PART membership events, and how long they've watched.
+
+    Viewers are keyed by login since that's all membership events carry. Time spent present
+    accrues in memory, `flush` writes the accrued seconds of everyone who watched since the last
+    flush as one batch of deltas. Stored totals are read once per viewer, when first asked for.
+
+    Someone who chats without a JOIN we heard of won't get a PART either, they count as present
+    until `idle_timeout` seconds after their last line and `flush` parts them then.
+    """
+
+    def __init__(
+        self,
+        db_connector: StorageBackend,
+        idle_timeout: float = 600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.db_connector = db_connector
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        # channel -> login -> when their current stretch started accruing
+        self.present: DefaultDict[str, Dict[str, float]] = defaultdict(dict)
+        # channel -> login -> their last line, for the viewers only chat told us about
+        self.chatting: DefaultDict[str, Dict[str, float]] = defaultdict(dict)
+        self.pending: DefaultDict[str, float] = defaultdict(float)
+        self.stored: Dict[str, float] = {}
+
+    def join(self, channel: str, user_name: str, now: Optional[float] = None) -> None:
+        # their PART will come, no need to watch them go quiet.
+        self.chatting[channel].pop(user_name.lower(), None)
+        self.present[channel].setdefault(user_name.lower(), self.clock() if now is None else now)
+
+    def chatted(self, channel: str, user_name: str, now: Optional[float] = None) -> None:
+        user_name = user_name.lower()
+        if user_name in self.present[channel] and user_name not in self.chatting[channel]:
+            return
+        now = self.clock() if now is None else now
+        self.present[channel].setdefault(user_name, now)
+        self.chatting[channel][user_name] = now
+
+    def part(self, channel: str, user_name: str, now: Optional[float] = None) -> None:
+        self.chatting[channel].pop(user_name.lower(), None)
+        since = self.present[channel].pop(user_name.lower(), None)
+        if since is not None:
+            self.pending[user_name.lower()] += (self.clock() if now is None else now) - since
+
+    def leave_all(self, now: Optional[float] = None) -> None:
+        # the connection dropped, we won't hear the PARTs.
+        now = self.clock() if now is None else now
+        for channel, users in self.present.items():
+            for user_name in list(users):
+                self.part(channel, user_name, now=now)
+
+    def viewers(self, channel: str) -> int:
+        return len(self.present[channel])
+
+    def _part_idle(self, now: float) -> None:
+        # they stopped watching at some point after their last line, credit them the timeout.
+        for channel, chatters in self.chatting.items():
+            for user_name, last_line_at in list(chatters.items()):
+                if now - last_line_at > self.idle_timeout:
+                    self.part(channel, user_name, now=last_line_at + self.idle_timeout)
+
+    def _accrue(self, now: float) -> None:
+        for users in self.present.values():
+            for user_name, since in users.items():
+                self.pending[user_name] += now - since
+                users[user_name] = now
+
+    def watch_time(self, user_name: str, now: Optional[float] = None) -> float:
+        """Seconds `user_name` has been watching, stored and not yet flushed alike."""
+        user_name = user_name.lower()
+        now = self.clock() if now is None else now
+        stored = self.stored.get(user_name)
+        if stored is None:
+            stored = self.stored[user_name] = self.db_connector.get_watch_time(user_name)
+        ongoing = sum(
+            now - users[user_name] for users in self.present.values() if user_name in users
+        )
+        return stored + self.pending.get(user_name, 0.0) + ongoing
+
+    def flush(self, now: Optional[float] = None) -> None:
+        now = self.clock() if now is None else now
+        self._part_idle(now)
+        self._accrue(now)
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, defaultdict(float)
+        last_seen_at = datetime.now()
+        stored = self.db_connector.upsert_watch_time(
+            [
+                {"user_name": user_name, "seconds": seconds, "last_seen_at": last_seen_at}
+                for user_name, seconds in pending.items()
+            ]
+        )
+        if not stored:
+            # try again next flush, along with whatever accrues until then.
+            for user_name, seconds in pending.items():
+                self.pending[user_name] += seconds
+            return
+        for user_name, seconds in pending.items():
+            if user_name in self.stored:
+                self.stored[user_name] += seconds
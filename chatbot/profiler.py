@@ -0,0 +1,119 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from types import CodeType, FrameType
+from typing import Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+UNATTRIBUTED = "bot"
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack from a background thread every `interval` seconds.
+
+    Nothing runs on the profiled thread besides `attribute`, which only swaps a string, so it can
+    stay on for a whole stream. Samples are kept as collapsed stacks, the root frame being the
+    label the profiled thread was attributing its work to at the time (`command:uptime`...),
+    written one `frame;frame;frame count` line per stack which is what flamegraph.pl, speedscope
+    and friends read.
+    """
+
+    def __init__(self, interval: float = 0.01, clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self.label = UNATTRIBUTED
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.output_path: Optional[str] = None
+        self._frame_names: Dict[CodeType, str] = {}
+        self._thread_id: Optional[int] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._until: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None and self._sampler.is_alive()
+
+    @contextmanager
+    def attribute(self, label: str) -> Iterator[None]:
+        previous, self.label = self.label, label
+        try:
+            yield
+        finally:
+            self.label = previous
+
+    def start(
+        self,
+        duration: Optional[float] = None,
+        output_path: Optional[str] = None,
+        thread_id: Optional[int] = None,
+    ) -> bool:
+        """Starts sampling `thread_id`, the calling thread by default, returns False if already on.
+
+        With a `duration` the sampler stops by itself after that many seconds and, if there's an
+        `output_path`, writes the profile there.
+        """
+        if self.running:
+            return False
+        self.stacks = Counter()
+        self.samples = 0
+        self.output_path = output_path
+        self._thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self._until = None if duration is None else self.clock() + duration
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._sampler.start()
+        return True
+
+    def stop(self) -> Counter:
+        if self._sampler is not None:
+            self._stop.set()
+            if self._sampler is not threading.current_thread():
+                self._sampler.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            if self._until is not None and self.clock() >= self._until:
+                break
+            self.sample()
+        if self._until is not None and self.output_path and not self._stop.is_set():
+            self.write(self.output_path)
+
+    def frame_name(self, code: CodeType) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            # the file's directory keeps the modules called the same apart (db.py...)
+            directory, file_name = os.path.split(code.co_filename)
+            if directory:
+                file_name = f"{os.path.basename(directory)}/{file_name}"
+            name = f"{code.co_name} ({file_name}:{code.co_firstlineno})"
+            self._frame_names[code] = name
+        return name
+
+    def sample(self) -> None:
+        frame: Optional[FrameType] = sys._current_frames().get(self._thread_id)  # type: ignore
+        label = self.label
+        stack = []
+        while frame is not None:
+            stack.append(self.frame_name(frame.f_code))
+            frame = frame.f_back
+        stack.append(label)
+        stack.reverse()
+        self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def write(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info(f"Wrote {self.samples} profile samples to {path}")
@@ -0,0 +1,132 @@
+import random
+import secrets
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from chatbot.storage import StorageBackend
+
+
+class Raffle:
+    """Entrants of one giveaway and the winners drawn from them.
+
+    Entering is a dict insert keyed by user_id, so however many times someone types `!raffle`
+    they're in once. Entries close with the first draw, which builds a Fenwick tree over the
+    entrants' weights in O(n). Every draw is then a random number and an O(log n) walk down the
+    tree, winners are taken out of it so nobody wins twice. The draws only depend on `seed` and
+    the order people entered in, which is what gets stored, so they can be replayed.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self.seed = secrets.randbits(32) if seed is None else seed
+        self.random = random.Random(self.seed)
+        self.opened_at = datetime.now()
+        # user_id -> (user_name, weight), in the order they entered
+        self.entrants: Dict[str, Tuple[str, int]] = {}
+        self.winners: List[str] = []
+        self._user_ids: List[str] = []
+        self._tree: List[int] = []
+        self._total = 0
+
+    @property
+    def is_open(self) -> bool:
+        return not self._user_ids
+
+    def enter(self, user_id: str, user_name: str, weight: int = 1) -> bool:
+        if not self.is_open or user_id in self.entrants:
+            return False
+        self.entrants[user_id] = (user_name, weight)
+        return True
+
+    def _build(self) -> None:
+        self._user_ids = list(self.entrants)
+        self._tree = [0] + [weight for _, weight in self.entrants.values()]
+        for i in range(1, len(self._tree)):
+            parent = i + (i & -i)
+            if parent < len(self._tree):
+                self._tree[parent] += self._tree[i]
+        self._total = sum(weight for _, weight in self.entrants.values())
+
+    def _update(self, position: int, delta: int) -> None:
+        position += 1
+        while position < len(self._tree):
+            self._tree[position] += delta
+            position += position & -position
+
+    def _find(self, target: int) -> int:
+        # largest position whose prefix sum is <= target, that is the entrant `target` lands on.
+        position = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            if position + step < len(self._tree) and self._tree[position + step] <= target:
+                position += step
+                target -= self._tree[position]
+            step >>= 1
+        return position
+
+    def draw(self) -> Optional[str]:
+        """Picks a winner among those who haven't won yet, None once everyone has."""
+        if self.is_open:
+            if not self.entrants:
+                return None
+            self._build()
+        if self._total <= 0:
+            return None
+        position = self._find(self.random.randrange(self._total))
+        user_id = self._user_ids[position]
+        weight = self.entrants[user_id][1]
+        self._update(position, -weight)
+        self._total -= weight
+        self.winners.append(user_id)
+        return user_id
+
+
+class RaffleManager:
+    """The running raffle, if any. Nothing is written until it's closed, then in one go."""
+
+    def __init__(
+        self, db_connector: StorageBackend, badge_weights: Optional[Dict[str, int]] = None
+    ):
+        self.db_connector = db_connector
+        # entrants with several weighted badges get the best of them, everyone else 1.
+        self.badge_weights = badge_weights or {}
+        self.raffle: Optional[Raffle] = None
+
+    def open(self, seed: Optional[int] = None) -> Raffle:
+        if self.raffle is not None:
+            raise ValueError("A raffle is already running, close it first")
+        # the seed is stored with the raffle, in an INTEGER column.
+        if seed is not None and not 0 <= seed < 2**63:
+            raise ValueError("The seed has to be a number below 2^63")
+        self.raffle = Raffle(seed)
+        return self.raffle
+
+    def weight(self, badges: Iterable[str]) -> int:
+        return max((self.badge_weights.get(badge, 1) for badge in badges), default=1)
+
+    def enter(self, user_id: str, user_name: str, badges: Iterable[str] = ()) -> bool:
+        if self.raffle is None:
+            return False
+        return self.raffle.enter(user_id, user_name, self.weight(badges))
+
+    def close(self) -> Optional[Raffle]:
+        raffle, self.raffle = self.raffle, None
+        if raffle is not None:
+            ranks = {user_id: rank for rank, user_id in enumerate(raffle.winners, start=1)}
+            self.db_connector.save_raffle(
+                raffle.seed,
+                [
+                    {
+                        "position": position,
+                        "user_id": user_id,
+                        "user_name": user_name,
+                        "weight": weight,
+                        "won_rank": ranks.get(user_id),
+                    }
+                    for position, (user_id, (user_name, weight)) in enumerate(
+                        raffle.entrants.items(), start=1
+                    )
+                ],
+                opened_at=raffle.opened_at,
+                closed_at=datetime.now(),
+            )
+        return raffle
@@ -0,0 +1,550 @@
+import random
+import re
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from typing import Any, DefaultDict, Dict, List, Optional, Set, Tuple
+
+# roughly what sqlite's unicode61 tokenizer considers a token
+QUOTE_TOKEN_PATTERN = re.compile(r"\w+")
+
+DEFAULT_COMMANDS: Dict[str, str] = {
+    "today": "today is not set yet",
+    "source": "no source code or repo provided yet",
+    "bot": (
+        "We're writing the bot on stream, you can find the repo here: "
+        "https://github.com/bastienboutonnet/datafrittata-twitch-chatbot"
+    ),
+}
+
+
+class StorageBackend(ABC):
+    """Everything the bot and its commands read from or write to storage.
+
+    `DbConnector` (in `chatbot.db`) is the SQLAlchemy implementation, `InMemoryDbConnector`
+    keeps the exact same semantics in plain dicts. `tests/test_Storage.py` holds the
+    conformance suite both have to pass.
+    """
+
+    def add_default_commands(self) -> None:
+        self.import_commands(DEFAULT_COMMANDS, {}, overwrite=False)
+
+    # users
+    @abstractmethod
+    def add_new_user(self, user_id: str, user_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def update_user_sign(self, user_id: str, zodiac_sign: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_user_sign(self, user_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def update_user_country(self, user_id: str, user_country: str) -> None:
+        ...
+
+    @abstractmethod
+    def update_user_emoji(self, user_id: str, user_emoji: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_user_emoji(self, user_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def get_user_country(self, user_id: str) -> Optional[str]:
+        ...
+
+    # text commands and aliases
+    @abstractmethod
+    def add_new_command(self, command_name: str, command_response: str) -> None:
+        ...
+
+    @abstractmethod
+    def add_command_alias(self, alias_name: str, aliased_command_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_original_command(self, command_name: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def update_command(self, command_name: str, command_response: str) -> None:
+        ...
+
+    @abstractmethod
+    def remove_command(self, command_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def retrive_command_response(self, command_name: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def increment_command_count(self, command_name: str) -> Optional[int]:
+        # what `{count}` in a text command's response shows, the count after this use. None if
+        # it couldn't be counted.
+        ...
+
+    @abstractmethod
+    def get_all_commands(self) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+        ...
+
+    @abstractmethod
+    def export_commands(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        # ({command_name: command_response}, {alias_name: aliased_command_name})
+        ...
+
+    @abstractmethod
+    def import_commands(
+        self, commands: Dict[str, str], aliases: Dict[str, str], overwrite: bool = True
+    ) -> None:
+        # all or nothing. Existing commands and aliases are left alone unless `overwrite`.
+        ...
+
+    # unknown commands
+    @abstractmethod
+    def upsert_unknown_commands(
+        self, attempts: Dict[str, int], users: Dict[str, Set[str]], attempted_at: datetime
+    ) -> None:
+        ...
+
+    @abstractmethod
+    def get_top_unknown_commands(self, limit: int) -> List[Tuple[str, int, int]]:
+        ...
+
+    # drop results
+    @abstractmethod
+    def get_all_drop_results(self) -> List[Tuple[str, int, float, float]]:
+        ...
+
+    @abstractmethod
+    def upsert_drop_results(self, rows: List[Dict[str, Any]]) -> None:
+        ...
+
+    # activity
+    @abstractmethod
+    def register_stream(self, stream_date: date) -> Optional[date]:
+        ...
+
+    @abstractmethod
+    def get_user_activity(
+        self, user_id: str
+    ) -> Tuple[int, Optional[date], int, Optional[datetime]]:
+        ...
+
+    @abstractmethod
+    def upsert_user_activity(self, rows: List[Dict[str, Any]]) -> bool:
+        # False when the rows could not be stored, the caller keeps them for the next try.
+        ...
+
+    # presence
+    @abstractmethod
+    def get_watch_time(self, user_name: str) -> float:
+        ...
+
+    @abstractmethod
+    def upsert_watch_time(self, rows: List[Dict[str, Any]]) -> bool:
+        # False when the rows could not be stored, the caller keeps them for the next try.
+        ...
+
+    # loyalty points
+    @abstractmethod
+    def get_points(self, user_id: str) -> int:
+        ...
+
+    @abstractmethod
+    def award_points(self, rows: List[Dict[str, Any]]) -> None:
+        # points in the rows are added to the balances, users without one start at 0.
+        ...
+
+    @abstractmethod
+    def spend_points(self, user_id: str, points: int) -> Optional[int]:
+        # the balance left, None without touching it when it's short of `points`.
+        ...
+
+    @abstractmethod
+    def get_top_points(self, limit: int) -> List[Tuple[str, int]]:
+        ...
+
+    # quotes
+    @abstractmethod
+    def add_quote(self, quote_text: str, added_by: Optional[str] = None) -> Optional[int]:
+        ...
+
+    @abstractmethod
+    def get_quote(self, quote_id: int) -> Optional[Tuple[int, str]]:
+        ...
+
+    @abstractmethod
+    def get_random_quote(self) -> Optional[Tuple[int, str]]:
+        ...
+
+    @abstractmethod
+    def search_quotes(self, words: List[str], limit: int = 1) -> List[Tuple[int, str]]:
+        ...
+
+    # timers
+    @abstractmethod
+    def upsert_timer(
+        self, timer_name: str, message: str, interval_minutes: int, min_lines: int
+    ) -> None:
+        ...
+
+    @abstractmethod
+    def remove_timer(self, timer_name: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_timers(self) -> List[Tuple[str, str, int, int]]:
+        ...
+
+    # moderation
+    @abstractmethod
+    def add_banned_term(self, term: str, action: str, added_by: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def remove_banned_term(self, term: str) -> None:
+        ...
+
+    @abstractmethod
+    def get_banned_terms(self) -> List[Tuple[str, str]]:
+        ...
+
+    # polls
+    @abstractmethod
+    def save_poll(
+        self,
+        question: str,
+        results: List[Tuple[str, int]],
+        started_by: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        ended_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        # results are (option, votes) in the order the options were listed.
+        ...
+
+    # raffles
+    @abstractmethod
+    def save_raffle(
+        self,
+        seed: int,
+        entries: List[Dict[str, Any]],
+        opened_at: Optional[datetime] = None,
+        closed_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        # entries have the entrant's position, user_id, user_name, weight and won_rank, None
+        # for those who didn't win.
+        ...
+
+    # emotes
+    @abstractmethod
+    def add_emote_snapshot(self, rows: List[Dict[str, Any]]) -> bool:
+        # rows have stream_date, channel, taken_at, emote, count and error. False when they
+        # could not be stored.
+        ...
+
+    @abstractmethod
+    def get_emote_snapshots(
+        self, stream_date: date, channel: str
+    ) -> List[Tuple[datetime, str, int, int]]:
+        # (taken_at, emote, count, error), oldest snapshot first and most used emote first.
+        ...
+
+
+class InMemoryDbConnector(StorageBackend):
+    """Zero I/O storage backend, handy for tests and benchmarks. Nothing survives the process."""
+
+    def __init__(self) -> None:
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.commands: Dict[str, str] = {}
+        self.aliases: Dict[str, str] = {}
+        self.command_counts: Counter = Counter()
+        self.unknown_commands: Dict[str, Dict[str, Any]] = {}
+        self.unknown_command_users: DefaultDict[str, Set[str]] = defaultdict(set)
+        self.drop_results: Dict[str, Dict[str, Any]] = {}
+        self.user_activity: Dict[str, Dict[str, Any]] = {}
+        self.streams: Set[date] = set()
+        self.watch_time: Dict[str, Dict[str, Any]] = {}
+        self.points: Dict[str, Dict[str, Any]] = {}
+        self.quotes: Dict[int, Dict[str, Any]] = {}
+        self._quote_ids: List[int] = []
+        self.timers: Dict[str, Tuple[str, int, int]] = {}
+        self.banned_terms: Dict[str, Dict[str, Any]] = {}
+        self.polls: List[Dict[str, Any]] = []
+        self.raffles: List[Dict[str, Any]] = []
+        self.emote_snapshots: List[Dict[str, Any]] = []
+        self.add_default_commands()
+
+    def add_new_user(self, user_id: str, user_name: str) -> None:
+        if user_id in self.users:
+            return None
+        self.users[user_id] = {
+            "user_name": user_name,
+            "country": None,
+            "first_chatted_at": datetime.now(),
+            "zodiac_sign": None,
+            "emoji": None,
+        }
+
+    def _update_user(self, user_id: str, **values: Any) -> None:
+        if user_id in self.users:
+            self.users[user_id].update(values)
+
+    def _get_user_value(self, user_id: str, key: str) -> Optional[Any]:
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        return user[key]
+
+    def update_user_sign(self, user_id: str, zodiac_sign: str) -> None:
+        self._update_user(user_id, zodiac_sign=zodiac_sign.lower())
+
+    def get_user_sign(self, user_id: str) -> Optional[str]:
+        return self._get_user_value(user_id, "zodiac_sign")
+
+    def update_user_country(self, user_id: str, user_country: str) -> None:
+        self._update_user(user_id, country=user_country)
+
+    def update_user_emoji(self, user_id: str, user_emoji: str) -> None:
+        self._update_user(user_id, emoji=user_emoji)
+
+    def get_user_emoji(self, user_id: str) -> Optional[str]:
+        return self._get_user_value(user_id, "emoji")
+
+    def get_user_country(self, user_id: str) -> Optional[str]:
+        return self._get_user_value(user_id, "country")
+
+    def add_new_command(self, command_name: str, command_response: str) -> None:
+        self.commands.setdefault(command_name, command_response)
+
+    def add_command_alias(self, alias_name: str, aliased_command_name: str) -> None:
+        self.aliases.setdefault(alias_name, aliased_command_name)
+
+    def get_original_command(self, command_name: str) -> Optional[str]:
+        return self.aliases.get(command_name)
+
+    def update_command(self, command_name: str, command_response: str) -> None:
+        if command_name in self.commands:
+            self.commands[command_name] = command_response
+
+    def remove_command(self, command_name: str) -> None:
+        self.commands.pop(command_name, None)
+
+    def retrive_command_response(self, command_name: str) -> Optional[str]:
+        return self.commands.get(command_name)
+
+    def increment_command_count(self, command_name: str) -> Optional[int]:
+        self.command_counts[command_name] += 1
+        return self.command_counts[command_name]
+
+    def get_all_commands(self) -> Tuple[Optional[List[str]], Optional[List[str]]]:
+        if not self.commands:
+            return None, None
+        return sorted(self.commands), sorted(self.aliases)
+
+    def export_commands(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        return dict(sorted(self.commands.items())), dict(sorted(self.aliases.items()))
+
+    def import_commands(
+        self, commands: Dict[str, str], aliases: Dict[str, str], overwrite: bool = True
+    ) -> None:
+        if overwrite:
+            self.commands.update(commands)
+            self.aliases.update(aliases)
+        else:
+            self.commands = {**commands, **self.commands}
+            self.aliases = {**aliases, **self.aliases}
+
+    def upsert_unknown_commands(
+        self, attempts: Dict[str, int], users: Dict[str, Set[str]], attempted_at: datetime
+    ) -> None:
+        for command_name, count in attempts.items():
+            stored = self.unknown_commands.setdefault(command_name, {"attempts": 0})
+            stored["attempts"] += count
+            stored["last_attempted_at"] = attempted_at
+        for command_name, user_ids in users.items():
+            self.unknown_command_users[command_name].update(user_ids)
+
+    def get_top_unknown_commands(self, limit: int) -> List[Tuple[str, int, int]]:
+        rows = [
+            (command_name, stored["attempts"], len(self.unknown_command_users[command_name]))
+            for command_name, stored in self.unknown_commands.items()
+        ]
+        rows.sort(key=lambda row: (-row[1], -row[2], row[0]))
+        return rows[:limit]
+
+    def get_all_drop_results(self) -> List[Tuple[str, int, float, float]]:
+        return [
+            (user_name, row["drops"], row["total_score"], row["best_score"])
+            for user_name, row in self.drop_results.items()
+        ]
+
+    def upsert_drop_results(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            self.drop_results[row["user_name"]] = dict(row)
+
+    def register_stream(self, stream_date: date) -> Optional[date]:
+        self.streams.add(stream_date)
+        return max((d for d in self.streams if d < stream_date), default=None)
+
+    def get_user_activity(
+        self, user_id: str
+    ) -> Tuple[int, Optional[date], int, Optional[datetime]]:
+        user = self.users.get(user_id)
+        if user is None:
+            return 0, None, 0, None
+        activity = self.user_activity.get(user_id, {})
+        return (
+            activity.get("message_count", 0),
+            activity.get("last_stream_date"),
+            activity.get("stream_streak", 0),
+            user["first_chatted_at"],
+        )
+
+    def upsert_user_activity(self, rows: List[Dict[str, Any]]) -> bool:
+        for row in rows:
+            stored = self.user_activity.setdefault(row["user_id"], {"message_count": 0})
+            stored["message_count"] += row["message_count"]
+            stored["last_stream_date"] = row["last_stream_date"]
+            stored["stream_streak"] = row["stream_streak"]
+        return True
+
+    def get_watch_time(self, user_name: str) -> float:
+        return self.watch_time.get(user_name, {}).get("seconds", 0.0)
+
+    def upsert_watch_time(self, rows: List[Dict[str, Any]]) -> bool:
+        for row in rows:
+            stored = self.watch_time.setdefault(row["user_name"], {"seconds": 0.0})
+            stored["seconds"] += row["seconds"]
+            stored["last_seen_at"] = row["last_seen_at"]
+        return True
+
+    def get_points(self, user_id: str) -> int:
+        return self.points.get(user_id, {}).get("balance", 0)
+
+    def award_points(self, rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            stored = self.points.setdefault(row["user_id"], {"balance": 0})
+            stored["balance"] += row["points"]
+            stored["user_name"] = row["user_name"]
+
+    def spend_points(self, user_id: str, points: int) -> Optional[int]:
+        stored = self.points.get(user_id)
+        if stored is None or stored["balance"] < points:
+            return None
+        stored["balance"] -= points
+        return stored["balance"]
+
+    def get_top_points(self, limit: int) -> List[Tuple[str, int]]:
+        rows = [(stored["user_name"], stored["balance"]) for stored in self.points.values()]
+        rows.sort(key=lambda row: -row[1])
+        return rows[:limit]
+
+    def add_quote(self, quote_text: str, added_by: Optional[str] = None) -> Optional[int]:
+        quote_id = (self._quote_ids[-1] if self._quote_ids else 0) + 1
+        self.quotes[quote_id] = {
+            "quote_text": quote_text,
+            "added_by": added_by,
+            "added_at": datetime.now(),
+            "tokens": Counter(QUOTE_TOKEN_PATTERN.findall(quote_text.casefold())),
+        }
+        self._quote_ids.append(quote_id)
+        return quote_id
+
+    def get_quote(self, quote_id: int) -> Optional[Tuple[int, str]]:
+        quote = self.quotes.get(quote_id)
+        return (quote_id, quote["quote_text"]) if quote else None
+
+    def get_random_quote(self) -> Optional[Tuple[int, str]]:
+        if not self._quote_ids:
+            return None
+        return self.get_quote(random.choice(self._quote_ids))
+
+    def search_quotes(self, words: List[str], limit: int = 1) -> List[Tuple[int, str]]:
+        terms = [term for word in words for term in QUOTE_TOKEN_PATTERN.findall(word.casefold())]
+        if not terms:
+            return []
+        matches = []
+        for quote_id, quote in self.quotes.items():
+            if all(term in quote["tokens"] for term in terms):
+                # same spirit as bm25: more hits and shorter quotes rank higher
+                hits = sum(quote["tokens"][term] for term in terms)
+                matches.append((-hits / sum(quote["tokens"].values()), quote_id))
+        return [(quote_id, self.quotes[quote_id]["quote_text"]) for _, quote_id in sorted(matches)][
+            :limit
+        ]
+
+    def upsert_timer(
+        self, timer_name: str, message: str, interval_minutes: int, min_lines: int
+    ) -> None:
+        self.timers[timer_name] = (message, interval_minutes, min_lines)
+
+    def remove_timer(self, timer_name: str) -> None:
+        self.timers.pop(timer_name, None)
+
+    def get_timers(self) -> List[Tuple[str, str, int, int]]:
+        return [(timer_name, *self.timers[timer_name]) for timer_name in sorted(self.timers)]
+
+    def add_banned_term(self, term: str, action: str, added_by: Optional[str] = None) -> None:
+        self.banned_terms[term] = {
+            "action": action,
+            "added_by": added_by,
+            "added_at": datetime.now(),
+        }
+
+    def remove_banned_term(self, term: str) -> None:
+        self.banned_terms.pop(term, None)
+
+    def get_banned_terms(self) -> List[Tuple[str, str]]:
+        return [(term, self.banned_terms[term]["action"]) for term in sorted(self.banned_terms)]
+
+    def save_poll(
+        self,
+        question: str,
+        results: List[Tuple[str, int]],
+        started_by: Optional[str] = None,
+        started_at: Optional[datetime] = None,
+        ended_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        self.polls.append(
+            {
+                "question": question,
+                "results": list(results),
+                "started_by": started_by,
+                "started_at": started_at,
+                "ended_at": ended_at,
+            }
+        )
+        return len(self.polls)
+
+    def save_raffle(
+        self,
+        seed: int,
+        entries: List[Dict[str, Any]],
+        opened_at: Optional[datetime] = None,
+        closed_at: Optional[datetime] = None,
+    ) -> Optional[int]:
+        self.raffles.append(
+            {"seed": seed, "entries": list(entries), "opened_at": opened_at, "closed_at": closed_at}
+        )
+        return len(self.raffles)
+
+    def add_emote_snapshot(self, rows: List[Dict[str, Any]]) -> bool:
+        self.emote_snapshots.extend(dict(row) for row in rows)
+        return True
+
+    def get_emote_snapshots(
+        self, stream_date: date, channel: str
+    ) -> List[Tuple[datetime, str, int, int]]:
+        rows = [
+            row
+            for row in self.emote_snapshots
+            if row["stream_date"] == stream_date and row["channel"] == channel
+        ]
+        rows.sort(key=lambda row: (row["taken_at"], -row["count"], row["emote"]))
+        return [(row["taken_at"], row["emote"], row["count"], row["error"]) for row in rows]
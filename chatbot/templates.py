@@ -0,0 +1,68 @@
+import re
+from typing import Callable, Collection, Dict, FrozenSet, List, Tuple
+
+VARIABLE_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+class Template:
+    """A text command's response, split once into literal text and `{variable}` slots.
+
+    Only the names in `known` count as variables, any other `{...}` stays as typed so
+    responses written before templates existed come out the same. `render` asks `resolve` for
+    the variables the template actually uses, once each, and a template without any is just
+    its text.
+    """
+
+    __slots__ = ("text", "parts", "variables")
+
+    def __init__(self, text: str, known: Collection[str]):
+        self.text = text
+        # (is a variable, literal text or variable name)
+        parts: List[Tuple[bool, str]] = []
+        position = 0
+        for match in VARIABLE_PATTERN.finditer(text):
+            if match.group(1) not in known:
+                continue
+            if match.start() > position:
+                parts.append((False, text[position : match.start()]))
+            parts.append((True, match.group(1)))
+            position = match.end()
+        if position < len(text):
+            parts.append((False, text[position:]))
+        self.parts = tuple(parts)
+        self.variables: FrozenSet[str] = frozenset(
+            value for is_variable, value in parts if is_variable
+        )
+
+    def render(self, resolve: Callable[[str], str]) -> str:
+        if not self.variables:
+            return self.text
+        values = {name: resolve(name) for name in self.variables}
+        return "".join(values[value] if is_variable else value for is_variable, value in self.parts)
+
+
+class TemplateCache:
+    """Compiled templates by command name, recompiled when the command's response changes.
+
+    Each entry remembers the text it was compiled from, a lookup with different text (the
+    command was `!set` somewhere else, an import...) compiles it again, so a stale plan is never
+    rendered. `invalidate` drops an entry straight away when a command is updated or removed.
+    """
+
+    def __init__(self, known: Collection[str]):
+        self.known = frozenset(known)
+        self._templates: Dict[str, Template] = {}
+        self.compiled = 0
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+    def get(self, command_name: str, text: str) -> Template:
+        template = self._templates.get(command_name)
+        if template is None or template.text != text:
+            template = self._templates[command_name] = Template(text, self.known)
+            self.compiled += 1
+        return template
+
+    def invalidate(self, command_name: str) -> None:
+        self._templates.pop(command_name, None)
@@ -0,0 +1,53 @@
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import DefaultDict, List, Optional, Set, Tuple
+
+from chatbot.storage import StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# keeps memory bounded if someone spams random !words between two flushes.
+MAX_TRACKED_COMMANDS = 1000
+
+
+class UnknownCommandsTracker:
+    """Counts attempts at commands the bot doesn't know and flushes them in aggregate.
+
+    Recording an attempt only touches in-memory counters so that a spammy chat doesn't
+    translate into one INSERT per message. `flush` is meant to be called on a timer and
+    upserts the counters accumulated since the previous flush.
+    """
+
+    def __init__(self, db_connector: StorageBackend, max_tracked: int = MAX_TRACKED_COMMANDS):
+        self.db_connector = db_connector
+        self.max_tracked = max_tracked
+        self.attempts: Counter = Counter()
+        self.users: DefaultDict[str, Set[str]] = defaultdict(set)
+        self.dropped = 0
+
+    def record(self, command_name: str, user_id: Optional[str] = None) -> None:
+        if command_name not in self.attempts and len(self.attempts) >= self.max_tracked:
+            self.dropped += 1
+            return
+        self.attempts[command_name] += 1
+        if user_id:
+            self.users[command_name].add(user_id)
+
+    def flush(self) -> None:
+        if not self.attempts:
+            return
+        attempts, users = self.attempts, self.users
+        self.attempts = Counter()
+        self.users = defaultdict(set)
+        self.db_connector.upsert_unknown_commands(
+            attempts=dict(attempts), users=dict(users), attempted_at=datetime.now()
+        )
+        if self.dropped:
+            logger.warning(f"{self.dropped} unknown command attempts were not tracked")
+            self.dropped = 0
+
+    def top(self, limit: int = 5) -> List[Tuple[str, int, int]]:
+        # flushing first means the stored table is the single source of truth for the ranking.
+        self.flush()
+        return self.db_connector.get_top_unknown_commands(limit=limit)
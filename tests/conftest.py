@@ -0,0 +1,48 @@
+from collections import Counter
+
+from chatbot.storage import InMemoryDbConnector
+
+
+class Config:
+    def __init__(self) -> None:
+        self.client_id = ""
+        self.client_secret = ""
+        self.oauth_token = ""
+        self.bot_name = ""
+        self.channel = "datafrittata"
+        self.oauth_token_api = ""
+        self.client_id_api = ""
+        self.bot_api_token = ""
+
+
+class FakeClock:
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class CountingConnector(InMemoryDbConnector):
+    """In-memory connector that counts the reads and writes the trackers make."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = Counter()
+
+    def get_points(self, user_id):
+        self.calls["get_points"] += 1
+        return super().get_points(user_id)
+
+    def award_points(self, rows):
+        self.calls["award_points"] += 1
+        return super().award_points(rows)
+
+    def upsert_watch_time(self, rows) -> bool:
+        self.calls["upsert_watch_time"] += 1
+        return super().upsert_watch_time(rows)
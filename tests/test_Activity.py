@@ -0,0 +1,95 @@
+import os
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from chatbot.activity import ActivityTracker
+from chatbot.commands import CommandContext, StatsCommand
+from chatbot.db import DbConnector
+from tests.conftest import Config
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+CONFIG = Config()
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_ActivityTracker_counts_in_memory_until_flush(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_user(user_id="999", user_name="test_user")
+    tracker = ActivityTracker(connector, stream_date=date(2021, 8, 1))
+
+    for _ in range(3):
+        tracker.record_message("999")
+
+    assert connector.get_user_activity("999")[0] == 0
+    assert tracker.get_stats("999").message_count == 3
+
+    tracker.flush()
+    tracker.record_message("999")
+    tracker.flush()
+
+    assert connector.get_user_activity("999")[:3] == (4, date(2021, 8, 1), 1)
+    assert tracker.get_stats("999").message_count == 4
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_ActivityTracker_keeps_deltas_when_a_flush_fails(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_user(user_id="999", user_name="test_user")
+    tracker = ActivityTracker(connector, stream_date=date(2021, 8, 1))
+    for _ in range(3):
+        tracker.record_message("999")
+
+    connector.user_activity.drop(connector.engine)
+    tracker.flush()
+    tracker.record_message("999")
+    connector.user_activity.create(connector.engine)
+    tracker.flush()
+
+    assert connector.get_user_activity("999")[:3] == (4, date(2021, 8, 1), 1)
+    assert tracker.get_stats("999").message_count == 4
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_ActivityTracker_stream_streak(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_user(user_id="1", user_name="regular")
+    connector.add_new_user(user_id="2", user_name="lurker")
+
+    for stream_date, user_ids in [
+        (date(2021, 8, 1), ["1", "2"]),
+        (date(2021, 8, 3), ["1"]),
+        (date(2021, 8, 8), ["1", "2"]),
+    ]:
+        tracker = ActivityTracker(connector, stream_date=stream_date)
+        for user_id in user_ids:
+            tracker.record_message(user_id)
+            tracker.record_message(user_id)
+        tracker.flush()
+
+    assert ActivityTracker(connector).get_stats("1").stream_streak == 3
+    assert ActivityTracker(connector).get_stats("2").stream_streak == 1
+    assert ActivityTracker(connector).get_stats("2").message_count == 4
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+@pytest.mark.freeze_time("2021-08-01")
+def test_StatsCommand(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_user(user_id="999", user_name="test_user")
+    tracker = ActivityTracker(connector)
+    tracker.record_message("999")
+    tracker.record_message("999")
+
+    context = CommandContext(
+        connector, CONFIG, user_id="999", user_name="test_user", services={"activity": tracker}
+    )
+    cmd = StatsCommand()
+    assert cmd.is_restricted is False
+    assert (
+        cmd.run(context) == "test_user: 2 messages, chatting since 08/01/2021, 1 stream(s) in a row"
+    )
@@ -0,0 +1,109 @@
+from chatbot.announcements import AnnouncementScheduler
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, TimerCommand
+from chatbot.irc_mock import FakeTwitchIRC
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config, FakeClock
+from tests.test_IrcMock import LocalConfig
+
+
+def make_scheduler(connector=None):
+    sent = []
+    clock = FakeClock()
+    scheduler = AnnouncementScheduler(
+        connector or InMemoryDbConnector(), send=sent.append, clock=clock
+    )
+    return scheduler, clock, sent
+
+
+def test_AnnouncementScheduler_posts_every_interval():
+    scheduler, clock, sent = make_scheduler()
+    scheduler.set_timer("socials", "follow me", interval_minutes=5, min_lines=0)
+    scheduler.set_timer("bot", "!bot", interval_minutes=10, min_lines=0)
+
+    for minute in range(1, 21):
+        clock.now = minute * 60
+        scheduler.tick()
+
+    assert sent.count("follow me") == 4
+    assert sent.count(InMemoryDbConnector().retrive_command_response("bot")) == 2
+
+
+def test_AnnouncementScheduler_is_gated_by_chat_activity():
+    scheduler, clock, sent = make_scheduler()
+    scheduler.set_timer("socials", "follow me", interval_minutes=1, min_lines=3)
+
+    clock.now = 60
+    scheduler.tick()
+    assert sent == []
+
+    for _ in range(3):
+        scheduler.bump()
+    clock.now = 120
+    scheduler.tick()
+    assert sent == ["follow me"]
+
+    # the lines that were already counted don't count twice
+    clock.now = 180
+    scheduler.tick()
+    assert sent == ["follow me"]
+
+
+def test_AnnouncementScheduler_redefine_and_remove():
+    connector = InMemoryDbConnector()
+    scheduler, clock, sent = make_scheduler(connector)
+    scheduler.set_timer("socials", "follow me", interval_minutes=1, min_lines=0)
+    scheduler.set_timer("socials", "follow me please", interval_minutes=1, min_lines=0)
+    scheduler.set_timer("gone", "bye", interval_minutes=1, min_lines=0)
+    assert scheduler.remove_timer("gone") is True
+    assert scheduler.remove_timer("gone") is False
+
+    clock.now = 60
+    scheduler.tick()
+    assert sent == ["follow me please"]
+    assert connector.get_timers() == [("socials", "follow me please", 1, 0)]
+
+    # timers come back from storage
+    reloaded, reloaded_clock, reloaded_sent = make_scheduler(connector)
+    reloaded_clock.now = 60
+    reloaded.tick()
+    assert reloaded_sent == ["follow me please"]
+
+
+def test_Bot_renders_the_text_commands_its_timers_post(tmp_path):
+    with FakeTwitchIRC() as server:
+        connector = InMemoryDbConnector()
+        connector.add_new_command("hug", "{user} hugs {channel}, hug #{count}")
+        bot = Bot(LocalConfig(server, tmp_path), connector)
+    bot.announcements.set_timer("hugs", "!hug", interval_minutes=5, min_lines=0)
+    timer = bot.announcements.timers["hugs"]
+
+    assert bot.announcements.render(timer) == "test_bot hugs datafrittata, hug #1"
+    assert bot.announcements.render(timer) == "test_bot hugs datafrittata, hug #2"
+
+
+def test_TimerCommand():
+    connector = InMemoryDbConnector()
+    scheduler, _, _ = make_scheduler(connector)
+
+    def run(command_input):
+        cmd = TimerCommand()
+        assert cmd.is_restricted is True
+        return cmd.run(
+            CommandContext(
+                connector,
+                Config(),
+                command_input=command_input,
+                services={"announcements": scheduler},
+            )
+        )
+
+    assert run("list") == "No timers set"
+    assert run("add socials 15 10 follow me everywhere") == (
+        "Timer socials will post every 15 minutes (if 10+ lines)"
+    )
+    assert run("add fast 0 0 too fast") == "Timers can't run more often than every minute"
+    assert run("list") == "socials: every 15m, 10+ lines"
+    assert run("remove socials") == "Timer socials removed"
+    assert run("remove socials") == "Timer socials does not exist"
+    assert run("nonsense").startswith("Usage: !timer add")
@@ -0,0 +1,146 @@
+import gzip
+import json
+
+import respx
+from httpx import Response
+
+from chatbot.bot import Bot
+from chatbot.cache import TTLCache, load_snapshot, save_snapshot
+from chatbot.commands import (
+    AddZodiacSignCommand,
+    CommandContext,
+    HoroscopeCommand,
+    SetUserCountryCommand,
+    ShoutoutCommand,
+)
+from chatbot.irc_mock import FakeTwitchIRC
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+from tests.test_IrcMock import LocalConfig
+
+CONFIG = Config()
+
+
+def test_TTLCache_expiry_and_lru(freezer):
+    freezer.move_to("2021-08-01T12:00:00")
+    cache = TTLCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    freezer.move_to("2021-08-01T12:01:01")
+    assert cache.get("a") is None
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.json.gz")
+    profiles = TTLCache(ttl=60)
+    profiles.set("1", {"country": "france", "emoji": None})
+    profiles.set("2", {"country": None, "emoji": "pizza"}, expires_at=0)
+    save_snapshot(path, {"user_profiles": profiles})
+
+    restored = TTLCache(ttl=60)
+    assert load_snapshot(path, {"user_profiles": restored}, max_age=3600) == 1
+    assert restored.get("1") == {"country": "france", "emoji": None}
+    assert restored.get("2") is None
+
+
+def test_Bot_saves_and_restores_its_caches(tmp_path):
+    with FakeTwitchIRC() as server:
+        config = LocalConfig(server, tmp_path)
+        bot = Bot(config, InMemoryDbConnector())
+        bot.user_profiles.set("1", {"country": "france", "emoji": None})
+        bot.save_caches()
+
+        restarted = Bot(config, InMemoryDbConnector())
+        assert restarted.user_profiles.get("1") == {"country": "france", "emoji": None}
+
+
+def test_snapshot_discards_stale_and_incompatible(tmp_path, freezer):
+    path = str(tmp_path / "snapshot.json.gz")
+    freezer.move_to("2021-08-01T12:00:00")
+    cache = TTLCache(ttl=24 * 3600)
+    cache.set("taurus", "It's hard to be a Taurus")
+    save_snapshot(path, {"horoscopes": cache, "other": cache})
+
+    assert load_snapshot(path, {"horoscopes": TTLCache(ttl=60, version=2)}, max_age=3600) == 0
+    freezer.move_to("2021-08-01T14:00:00")
+    assert load_snapshot(path, {"horoscopes": TTLCache(ttl=60)}, max_age=3600) == 0
+
+    with gzip.open(path, "rt") as f:
+        snapshot = json.load(f)
+    snapshot["version"] = -1
+    with gzip.open(path, "wt") as f:
+        json.dump(snapshot, f)
+    assert load_snapshot(path, {"horoscopes": TTLCache(ttl=60)}, max_age=10**9) == 0
+
+    (tmp_path / "garbage.json.gz").write_bytes(b"not a snapshot")
+    assert load_snapshot(str(tmp_path / "garbage.json.gz"), {}, max_age=3600) == 0
+    assert load_snapshot(str(tmp_path / "missing.json.gz"), {}, max_age=3600) == 0
+
+
+def test_SetUserCountryCommand_invalidates_profile():
+    connector = InMemoryDbConnector()
+    connector.add_new_user(user_id="999", user_name="test_user")
+    user_profiles = TTLCache(ttl=60)
+    user_profiles.set("999", {"country": None, "emoji": None})
+
+    SetUserCountryCommand().run(
+        CommandContext(
+            connector,
+            CONFIG,
+            command_input="France",
+            user_id="999",
+            services={"user_profiles": user_profiles},
+        )
+    )
+
+    assert user_profiles.get("999") is None
+
+
+@respx.mock
+def test_ShoutoutCommand_uses_channel_lookups():
+    route = respx.get(url__startswith="https://api.twitch.tv/helix/search/channels").mock(
+        return_value=Response(
+            status_code=200,
+            json={"data": [{"display_name": "DataFrittata", "broadcaster_login": "datafrittata"}]},
+        )
+    )
+    channel_lookups = TTLCache(ttl=60)
+    for user_name in ["DataFrittata", "@datafrittata"]:
+        context = CommandContext(
+            InMemoryDbConnector(),
+            CONFIG,
+            command_input=user_name,
+            services={"channel_lookups": channel_lookups},
+        )
+        assert ShoutoutCommand().run(context) == (
+            "You should check out DataFrittata or give them a follow here: "
+            "https://twitch.tv/datafrittata <3"
+        )
+    assert route.call_count == 1
+
+
+@respx.mock
+def test_HoroscopeCommand_uses_horoscopes_cache():
+    route = respx.get("https://ohmanda.com/api/horoscope/taurus").mock(
+        return_value=Response(status_code=200, json={"horoscope": "It's hard to be a Taurus"})
+    )
+    connector = InMemoryDbConnector()
+    horoscopes = TTLCache(ttl=60)
+    for user_id in ["1", "2"]:
+        connector.add_new_user(user_id=user_id, user_name=f"user_{user_id}")
+        AddZodiacSignCommand().run(
+            CommandContext(connector, CONFIG, command_input="taurus", user_id=user_id)
+        )
+        horoscope_text = HoroscopeCommand().run(
+            CommandContext(connector, CONFIG, user_id=user_id, services={"horoscopes": horoscopes})
+        )
+        assert horoscope_text == "Taurus: It's hard to be a Taurus"
+    assert route.call_count == 1
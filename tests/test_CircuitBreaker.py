@@ -0,0 +1,177 @@
+import httpx
+import pytest
+import respx
+
+from chatbot.bot import Bot
+from chatbot.cache import TTLCache
+from chatbot.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from chatbot.commands import BreakersCommand, CommandContext, HoroscopeCommand, ShoutoutCommand
+from chatbot.helix import HelixClient
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config, FakeClock
+from tests.test_IrcMock import LocalConfig
+
+
+def fail():
+    raise httpx.ConnectTimeout("too slow")
+
+
+def make_breaker(clock: FakeClock) -> CircuitBreaker:
+    return CircuitBreaker(
+        "test",
+        failure_rate=0.5,
+        min_calls=4,
+        open_for=30,
+        failure_exceptions=(httpx.HTTPError,),
+        clock=clock,
+    )
+
+
+def test_CircuitBreaker_opens_on_failure_rate_and_recovers():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    assert breaker.call(lambda: "ok") == "ok"
+    for _ in range(2):
+        with pytest.raises(httpx.ConnectTimeout):
+            breaker.call(fail)
+    assert breaker.state == CLOSED
+
+    # 3 failures out of 4 calls
+    with pytest.raises(httpx.ConnectTimeout):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "never called")
+
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(httpx.ConnectTimeout):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    clock.now = 60
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.metrics() == {
+        "state": CLOSED,
+        "failure_rate": 0.0,
+        "calls": 6,
+        "failures": 4,
+        "rejected": 1,
+        "times_opened": 2,
+    }
+
+
+def test_CircuitBreaker_only_counts_upstream_failures():
+    breaker = make_breaker(FakeClock())
+    for _ in range(10):
+        with pytest.raises(KeyError):
+            breaker.call(lambda: {}["missing"])
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+
+def test_HelixClient_fails_fast_once_open():
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503, json={"error": "Service Unavailable"})
+
+    breaker = make_breaker(FakeClock())
+    client = HelixClient("id", "token", transport=httpx.MockTransport(handler), breaker=breaker)
+    for _ in range(4):
+        with pytest.raises(httpx.HTTPStatusError):
+            client.get_users(logins=["datafrittata"])
+    with pytest.raises(CircuitOpenError):
+        client.get_users(logins=["datafrittata"])
+    assert len(requests) == 4
+
+
+def test_ShoutoutCommand_serves_stale_channel_while_twitch_is_down(freezer):
+    freezer.move_to("2021-08-01T12:00:00")
+    channel_lookups = TTLCache(ttl=60, stale_for=3600)
+    channel_lookups.set(
+        "datafrittata", {"display_name": "DataFrittata", "broadcaster_login": "datafrittata"}
+    )
+    freezer.move_to("2021-08-01T12:30:00")
+    breaker = make_breaker(FakeClock())
+    breaker._open()
+    context = CommandContext(
+        InMemoryDbConnector(),
+        Config(),
+        command_input="DataFrittata",
+        services={
+            "channel_lookups": channel_lookups,
+            "helix": HelixClient("id", "token", breaker=breaker),
+        },
+    )
+
+    assert ShoutoutCommand().run(context) == (
+        "You should check out DataFrittata or give them a follow here: "
+        "https://twitch.tv/datafrittata <3"
+    )
+    freezer.move_to("2021-08-01T14:00:00")
+    assert ShoutoutCommand().run(context) is None
+
+
+@respx.mock
+def test_HoroscopeCommand_serves_stale_horoscope_while_ohmanda_is_down(freezer):
+    freezer.move_to("2021-08-01T12:00:00")
+    route = respx.get("https://ohmanda.com/api/horoscope/taurus").mock(
+        return_value=httpx.Response(status_code=500)
+    )
+    connector = InMemoryDbConnector()
+    connector.add_new_user(user_id="1", user_name="test_user")
+    connector.update_user_sign(user_id="1", zodiac_sign="taurus")
+    horoscopes = TTLCache(ttl=60, stale_for=3600)
+    horoscopes.set("taurus", "Taurus: It's hard to be a Taurus")
+    breaker = make_breaker(FakeClock())
+    context = CommandContext(
+        connector,
+        Config(),
+        user_id="1",
+        services={"horoscopes": horoscopes, "breakers": {"ohmanda": breaker}},
+    )
+
+    freezer.move_to("2021-08-01T12:05:00")
+    for _ in range(6):
+        assert HoroscopeCommand().run(context) == "Taurus: It's hard to be a Taurus"
+    # the breaker opened after 4 failed calls, the rest never hit the api
+    assert route.call_count == 4
+    assert breaker.state == OPEN
+
+    horoscopes.invalidate("taurus")
+    assert HoroscopeCommand().run(context) == (
+        "Something went wrong with the API when getting horoscope for taurus"
+    )
+
+
+def test_BreakersCommand():
+    breaker = make_breaker(FakeClock())
+    context = CommandContext(
+        InMemoryDbConnector(), Config(), services={"breakers": {"twitch": breaker}}
+    )
+    cmd = BreakersCommand()
+    assert cmd.is_restricted is True
+    assert cmd.run(context) == "twitch: closed, 0% of recent calls failed, 0 rejected, opened 0x"
+
+
+def test_Bot_hands_its_breakers_to_commands(tmp_path):
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), InMemoryDbConnector())
+        try:
+            # !horoscope goes through call_upstream, which looks the breaker up there
+            assert bot.command_services["breakers"]["ohmanda"] is bot.breakers["ohmanda"]
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_privmsg(
+                "#datafrittata", ChatLine("Streamer", "!breakers", badges="broadcaster/1")
+            )
+            assert run_bot(bot, lambda: len(server.responses) == 2, timeout=5)
+        finally:
+            bot.disconnect()
+    assert server.responses[1].text == (
+        "ohmanda: closed, 0% of recent calls failed, 0 rejected, opened 0x | "
+        "twitch: closed, 0% of recent calls failed, 0 rejected, opened 0x"
+    )
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+
+from chatbot.command_files import CommandFileError, export_file, import_file, plan_import
+from chatbot.storage import InMemoryDbConnector
+
+
+def write_json(path, content) -> str:
+    path.write_text(json.dumps(content))
+    return str(path)
+
+
+def test_import_file(tmp_path):
+    connector = InMemoryDbConnector()
+    connector.add_command_alias("src", "source")
+    path = write_json(
+        tmp_path / "commands.json",
+        {
+            "commands": {
+                "socials": "follow me",
+                "today": "coding",
+                "bot": connector.commands["bot"],
+            },
+            "aliases": {"twitter": "socials", "src": "bot", "t": "today"},
+        },
+    )
+
+    plan = import_file(connector, path, dry_run=True)
+    assert plan.diff().splitlines() == [
+        "+ !socials: follow me",
+        "+ alias !twitter -> !socials",
+        "+ alias !t -> !today",
+        "~ !today: today is not set yet => coding",
+        "~ alias !src -> !source => !bot",
+        "3 added, 2 changed, 1 unchanged",
+    ]
+    assert "socials" not in connector.commands
+
+    import_file(connector, path)
+    assert connector.retrive_command_response("socials") == "follow me"
+    assert connector.get_original_command("src") == "bot"
+    assert plan_import(connector, path).diff() == "0 added, 0 changed, 6 unchanged"
+
+
+def test_import_file_is_validated_up_front(tmp_path):
+    connector = InMemoryDbConnector()
+    connector.add_command_alias("src", "source")
+    path = write_json(
+        tmp_path / "commands.json",
+        {
+            "commands": {
+                "hello": "hi",
+                "fine": "ok",
+                "bad name": "x",
+                "empty": "",
+                "lurk": "brb",
+                "drop": "!drop",
+                "src": "github",
+            },
+            "aliases": {
+                "hi": "hello",
+                "sure": "fine",
+                "nope": "missing",
+                "fine": "today",
+                "bot2": "bot",
+                "today": "bot",
+            },
+        },
+    )
+    with pytest.raises(CommandFileError) as e:
+        import_file(connector, path)
+    assert e.value.errors == [
+        "!hello is a special command",
+        "!fine is both a command and an alias",
+        "!bad name can't be typed as a command",
+        "!empty needs a text response",
+        "!lurk is a plugin command",
+        "!drop is ignored by the bot",
+        "!src is already an alias of !source",
+        "!hi: !hello is a special command and cannot be aliased",
+        "!nope: !missing does not exist, so it can't be aliased",
+        "!today is already a command",
+    ]
+    assert "fine" not in connector.commands
+    assert connector.aliases == {"src": "source"}
+
+
+def test_export_file_round_trips(tmp_path):
+    pytest.importorskip("yaml")
+    connector = InMemoryDbConnector()
+    connector.add_new_command("socials", "follow me ✨")
+    connector.add_command_alias("twitter", "socials")
+    assert export_file(connector, str(tmp_path / "commands.yaml")) == (4, 1)
+
+    other = InMemoryDbConnector()
+    import_file(other, str(tmp_path / "commands.yaml"))
+    assert other.export_commands() == connector.export_commands()
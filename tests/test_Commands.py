@@ -8,12 +8,17 @@ from dateutil import parser
 from httpx import Response
 
 from chatbot.commands import (
+    SPECIAL_COMMANDS,
+    TEXT_COMMAND,
     AddAliasCommand,
+    AddQuoteCommand,
     AddTextCommand,
     AddZodiacSignCommand,
     BotCommand,
+    CommandContext,
     HoroscopeCommand,
     ListCommandsCommand,
+    QuoteCommand,
     RemoveTextCommand,
     SayHelloCommand,
     SetSourceCommand,
@@ -25,8 +30,10 @@ from chatbot.commands import (
     TextCommand,
     TodayCommand,
     UptimeCommand,
+    commands_factory,
 )
 from chatbot.db import DbConnector
+from tests.conftest import Config
 
 # make sure to grab the paths where the db will live in the
 # context of pytest, potentially create the folder if needed
@@ -34,18 +41,6 @@ FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
 os.makedirs(FIXTURE_DIR, exist_ok=True)
 
 
-class Config:
-    def __init__(self) -> None:
-        self.client_id = ""
-        self.client_secret = ""
-        self.oauth_token = ""
-        self.bot_name = ""
-        self.channel = "datafrittata"
-        self.oauth_token_api = ""
-        self.client_id_api = ""
-        self.bot_api_token = ""
-
-
 def init_connectors_and_config(datafiles) -> Config:
     config = Config()
     return config
@@ -57,18 +52,21 @@ CONFIG = init_connectors_and_config(FIXTURE_DIR)
 @pytest.mark.datafiles(FIXTURE_DIR)
 def test_SayHelloCommand(datafiles):
     connector = DbConnector(db_path=datafiles)
-    cmd = SayHelloCommand(connector, CONFIG, "DataFrittata")
-    assert cmd.run() == "Welcome to the stream, DataFrittata"
+    cmd = SayHelloCommand()
+    assert (
+        cmd.run(CommandContext(connector, CONFIG, user_name="DataFrittata"))
+        == "Welcome to the stream, DataFrittata"
+    )
     assert cmd.is_restricted is False
 
 
 @pytest.mark.datafiles(FIXTURE_DIR)
 def test_ListCommandsCommand(datafiles):
     connector = DbConnector(db_path=datafiles)
-    cmd = ListCommandsCommand(connector, CONFIG)
+    cmd = ListCommandsCommand()
     assert (
-        cmd.run()
-        == "!bot !source !today !hello !commands !uptime !setcountry !setemoji !listemojis !set !add !remove !so !addzodiacsign !horoscope !alias"
+        cmd.run(CommandContext(connector, CONFIG))
+        == "!bot !source !today !hello !commands !uptime !setcountry !setemoji !listemojis !set !add !remove !so !addzodiacsign !horoscope !alias !unknowncommands !droplb !stats !watchtime !points !top !reload !floodstats !load !addquote !quote !timer !breakers !profile !banterm !unbanterm !bannedterms !poll !raffle !giveaway !topemotes"
     )
     assert cmd.is_restricted is False
 
@@ -77,8 +75,8 @@ def test_ListCommandsCommand(datafiles):
 @pytest.mark.datafiles(FIXTURE_DIR)
 def test_TodayCommand(datafiles):
     connector = DbConnector(db_path=datafiles)
-    cmd = TodayCommand(connector, CONFIG)
-    cmd_resp = cmd.run()
+    cmd = TodayCommand()
+    cmd_resp = cmd.run(CommandContext(connector, CONFIG))
     assert cmd_resp is not None
     assert cmd_resp.split("|")[1].strip() == "today is not set yet"
     assert cmd.is_restricted is False
@@ -93,8 +91,8 @@ def test_BotCommand(datafiles):
 
     # connector = DbConnector(db_path=datafiles)
     connector = DbConnector(db_path=datafiles)
-    cmd = BotCommand(connector, CONFIG)
-    assert cmd.run() == expectation
+    cmd = BotCommand()
+    assert cmd.run(CommandContext(connector, CONFIG)) == expectation
     assert cmd.is_restricted is False
 
 
@@ -103,8 +101,8 @@ def test_BotCommand(datafiles):
 def test_SourceCommand(datafiles):
     expectation = "no source code or repo provided yet"
     connector = DbConnector(db_path=datafiles)
-    cmd = SourceCommand(connector, CONFIG)
-    assert cmd.run() == expectation
+    cmd = SourceCommand()
+    assert cmd.run(CommandContext(connector, CONFIG)) == expectation
     assert cmd.is_restricted is False
 
 
@@ -114,11 +112,11 @@ def test_SetTodayCommand(datafiles):
     expectation = "this is the test today"
 
     connector = DbConnector(db_path=datafiles)
-    set_cmd = SetTodayCommand(connector, CONFIG, command_input=expectation)
-    set_cmd.run()
+    set_cmd = SetTodayCommand()
+    set_cmd.run(CommandContext(connector, CONFIG, command_input=expectation))
 
-    today = TodayCommand(connector, CONFIG)
-    today_text = today.run()
+    today = TodayCommand()
+    today_text = today.run(CommandContext(connector, CONFIG))
 
     assert today_text is not None
     assert today_text.split("|")[1].strip() == expectation
@@ -132,8 +130,8 @@ def test_SetUserCountryCommand(datafiles):
     connector = DbConnector(db_path=datafiles)
     connector.add_new_user(user_id="999", user_name="test_user")
 
-    set_cmd = SetUserCountryCommand(connector, CONFIG, command_input=expectation, user_id="999")
-    set_cmd.run()
+    set_cmd = SetUserCountryCommand()
+    set_cmd.run(CommandContext(connector, CONFIG, command_input=expectation, user_id="999"))
 
     user_country = connector.get_user_country(user_id="999")
     assert user_country == expectation
@@ -145,11 +143,11 @@ def test_SetSourceCommand(datafiles):
     expectation = "this is the source test text"
     connector = DbConnector(db_path=datafiles)
 
-    set_cmd = SetSourceCommand(connector, CONFIG, command_input=expectation)
-    set_cmd.run()
+    set_cmd = SetSourceCommand()
+    set_cmd.run(CommandContext(connector, CONFIG, command_input=expectation))
 
-    today = SourceCommand(connector, CONFIG)
-    source_text = today.run()
+    today = SourceCommand()
+    source_text = today.run(CommandContext(connector, CONFIG))
 
     assert source_text == expectation
     assert set_cmd.is_restricted is True
@@ -189,8 +187,8 @@ def test_UptimeCommand(datafiles, mock_response, time_offset, expectation, freez
     )
 
     freezer.move_to(time_offset)
-    cmd = UptimeCommand(db_connector=connector, config=CONFIG)
-    uptime_response = cmd.run()
+    cmd = UptimeCommand()
+    uptime_response = cmd.run(CommandContext(db_connector=connector, config=CONFIG))
     assert uptime_response == expectation
 
 
@@ -231,8 +229,10 @@ def test_ShoutoutCommand(datafiles, mock_response, user_name, expectation):
     url_pattern = re.compile(r"^https://api.twitch.tv/helix/search/channels.*$")
     respx.get(url_pattern).mock(return_value=response)
 
-    cmd = ShoutoutCommand(db_connector=connector, config=CONFIG, command_input=user_name)
-    shoutout_response = cmd.run()
+    cmd = ShoutoutCommand()
+    shoutout_response = cmd.run(
+        CommandContext(db_connector=connector, config=CONFIG, command_input=user_name)
+    )
     assert shoutout_response == expectation
 
 
@@ -241,11 +241,11 @@ def test_SetTextCommand(datafiles):
     expectation = "today this is the new today text set in the test"
     connector = DbConnector(db_path=datafiles)
 
-    set_cmd = SetTextCommand(connector, CONFIG, command_input=expectation)
-    set_result = set_cmd.run()
+    set_cmd = SetTextCommand()
+    set_result = set_cmd.run(CommandContext(connector, CONFIG, command_input=expectation))
 
-    today_cmd = TodayCommand(connector, CONFIG)
-    today_text = today_cmd.run()
+    today_cmd = TodayCommand()
+    today_text = today_cmd.run(CommandContext(connector, CONFIG))
 
     assert set_result == "today command successfully updated"
     assert today_text.split("|")[1].strip() == "this is the new today text set in the test"
@@ -256,8 +256,8 @@ def test_SetTextCommandNotFound(datafiles):
     expectation = "not_implemented_command dummy text"
     connector = DbConnector(db_path=datafiles)
 
-    set_cmd = SetTextCommand(connector, CONFIG, command_input=expectation)
-    set_result = set_cmd.run()
+    set_cmd = SetTextCommand()
+    set_result = set_cmd.run(CommandContext(connector, CONFIG, command_input=expectation))
 
     assert set_cmd.is_restricted is True
     assert set_result == "not_implemented_command does not exist yet"
@@ -284,12 +284,14 @@ def test_SetTextCommandNotFound(datafiles):
 def test_TextCommand(datafiles, command_name, is_alias, expectation):
     connector = DbConnector(db_path=datafiles)
 
-    SetTextCommand(connector, CONFIG, command_input=f"today {expectation}").run()
+    SetTextCommand().run(CommandContext(connector, CONFIG, command_input=f"today {expectation}"))
     if is_alias:
-        alias_cmd = AddAliasCommand(connector, CONFIG, f"{command_name} today")
-        alias_cmd.run()
+        alias_cmd = AddAliasCommand()
+        alias_cmd.run(CommandContext(connector, CONFIG, command_input=f"{command_name} today"))
 
-    command_response = TextCommand(connector, CONFIG, command_name=f"{command_name}").run()
+    command_response = TextCommand().run(
+        CommandContext(connector, CONFIG, command_name=f"{command_name}")
+    )
 
     assert command_response == expectation
 
@@ -299,12 +301,16 @@ def test_AddTextCommand(datafiles):
     expected_response = "this is the new command response"
     connector = DbConnector(db_path=datafiles)
 
-    cmd = AddTextCommand(connector, CONFIG, "new_command this is the new command response")
-    cmd.run()
+    cmd = AddTextCommand()
+    cmd.run(
+        CommandContext(
+            connector, CONFIG, command_input="new_command this is the new command response"
+        )
+    )
 
-    command_response = TextCommand(
-        db_connector=connector, config=CONFIG, command_name="new_command"
-    ).run()
+    command_response = TextCommand().run(
+        CommandContext(db_connector=connector, config=CONFIG, command_name="new_command")
+    )
     assert cmd.is_restricted is True
     assert command_response == expected_response
 
@@ -333,13 +339,17 @@ def test_AddAliasCommand(datafiles, alias_name, command_name, add_first, expecta
     connector = DbConnector(db_path=datafiles)
 
     if add_first:
-        add_cmd = AddTextCommand(
-            connector, CONFIG, f"{command_name} this is the new command response"
+        add_cmd = AddTextCommand()
+        add_cmd.run(
+            CommandContext(
+                connector, CONFIG, command_input=f"{command_name} this is the new command response"
+            )
         )
-        add_cmd.run()
 
-    cmd = AddAliasCommand(connector, CONFIG, f"{alias_name} {command_name}")
-    alias_result = cmd.run()
+    cmd = AddAliasCommand()
+    alias_result = cmd.run(
+        CommandContext(connector, CONFIG, command_input=f"{alias_name} {command_name}")
+    )
     assert cmd.is_restricted is True
     assert alias_result == expectation
 
@@ -348,11 +358,15 @@ def test_AddAliasCommand(datafiles, alias_name, command_name, add_first, expecta
 def test_RemoveTextCommand(datafiles):
     connector = DbConnector(db_path=datafiles)
 
-    AddTextCommand(connector, CONFIG, command_input="to_remove_command dummy text").run()
-    cmd = RemoveTextCommand(connector, CONFIG, command_input="to_remove_command")
-    cmd.run()
+    AddTextCommand().run(
+        CommandContext(connector, CONFIG, command_input="to_remove_command dummy text")
+    )
+    cmd = RemoveTextCommand()
+    cmd.run(CommandContext(connector, CONFIG, command_input="to_remove_command"))
 
-    command_response = TextCommand(connector, CONFIG, command_name="to_remove_command").run()
+    command_response = TextCommand().run(
+        CommandContext(connector, CONFIG, command_name="to_remove_command")
+    )
     assert command_response == "to_remove_command does not exist"
 
 
@@ -363,7 +377,7 @@ def test_AddZodiacCommand(datafiles):
 
     connector.add_new_user(user_id="999", user_name="test_user")
 
-    AddZodiacSignCommand(connector, CONFIG, command_input=sign, user_id="999").run()
+    AddZodiacSignCommand().run(CommandContext(connector, CONFIG, command_input=sign, user_id="999"))
     user_sign = connector.get_user_sign(user_id="999")
 
     assert user_sign == sign
@@ -377,9 +391,9 @@ def test_AddZodiacCommand_invalid_sign(datafiles):
 
     connector.add_new_user(user_id="999", user_name="test_user")
 
-    add_command_return = AddZodiacSignCommand(
-        connector, CONFIG, command_input=sign, user_id="999"
-    ).run()
+    add_command_return = AddZodiacSignCommand().run(
+        CommandContext(connector, CONFIG, command_input=sign, user_id="999")
+    )
 
     assert add_command_return == expectation
 
@@ -390,10 +404,65 @@ def test_HoroscopeCommand(datafiles):
     exp = "It's hard to be a Taurus"
     connector = DbConnector(db_path=datafiles)
     connector.add_new_user(user_id="999", user_name="test_user")
-    AddZodiacSignCommand(connector, CONFIG, command_input="taurus", user_id="999").run()
+    AddZodiacSignCommand().run(
+        CommandContext(connector, CONFIG, command_input="taurus", user_id="999")
+    )
 
     response = Response(status_code=200, json={"horoscope": exp})
     respx.get("https://ohmanda.com/api/horoscope/taurus").mock(return_value=response)
 
-    horoscope_text = HoroscopeCommand(connector, CONFIG, user_id="999").run()
+    horoscope_text = HoroscopeCommand().run(CommandContext(connector, CONFIG, user_id="999"))
     assert horoscope_text == f"Taurus: {exp}"
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_AddQuoteCommand(datafiles):
+    connector = DbConnector(db_path=datafiles)
+
+    cmd = AddQuoteCommand()
+    assert cmd.is_restricted is True
+    assert cmd.run(CommandContext(connector, CONFIG, command_input="never trust a frittata")) == (
+        "Quote #1 added"
+    )
+    assert cmd.run(CommandContext(connector, CONFIG, command_input=" ")) == (
+        "Please provide the quote after !addquote"
+    )
+
+
+@pytest.mark.parametrize(
+    "command_input, expectation",
+    [
+        pytest.param("", "#1: never trust a frittata", id="random quote"),
+        pytest.param("#1", "#1: never trust a frittata", id="quote by id"),
+        pytest.param("2", "Quote 2 does not exist", id="quote id does not exist"),
+        pytest.param("#³", "No quote matches '#³'", id="quote id not a number"),
+        pytest.param(
+            "99999999999999999999",
+            "Quote 99999999999999999999 does not exist",
+            id="quote id too large",
+        ),
+        pytest.param("Frittata", "#1: never trust a frittata", id="quote search"),
+        pytest.param("omelette", "No quote matches 'omelette'", id="quote search no match"),
+    ],
+)
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_QuoteCommand(datafiles, command_input, expectation):
+    connector = DbConnector(db_path=datafiles)
+    cmd = QuoteCommand()
+    assert cmd.run(CommandContext(connector, CONFIG)) == (
+        "There are no quotes yet, add one with !addquote"
+    )
+
+    connector.add_quote("never trust a frittata")
+    assert cmd.is_restricted is False
+    assert cmd.run(CommandContext(connector, CONFIG, command_input=command_input)) == expectation
+
+
+def test_command_handlers_are_shared_and_stateless():
+    for command_name, command in SPECIAL_COMMANDS.items():
+        assert commands_factory(command_name) is command
+        # slots all the way down, a handler can't grow per-invocation state by accident.
+        assert not hasattr(command, "__dict__")
+        assert type(command).is_restricted is command.is_restricted
+    assert commands_factory("not_special") is TEXT_COMMAND
+    assert commands_factory("drop") is None
@@ -0,0 +1,75 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from chatbot.commands import CommandContext, DropLeaderboardCommand
+from chatbot.db import DbConnector
+from chatbot.drops import DropResultsTracker
+from tests.conftest import Config
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+CONFIG = Config()
+
+
+@pytest.mark.parametrize(
+    "message, expectation",
+    [
+        pytest.param("@DataFrittata landed for 87.52 points!", ("datafrittata", 87.52), id="float"),
+        pytest.param("someone scored with 12 points", ("someone", 12.0), id="int"),
+        pytest.param("!drop", None, id="not a result"),
+    ],
+)
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_DropResultsTracker_ingest(datafiles, message, expectation):
+    tracker = DropResultsTracker(DbConnector(db_path=datafiles))
+    assert tracker.ingest(message) is (expectation is not None)
+    if expectation:
+        user_name, score = expectation
+        assert tracker.scores[user_name].total_score == score
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_DropResultsTracker_leaderboard_is_incremental(datafiles):
+    tracker = DropResultsTracker(DbConnector(db_path=datafiles), leaderboard_size=3)
+    for user_name, score in [("a", 10), ("b", 20), ("c", 30), ("d", 5), ("a", 25), ("d", 40)]:
+        tracker.add_result(user_name, score)
+
+    assert tracker.leaderboard() == [("d", 45), ("a", 35), ("c", 30)]
+    assert tracker.leaderboard(limit=1) == [("d", 45)]
+    assert tracker.scores["a"].best_score == 25
+    assert tracker.scores["a"].drops == 2
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_DropResultsTracker_flush_and_reload(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = DropResultsTracker(connector)
+    tracker.add_result("a", 10)
+    tracker.add_result("b", 20)
+
+    assert connector.get_all_drop_results() == []
+    tracker.flush()
+    tracker.add_result("a", 15)
+    tracker.flush()
+
+    reloaded = DropResultsTracker(connector)
+    assert reloaded.leaderboard() == [("a", 25), ("b", 20)]
+    assert reloaded.scores["a"].drops == 2
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_DropLeaderboardCommand(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = DropResultsTracker(connector)
+    context = CommandContext(connector, CONFIG, services={"drop_results": tracker})
+    cmd = DropLeaderboardCommand()
+    assert cmd.is_restricted is False
+    assert cmd.run(context) == "Nobody landed a drop yet"
+
+    tracker.add_result("Alice", 12.5)
+    tracker.add_result("bob", 30)
+    assert cmd.run(context) == "Drop leaderboard: 1. bob (30 pts) | 2. alice (12.5 pts)"
@@ -0,0 +1,121 @@
+import os
+import random
+from collections import Counter
+from datetime import date
+from pathlib import Path
+
+import pytest
+
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, TopEmotesCommand
+from chatbot.db import DbConnector
+from chatbot.emotes import EmoteTracker, SpaceSaving, parse_emotes
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+from tests.test_IrcMock import LocalConfig
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+def test_parse_emotes():
+    text = "Kappa Keepo Kappa"
+    assert list(parse_emotes("25:0-4,12-16/1902:6-10", text)) == [("Kappa", 2), ("Keepo", 1)]
+    assert list(parse_emotes("", text)) == []
+    # ranges past the end of the text fall back to the emote id
+    assert list(parse_emotes("25:40-44", text)) == [("25", 1)]
+
+
+def test_SpaceSaving_finds_the_heavy_hitters_in_fixed_memory():
+    rng = random.Random(7)
+    # a few popular emotes and a long tail of ones used a couple of times each
+    stream = ["LUL"] * 3000 + ["Kappa"] * 2000 + ["PogChamp"] * 1000
+    stream += [f"tail{i}" for i in range(5000) for _ in range(2)]
+    rng.shuffle(stream)
+    exact = Counter(stream)
+
+    counters = SpaceSaving(capacity=50)
+    for emote in stream:
+        counters.add(emote)
+
+    assert len(counters) == 50
+    assert counters.total == len(stream)
+    top = counters.top(3)
+    assert [emote for emote, _, _ in top] == ["LUL", "Kappa", "PogChamp"]
+    for emote, count, error in top:
+        assert count - error <= exact[emote] <= count
+
+
+def test_SpaceSaving_counts_exactly_below_capacity():
+    counters = SpaceSaving(capacity=10)
+    counters.add("a", 3)
+    counters.add("b")
+    counters.add("a")
+    assert counters.top() == [("a", 4, 0), ("b", 1, 0)]
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_EmoteTracker_snapshots_and_topemotes(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    emotes = EmoteTracker(connector, capacity=10, stream_date=date(2021, 8, 1))
+    context = CommandContext(connector, Config(), services={"emotes": emotes})
+    assert TopEmotesCommand().run(context) == "No emotes used yet this stream"
+
+    emotes.record("#datafrittata", "25:0-4,12-16/1902:6-10", "Kappa Keepo Kappa")
+    emotes.record("#datafrittata", "1902:0-4", "Keepo")
+    emotes.record("#otherchannel", "25:0-4", "Kappa")
+    emotes.snapshot()
+    # nobody used an emote since, nothing to write
+    emotes.snapshot()
+    emotes.record("#datafrittata", "25:0-4", "Kappa")
+    emotes.snapshot()
+
+    assert TopEmotesCommand().run(context) == "Top emotes this stream: Kappa 3, Keepo 2"
+    assert TopEmotesCommand().run(context._replace(command_input="1")) == (
+        "Top emotes this stream: Kappa 3"
+    )
+    assert TopEmotesCommand().run(context._replace(command_input="²")) == (
+        "Top emotes this stream: Kappa 3, Keepo 2"
+    )
+    snapshots = connector.get_emote_snapshots(date(2021, 8, 1), "#datafrittata")
+    assert [row[1:] for row in snapshots] == [
+        ("Kappa", 2, 0),
+        ("Keepo", 2, 0),
+        ("Kappa", 3, 0),
+        ("Keepo", 2, 0),
+    ]
+    assert len({taken_at for taken_at, *_ in snapshots}) == 2
+    assert [
+        row[1:] for row in connector.get_emote_snapshots(date(2021, 8, 1), "#otherchannel")
+    ] == [("Kappa", 1, 0)]
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_EmoteTracker_retries_a_failed_snapshot(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    emotes = EmoteTracker(connector, capacity=10, stream_date=date(2021, 8, 1))
+    emotes.record("#datafrittata", "25:0-4", "Kappa")
+
+    connector.emote_snapshots.drop(connector.engine)
+    emotes.snapshot()
+    connector.emote_snapshots.create(connector.engine)
+    emotes.snapshot()
+
+    snapshots = connector.get_emote_snapshots(date(2021, 8, 1), "#datafrittata")
+    assert [row[1:] for row in snapshots] == [("Kappa", 1, 0)]
+
+
+def test_Bot_counts_emotes_from_the_tag(tmp_path):
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), InMemoryDbConnector())
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_privmsg(
+                "#datafrittata", ChatLine("User1", "LUL LUL", user_id="1", emotes="425618:0-2,4-6")
+            )
+            server.send_privmsg("#datafrittata", ChatLine("User2", "!topemotes", user_id="2"))
+            assert run_bot(bot, lambda: len(server.responses) == 2, timeout=5)
+        finally:
+            bot.disconnect()
+    assert server.responses[1].text == "Top emotes this stream: LUL 2"
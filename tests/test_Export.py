@@ -0,0 +1,71 @@
+import csv
+
+import pytest
+
+from chatbot.db import DbConnector
+from chatbot.export import export, iter_chunks, snapshot
+
+
+@pytest.fixture
+def connector(tmp_path) -> DbConnector:
+    connector = DbConnector(db_path=f"{tmp_path}/db/")
+    for i in range(5):
+        connector.add_new_user(user_id=str(i), user_name=f"user{i}")
+    return connector
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        return list(csv.reader(f))
+
+
+def test_export_csv(connector, tmp_path):
+    connector.add_command_alias("hi", "hello")
+    exported = export(connector, str(tmp_path / "out"), chunk_size=2)
+    assert exported == {"users": 5, "commands": 3, "command_aliases": 1}
+
+    users = read_csv(tmp_path / "out" / "users.csv")
+    assert users[0] == [
+        "user_id",
+        "user_name",
+        "country",
+        "first_chatted_at",
+        "zodiac_sign",
+        "emoji",
+    ]
+    assert [row[:2] for row in users[1:]] == [[str(i), f"user{i}"] for i in range(5)]
+    assert read_csv(tmp_path / "out" / "command_aliases.csv") == [
+        ["alias_name", "aliased_command_name"],
+        ["hi", "hello"],
+    ]
+
+    with pytest.raises(ValueError):
+        export(connector, str(tmp_path / "out"), tables=["missing"])
+
+
+def test_iter_chunks_pages_through_composite_keys(connector):
+    connector.upsert_unknown_commands(
+        {"a": 3, "b": 2}, {"a": {"1", "2", "3"}, "b": {"1", "2"}}, attempted_at=None
+    )
+    with snapshot(connector) as conn:
+        chunks = list(iter_chunks(conn, connector.unknown_command_users, chunk_size=2))
+    assert [len(rows) for rows in chunks] == [2, 2, 1]
+    assert [tuple(row) for rows in chunks for row in rows] == [
+        ("a", "1"),
+        ("a", "2"),
+        ("a", "3"),
+        ("b", "1"),
+        ("b", "2"),
+    ]
+
+
+def test_snapshot_does_not_block_or_see_later_writes(connector):
+    with snapshot(connector) as conn:
+        chunks = iter_chunks(conn, connector.users, chunk_size=2)
+        first = next(chunks)
+        # the bot keeps writing while the export is halfway through
+        connector.add_new_user(user_id="9", user_name="late")
+        rest = [row for rows in chunks for row in rows]
+    assert [row[0] for row in first + rest] == ["0", "1", "2", "3", "4"]
+    with snapshot(connector) as conn:
+        assert len([row for rows in iter_chunks(conn, connector.users, 10) for row in rows]) == 6
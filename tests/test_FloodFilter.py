@@ -0,0 +1,102 @@
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, FloodStatsCommand
+from chatbot.flood import CHANNEL_DUPLICATE, USER_DUPLICATE, USER_RATE, FloodFilter
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+from tests.test_IrcMock import LocalConfig
+
+CONFIG = Config()
+
+
+def test_FloodFilter_user_duplicates():
+    flood_filter = FloodFilter(user_window=10)
+
+    assert flood_filter.check("a", "hello chat", now=0) is None
+    assert flood_filter.check("a", "Hello   CHAT", now=1) == USER_DUPLICATE
+    assert flood_filter.check("b", "hello chat", now=2) is None
+    # out of the window, it's fine to say it again
+    assert flood_filter.check("a", "hello chat", now=11) is None
+
+
+def test_FloodFilter_user_rate():
+    flood_filter = FloodFilter(user_window=10, user_max_messages=3)
+
+    for i in range(3):
+        assert flood_filter.check("a", f"message {i}", now=i) is None
+    assert flood_filter.check("a", "message 3", now=3) == USER_RATE
+    assert flood_filter.check("a", "message 4", now=10.5) is None
+
+
+def test_FloodFilter_channel_duplicates():
+    flood_filter = FloodFilter(channel_window=10, channel_max_duplicates=2)
+
+    assert flood_filter.check("a", "copypasta", now=0) is None
+    assert flood_filter.check("b", "copypasta", now=1) is None
+    assert flood_filter.check("c", "copypasta", now=2) == CHANNEL_DUPLICATE
+    # commands are never considered copypasta
+    for user in ["a", "b", "c"]:
+        assert flood_filter.check(user, "!drop", now=3) is None
+    assert flood_filter.check("d", "copypasta", now=13) is None
+
+
+def test_FloodFilter_is_bounded():
+    flood_filter = FloodFilter(max_users=2, channel_max_entries=3)
+    for i in range(10):
+        flood_filter.check(f"user_{i}", f"message {i}", now=0)
+
+    assert len(flood_filter._users) == 2
+    assert len(flood_filter._channel) == 3
+    assert sum(flood_filter._channel_hashes.values()) == 3
+
+
+def test_Bot_lets_the_drop_bot_and_the_broadcaster_past_the_flood_filter(tmp_path):
+    with FakeTwitchIRC() as server:
+        config = LocalConfig(server, tmp_path)
+        config.drop_bot_name = "DropBot"
+        bot = Bot(config, InMemoryDbConnector())
+        parsed = []
+
+        def structure_message(event):
+            parsed.append(event.arguments[0])
+            return Bot.structure_message(event)
+
+        bot.structure_message = structure_message
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            for i in range(10):
+                server.send_privmsg(
+                    "#datafrittata", ChatLine("DropBot", f"user{i} landed for 10 points")
+                )
+            for _ in range(3):
+                server.send_privmsg(
+                    "#datafrittata", ChatLine("DataFrittata", "!hello", badges="broadcaster/1")
+                )
+            server.send_privmsg("#datafrittata", ChatLine("User1", "!hello"))
+            server.send_privmsg("#datafrittata", ChatLine("User1", "!hello"))
+            server.send_privmsg("#datafrittata", ChatLine("User2", "!hello"))
+            assert run_bot(bot, lambda: len(server.responses) == 6, timeout=5)
+        finally:
+            bot.disconnect()
+    assert len(bot.drop_results.scores) == 10
+    assert [response.text for response in server.responses[1:]] == [
+        "Welcome to the stream, DataFrittata",
+        "Welcome to the stream, DataFrittata",
+        "Welcome to the stream, DataFrittata",
+        "Welcome to the stream, User1",
+        "Welcome to the stream, User2",
+    ]
+    assert bot.flood_filter.suppressed == {USER_DUPLICATE: 1}
+    # the suppressed line never got its tags parsed
+    assert len(parsed) == 15 and parsed.count("!hello") == 5
+
+
+def test_FloodStatsCommand():
+    flood_filter = FloodFilter(channel_window=10)
+    flood_filter.check("a", "hi", now=0)
+    flood_filter.check("a", "hi", now=1)
+
+    context = CommandContext(InMemoryDbConnector(), CONFIG, services={"flood_filter": flood_filter})
+    cmd = FloodStatsCommand()
+    assert cmd.is_restricted is True
+    assert cmd.run(context) == "Suppressed 1 of 2 lines (user_duplicate: 1), chat is at 0.2 lines/s"
@@ -0,0 +1,135 @@
+import asyncio
+
+import httpx
+import pytest
+
+from chatbot.commands import CommandContext, ShoutoutCommand, UptimeCommand
+from chatbot.helix import MAX_BATCH_SIZE, AsyncHelixClient, HelixClient, RateLimit, RateLimitedError
+from chatbot.helix_mock import MockHelix
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config, FakeClock
+
+
+def make_mock(n_users: int = 0, **kwargs) -> MockHelix:
+    mock = MockHelix(**kwargs)
+    for i in range(n_users):
+        mock.add_user(f"user{i}")
+    return mock
+
+
+def test_get_users_batches_lookups():
+    mock = make_mock(n_users=250)
+    with HelixClient("id", "token", transport=mock.transport()) as client:
+        logins = [f"user{i}" for i in range(250)] + ["user0", "nobody"]
+        users = client.get_users(logins=logins)
+
+    assert sorted(user["login"] for user in users) == sorted(f"user{i}" for i in range(250))
+    assert mock.requests == 3
+    assert MAX_BATCH_SIZE == 100
+
+
+def test_client_waits_for_the_rate_limit_to_reset():
+    clock = FakeClock(now=1_000.0)
+    mock = make_mock(n_users=1, rate_limit=3, window=60, clock=clock)
+    client = HelixClient(
+        "id", "token", transport=mock.transport(), clock=clock, sleep=clock.sleep, max_wait=60
+    )
+    for _ in range(5):
+        assert client.get_users(logins=["user0"])[0]["login"] == "user0"
+
+    # 3 points with one kept in reserve, two requests go out before waiting for the refill.
+    assert clock.sleeps == [60.0, 60.0]
+    assert mock.requests == 5
+
+
+def test_client_retries_once_after_a_429():
+    clock = FakeClock(now=1_000.0)
+    mock = make_mock(n_users=1, rate_limit=10, window=30, clock=clock)
+    mock.remaining = 0  # someone else emptied the bucket
+    client = HelixClient(
+        "id", "token", transport=mock.transport(), clock=clock, sleep=clock.sleep, max_wait=30
+    )
+
+    assert client.get_users(logins=["user0"])[0]["login"] == "user0"
+    assert clock.sleeps == [30.0]
+    assert mock.requests == 2
+
+
+def test_client_does_not_block_for_long_waits():
+    clock = FakeClock(now=1_000.0)
+    mock = make_mock(n_users=1, rate_limit=3, window=60, clock=clock)
+    client = HelixClient("id", "token", transport=mock.transport(), clock=clock, sleep=clock.sleep)
+    for _ in range(2):
+        client.get_users(logins=["user0"])
+    for _ in range(2):
+        with pytest.raises(RateLimitedError) as e:
+            client.get_users(logins=["user0"])
+        assert e.value.retry_after == 60.0
+    assert clock.sleeps == [] and mock.requests == 2
+
+    clock.now += 60
+    assert client.get_users(logins=["user0"])[0]["login"] == "user0"
+
+    # nor for a 429 from someone else emptying the bucket
+    mock.remaining = 0
+    client.rate_limit.remaining = None
+    with pytest.raises(RateLimitedError):
+        client.get_users(logins=["user0"])
+    assert clock.sleeps == []
+
+
+def test_RateLimit_ignores_garbage_headers():
+    rate_limit = RateLimit()
+    rate_limit.update(httpx.Headers({"Ratelimit-Remaining": "lots"}))
+    assert rate_limit.remaining is None
+    assert rate_limit.acquire() == 0.0
+
+
+def test_get_app_access_token():
+    client = HelixClient("id", transport=make_mock().transport())
+    assert client.get_app_access_token("secret") == "mock-token"
+
+
+def test_AsyncHelixClient_batches_concurrently():
+    mock = make_mock(n_users=250)
+
+    async def lookup():
+        async with AsyncHelixClient("id", "token", transport=mock.transport()) as client:
+            return await client.get_users(logins=[f"user{i}" for i in range(250)])
+
+    assert len(asyncio.run(lookup())) == 250
+    assert mock.requests == 3
+
+
+def test_MockHelix_serves_over_http():
+    mock = make_mock(n_users=1)
+    mock.streams["user0"] = {"user_login": "user0", "started_at": "2021-08-01T12:57:25Z"}
+    server = mock.serve()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    try:
+        with HelixClient(
+            "id", base_url=f"{base_url}/helix", token_url=f"{base_url}/oauth2/token"
+        ) as client:
+            assert client.get_app_access_token("secret") == "mock-token"
+            assert client.get_streams(user_logins=["user0", "user1"]) == [
+                {"user_login": "user0", "started_at": "2021-08-01T12:57:25Z"}
+            ]
+            assert client.rate_limit.remaining == 799
+    finally:
+        server.shutdown()
+
+
+def test_commands_use_the_helix_service():
+    mock = make_mock()
+    mock.add_user("datafrittata", display_name="DataFrittata")
+    client = HelixClient("id", "token", transport=mock.transport())
+    context = CommandContext(
+        InMemoryDbConnector(), Config(), command_input="@DataFrittata", services={"helix": client}
+    )
+
+    assert ShoutoutCommand().run(context) == (
+        "You should check out DataFrittata or give them a follow here: "
+        "https://twitch.tv/datafrittata <3"
+    )
+    assert UptimeCommand().run(context) == "datafrittata is not currently streaming"
+    assert mock.requests == 2
@@ -0,0 +1,37 @@
+from chatbot.bot import Bot
+from chatbot.config import Config
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+
+
+class LocalConfig(Config):
+    def __init__(self, server: FakeTwitchIRC, tmp_path) -> None:
+        super().__init__()
+        self.bot_name = "test_bot"
+        self.channel = "datafrittata"
+        self.oauth_token = "oauth:test"
+        self.irc_server = server.host
+        self.irc_port = server.port
+        self.cache_snapshot_path = str(tmp_path / "cache_snapshot.json.gz")
+
+    def get_bot_api_token(self):
+        return ""
+
+
+def test_Bot_against_FakeTwitchIRC(tmp_path):
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), InMemoryDbConnector())
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            assert {"twitch.tv/membership", "twitch.tv/tags", "twitch.tv/commands"} <= server.caps
+            assert server.joined == {"#datafrittata"}
+            assert server.responses[0].text == "Hello, I am the bot"
+
+            sent_at = server.send_privmsg("#datafrittata", ChatLine("User1", "!hello"))
+            assert run_bot(bot, lambda: len(server.responses) == 2, timeout=5)
+            response = server.responses[1]
+            assert response.channel == "#datafrittata"
+            assert response.text == "Welcome to the stream, User1"
+            assert response.received_at >= sent_at
+        finally:
+            bot.disconnect()
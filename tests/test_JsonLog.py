@@ -0,0 +1,70 @@
+import json
+import logging
+
+import chatbot.bot
+from chatbot.bot import Bot
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.json_log import configure_logging, stop_logging
+from chatbot.storage import InMemoryDbConnector
+from tests.test_IrcMock import LocalConfig
+
+
+def read_lines(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_configure_logging_writes_json_lines_with_per_logger_levels(tmp_path):
+    path = tmp_path / "logs" / "bot.jsonl"
+    root_level = logging.getLogger().level
+    listener = configure_logging(str(path), level="INFO", levels={"chatbot.db": "WARNING"})
+    try:
+        logging.getLogger("chatbot.bot").info("!uptime run", extra={"command": "uptime"})
+        logging.getLogger("chatbot.bot").debug("chat message")
+        logging.getLogger("chatbot.db").info("Inserting test with: test")
+        logging.getLogger("chatbot.db").warning("command already exists")
+    finally:
+        stop_logging(listener)
+        logging.getLogger().setLevel(root_level)
+        logging.getLogger("chatbot.db").setLevel(logging.NOTSET)
+
+    lines = read_lines(path)
+    assert [(line["logger"], line["level"], line["message"]) for line in lines] == [
+        ("chatbot.bot", "INFO", "!uptime run"),
+        ("chatbot.db", "WARNING", "command already exists"),
+    ]
+    assert lines[0]["command"] == "uptime"
+    assert "ts" in lines[0]
+
+
+def test_configure_logging_rotates_by_size(tmp_path):
+    path = tmp_path / "bot.jsonl"
+    listener = configure_logging(str(path), max_bytes=1000, backup_count=2)
+    try:
+        for i in range(100):
+            logging.getLogger("chatbot.test").warning(f"line {i}")
+    finally:
+        stop_logging(listener)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bot.jsonl", "bot.jsonl.1", "bot.jsonl.2"]
+    assert read_lines(path)[-1]["message"] == "line 99"
+    assert all(p.stat().st_size <= 1000 for p in tmp_path.iterdir())
+
+
+def test_headless_Bot_does_not_render(tmp_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("headless bot printed to the console")
+
+    monkeypatch.setattr(chatbot.bot.console, "print", fail)
+    with FakeTwitchIRC() as server:
+        config = LocalConfig(server, tmp_path)
+        config.headless = True
+        bot = Bot(config, InMemoryDbConnector())
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_privmsg("#datafrittata", ChatLine("User1", "just chatting"))
+            server.send_privmsg("#datafrittata", ChatLine("User1", "!hello"))
+            assert run_bot(bot, lambda: len(server.responses) == 2, timeout=5)
+            assert server.responses[1].text == "Welcome to the stream, User1"
+        finally:
+            bot.disconnect()
@@ -0,0 +1,58 @@
+from chatbot.commands import CommandContext, LoadLevelCommand
+from chatbot.load_shedding import (
+    ELEVATED_COMMANDS_ONLY,
+    NORMAL,
+    SKIP_DECORATION,
+    SKIP_RENDERING,
+    LoadShedder,
+)
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+
+
+def feed(load_shedder: LoadShedder, lag: float, times: int = 1) -> int:
+    for _ in range(times):
+        load_shedder.observe(sent_at=1000.0, now=1000.0 + lag)
+    return load_shedder.level
+
+
+def test_LoadShedder_degrades_and_recovers():
+    load_shedder = LoadShedder(thresholds=[2, 5, 10], smoothing=1.0, recovery_ratio=0.5)
+
+    assert feed(load_shedder, 0) == NORMAL
+    assert feed(load_shedder, 3) == SKIP_DECORATION
+    assert feed(load_shedder, 6) == SKIP_RENDERING
+    assert feed(load_shedder, 30) == ELEVATED_COMMANDS_ONLY
+    # hysteresis: 4s is under the 5s threshold but not under half of it
+    assert feed(load_shedder, 4) == SKIP_RENDERING
+    assert feed(load_shedder, 2) == SKIP_DECORATION
+    assert feed(load_shedder, 0.5) == NORMAL
+
+
+def test_LoadShedder_smooths_spikes():
+    load_shedder = LoadShedder(thresholds=[2, 5, 10], smoothing=0.2)
+    feed(load_shedder, 0)
+    assert feed(load_shedder, 8) == NORMAL
+    assert feed(load_shedder, 8, times=10) == SKIP_RENDERING
+
+
+def test_LoadShedder_ignores_clock_offset():
+    load_shedder = LoadShedder(thresholds=[2, 5, 10], smoothing=1.0)
+    # our clock being 30s ahead of twitch's isn't lag
+    assert feed(load_shedder, 30, times=5) == NORMAL
+    assert feed(load_shedder, 33) == SKIP_DECORATION
+
+
+def test_LoadLevelCommand():
+    load_shedder = LoadShedder(thresholds=[2, 5, 10], smoothing=1.0)
+    feed(load_shedder, 0)
+    feed(load_shedder, 3)
+
+    context = CommandContext(
+        InMemoryDbConnector(), Config(), services={"load_shedder": load_shedder}
+    )
+    cmd = LoadLevelCommand()
+    assert cmd.is_restricted is True
+    assert cmd.run(context) == (
+        "Load level 1 (skipping emoji and country decoration), lagging 3.0s behind chat"
+    )
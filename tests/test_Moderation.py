@@ -0,0 +1,124 @@
+import pytest
+
+from chatbot.bot import Bot
+from chatbot.commands import BannedTermsCommand, BanTermCommand, CommandContext, UnbanTermCommand
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.moderation import DELETE, LOG, TIMEOUT, ModerationFilter, TermAutomaton, normalise
+from chatbot.storage import InMemoryDbConnector
+from tests.test_IrcMock import LocalConfig
+
+
+def test_normalise():
+    assert normalise("B4D W0RD") == "bad word"
+    assert normalise("bäd ｗｏｒｄ") == "bad word"
+    # cyrillic а and о
+    assert normalise("bаd wоrd") == "bad word"
+    # numbers on their own are left alone, digits only stand in for letters within words
+    assert normalise("4$$ a55 455 points at 10:30") == "ass ass 455 points at 10:30"
+
+
+def test_TermAutomaton_finds_every_term_in_one_pass():
+    automaton = TermAutomaton()
+    for term in ["he", "she", "his", "hers", "*ush*"]:
+        automaton.add(term)
+    assert sorted(automaton.search("she said hers, his and he")) == ["he", "hers", "his", "she"]
+    # whole words only unless there's a wildcard
+    assert list(automaton.search("ushers")) == ["*ush*"]
+    assert list(automaton.search("nothing to see")) == []
+
+
+def test_TermAutomaton_edits_are_picked_up():
+    automaton = TermAutomaton()
+    assert list(automaton.search("spam spam")) == []
+    automaton.add("spam")
+    automaton.add("spa*")
+    assert sorted(automaton.search("5P4M")) == ["spa*", "spam"]
+    assert automaton.remove("spam")
+    assert not automaton.remove("spam")
+    assert list(automaton.search("spam")) == ["spa*"]
+    automaton.add("spam")
+    assert len(automaton) == 2
+    assert sorted(automaton.search("spam")) == ["spa*", "spam"]
+
+
+def test_ModerationFilter_harshest_action_wins():
+    connector = InMemoryDbConnector()
+    connector.add_banned_term("meh", LOG)
+    moderation = ModerationFilter(connector)
+    moderation.add_term("Spam*", DELETE)
+    moderation.add_term("badword", TIMEOUT)
+    with pytest.raises(ValueError):
+        moderation.add_term("x", "ban")
+    with pytest.raises(ValueError):
+        moderation.add_term("**", DELETE)
+
+    assert moderation.check("hello there") is None
+    assert moderation.check("meh") == (LOG, "meh")
+    assert moderation.check("meh, spammy") == (DELETE, "spam*")
+    assert moderation.check("meh spam b4dw0rd") == (TIMEOUT, "badword")
+    assert moderation.caught == {LOG: 1, DELETE: 1, TIMEOUT: 1}
+    assert connector.get_banned_terms() == [("badword", TIMEOUT), ("meh", LOG), ("spam*", DELETE)]
+
+    assert moderation.remove_term("badword")
+    assert moderation.check("badword") is None
+    # a new filter starts from what's stored
+    assert ModerationFilter(connector).check("spam") == (DELETE, "spam*")
+
+
+def test_ModerationFilter_leaves_numbers_alone():
+    moderation = ModerationFilter(InMemoryDbConnector())
+    moderation.add_term("ass", TIMEOUT)
+    assert moderation.check("I got 455 points") is None
+    assert moderation.check("@someone landed for 455 points") is None
+    assert moderation.check("a55") == (TIMEOUT, "ass")
+
+
+def test_moderation_commands():
+    connector = InMemoryDbConnector()
+    moderation = ModerationFilter(connector)
+
+    def context(command_input: str) -> CommandContext:
+        return CommandContext(
+            connector, None, command_input=command_input, services={"moderation": moderation}
+        )
+
+    assert all(
+        cmd.is_restricted for cmd in [BanTermCommand(), UnbanTermCommand(), BannedTermsCommand()]
+    )
+    assert BanTermCommand().run(context("buy followers")) == (
+        "Banned buy followers, messages with it get the delete treatment"
+    )
+    assert BanTermCommand().run(context("BadWord timeout")) == (
+        "Banned badword, messages with it get the timeout treatment"
+    )
+    assert BanTermCommand().run(context("* log")) == BanTermCommand.USAGE
+    assert moderation.check("wanna BUY FOLLOWERS?") == (DELETE, "buy followers")
+    assert BannedTermsCommand().run(context("")) == (
+        "2 banned terms (log: 0, delete: 1, timeout: 1), caught 1 messages"
+    )
+    assert UnbanTermCommand().run(context("badword")) == "badword is no longer banned"
+    assert UnbanTermCommand().run(context("badword")) == "badword wasn't banned"
+
+
+def test_Bot_deletes_and_times_out_over_irc(tmp_path):
+    connector = InMemoryDbConnector()
+    connector.add_banned_term("spam", DELETE)
+    connector.add_banned_term("badword", TIMEOUT)
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), connector)
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_privmsg("#datafrittata", ChatLine("Spammer", "sp4m !hello"))
+            server.send_privmsg("#datafrittata", ChatLine("Rude", "badword"))
+            server.send_privmsg(
+                "#datafrittata", ChatLine("Boss", "badword", badges="broadcaster/1")
+            )
+            server.send_privmsg("#datafrittata", ChatLine("User1", "!hello"))
+            assert run_bot(bot, lambda: len(server.responses) == 4, timeout=5)
+        finally:
+            bot.disconnect()
+    assert [response.text for response in server.responses[1:]] == [
+        "/delete 1",
+        "/timeout Rude 600 banned term",
+        "Welcome to the stream, User1",
+    ]
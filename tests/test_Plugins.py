@@ -0,0 +1,107 @@
+import sys
+
+import pytest
+
+from chatbot.commands import (
+    TEXT_COMMAND,
+    CommandContext,
+    ListCommandsCommand,
+    ReloadPluginCommand,
+    commands_factory,
+)
+from chatbot.plugin_registry import PLUGIN_MODULE_PREFIX, PluginRegistry
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+
+PLUGIN_TEMPLATE = """
+from chatbot.commands import BaseCommand
+
+COMMANDS = {{"greet": "GreetCommand"}}
+
+
+class GreetCommand(BaseCommand):
+    def run(self, context):
+        return "{greeting}"
+"""
+
+
+CONFIG = Config()
+
+
+@pytest.fixture
+def plugin_dir(tmp_path):
+    (tmp_path / "greeter.py").write_text(PLUGIN_TEMPLATE.format(greeting="hi"))
+    (tmp_path / "no_manifest.py").write_text("raise RuntimeError('never imported')\n")
+    yield tmp_path
+    sys.modules.pop(f"{PLUGIN_MODULE_PREFIX}.greeter", None)
+
+
+def test_PluginRegistry_discovers_without_importing(plugin_dir):
+    plugins = PluginRegistry(plugin_dirs=[str(plugin_dir)], use_entry_points=False)
+
+    assert plugins.command_names == ["greet"]
+    assert f"{PLUGIN_MODULE_PREFIX}.greeter" not in sys.modules
+    assert plugins.plugins["greeter"].module is None
+
+    command = plugins.get("greet")
+    assert command is not None
+    assert command.run(CommandContext(InMemoryDbConnector(), CONFIG)) == "hi"
+    assert plugins.get("greet") is command
+    assert plugins.get("nope") is None
+
+
+def test_PluginRegistry_reload(plugin_dir):
+    plugins = PluginRegistry(plugin_dirs=[str(plugin_dir)], use_entry_points=False)
+    old_command = plugins.get("greet")
+
+    (plugin_dir / "greeter.py").write_text(PLUGIN_TEMPLATE.format(greeting="hello"))
+    assert plugins.reload("greeter") == ["greeter"]
+    new_command = plugins.get("greet")
+    assert new_command is not old_command
+    assert new_command.run(CommandContext(InMemoryDbConnector(), CONFIG)) == "hello"
+
+    # a broken plugin keeps serving what it had before
+    (plugin_dir / "greeter.py").write_text(PLUGIN_TEMPLATE.format(greeting="broken") + "\n1 / 0\n")
+    assert plugins.reload("greeter") == []
+    assert plugins.get("greet") is new_command
+
+
+def test_commands_factory_with_plugins(plugin_dir):
+    plugins = PluginRegistry(plugin_dirs=[str(plugin_dir)], use_entry_points=False)
+
+    assert commands_factory("greet", plugins=plugins) is plugins.get("greet")
+    assert commands_factory("greet") is TEXT_COMMAND
+    assert commands_factory("drop", plugins=plugins) is None
+
+
+def test_ReloadPluginCommand(plugin_dir):
+    connector = InMemoryDbConnector()
+    plugins = PluginRegistry(plugin_dirs=[str(plugin_dir)], use_entry_points=False)
+
+    services = {"plugins": plugins}
+    cmd = ReloadPluginCommand()
+    assert cmd.is_restricted is True
+    context = CommandContext(connector, CONFIG, command_input="", services=services)
+    assert cmd.run(context) == "No plugin was loaded yet, nothing to reload"
+
+    plugins.get("greet")
+    assert cmd.run(context) == "Reloaded: greeter"
+    context = CommandContext(connector, CONFIG, command_input="missing", services=services)
+    assert cmd.run(context) == "Could not reload missing"
+
+
+def test_ListCommandsCommand_lists_plugins(plugin_dir):
+    connector = InMemoryDbConnector()
+    plugins = PluginRegistry(plugin_dirs=[str(plugin_dir)], use_entry_points=False)
+
+    context = CommandContext(connector, CONFIG, services={"plugins": plugins})
+    assert ListCommandsCommand().run(context).endswith("!giveaway !topemotes !greet")
+
+
+def test_builtin_lurk_plugin():
+    plugins = PluginRegistry(use_entry_points=False)
+    command = plugins.get("lurk")
+    assert command is not None
+    assert command.run(CommandContext(InMemoryDbConnector(), CONFIG, user_name="test_user")) == (
+        "Enjoy the lurk test_user, we'll keep the frittata warm"
+    )
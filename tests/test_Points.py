@@ -0,0 +1,123 @@
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, PointsCommand, TopPointsCommand
+from chatbot.db import DbConnector
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.points import PointsBank
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import CountingConnector
+from tests.test_IrcMock import LocalConfig
+
+
+def test_PointsBank_ticks_award_everyone_at_once():
+    connector = CountingConnector()
+    bank = PointsBank(connector, per_message=1, per_minute=10, active_window=600)
+    for i in range(100):
+        bank.record_message(str(i), f"user{i}", now=0)
+    bank.record_message("0", "user0", now=500)
+    assert bank.balance("0") == 2
+    assert connector.calls["get_points"] == 1 and connector.calls["award_points"] == 0
+
+    bank.tick(now=60)
+    assert connector.calls["award_points"] == 1
+    assert connector.points["0"]["balance"] == 12
+    assert connector.points["99"]["balance"] == 11
+    # only the first lookup went to storage, the tick wrote through the cache
+    assert bank.balance("0") == 12
+    assert connector.calls["get_points"] == 1
+
+    # everyone but user0 went quiet more than active_window ago
+    bank.tick(now=1000)
+    assert connector.points["0"]["balance"] == 22
+    assert connector.points["99"]["balance"] == 11
+    bank.tick(now=2000)
+    assert connector.calls["award_points"] == 2
+
+
+def test_PointsBank_spend_is_all_or_nothing():
+    bank = PointsBank(InMemoryDbConnector(), per_message=5)
+    assert not bank.spend("1", 1)
+    bank.record_message("1", "user1", now=0)
+    bank.record_message("1", "user1", now=0)
+    # pending message points count
+    assert bank.spend("1", 8)
+    assert bank.balance("1") == 2
+    assert not bank.spend("1", 3)
+    assert bank.balance("1") == 2
+    bank.flush()
+    assert bank.balance("1") == 2
+
+
+def test_points_commands():
+    bank = PointsBank(InMemoryDbConnector())
+
+    def context(user_id: str, user_name: str) -> CommandContext:
+        return CommandContext(
+            InMemoryDbConnector(),
+            None,
+            user_id=user_id,
+            user_name=user_name,
+            services={"points": bank},
+        )
+
+    assert TopPointsCommand().run(context("1", "first")) == "Nobody has any points yet"
+    for user_id, messages in [("1", 3), ("2", 1), ("3", 2)]:
+        for _ in range(messages):
+            bank.record_message(user_id, f"user{user_id}", now=0)
+    assert PointsCommand().run(context("1", "user1")) == "user1: 3 points"
+    bank.tick(now=60)
+    assert TopPointsCommand().run(context("1", "user1")) == (
+        "1. user1: 13 | 2. user3: 12 | 3. user2: 11"
+    )
+
+
+def test_top_points_reads_the_balance_index(tmp_path):
+    connector = DbConnector(db_path=f"{tmp_path}/")
+    stmt = "EXPLAIN QUERY PLAN SELECT user_name, balance FROM points ORDER BY balance DESC LIMIT 5"
+    with connector.engine.connect() as conn:
+        plan = " ".join(row[-1] for row in conn.exec_driver_sql(stmt))
+    assert "ix_points_balance" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_Bot_charges_for_commands(tmp_path):
+    with FakeTwitchIRC() as server:
+        config = LocalConfig(server, tmp_path)
+        config.points_costs = {"hello": 5}
+        config.points_per_message = 3
+        bot = Bot(config, InMemoryDbConnector())
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            # different lines so the flood filter doesn't drop them as copypasta
+            for text in ["!hello", "!hello there", "!hello again"]:
+                server.send_privmsg("#datafrittata", ChatLine("User1", text, user_id="1"))
+            assert run_bot(bot, lambda: len(server.responses) == 4, timeout=5)
+        finally:
+            bot.disconnect()
+    assert [response.text for response in server.responses[1:]] == [
+        "User1, !hello costs 5 points and you have 3",
+        "Welcome to the stream, User1",
+        "User1, !hello costs 5 points and you have 4",
+    ]
+
+
+def test_Bot_charges_for_commands_called_through_an_alias(tmp_path):
+    with FakeTwitchIRC() as server:
+        config = LocalConfig(server, tmp_path)
+        config.points_costs = {"hug": 5}
+        config.points_per_message = 3
+        connector = InMemoryDbConnector()
+        connector.add_new_command("hug", "{user} hugs {touser}")
+        connector.add_command_alias("h", "hug")
+        bot = Bot(config, connector)
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            for text in ["!h @someone", "!h @other"]:
+                server.send_privmsg("#datafrittata", ChatLine("User1", text, user_id="1"))
+            assert run_bot(bot, lambda: len(server.responses) == 3, timeout=5)
+        finally:
+            bot.disconnect()
+    assert [response.text for response in server.responses[1:]] == [
+        "User1, !h costs 5 points and you have 3",
+        "User1 hugs other",
+    ]
+    assert bot.points.balance("1") == 1
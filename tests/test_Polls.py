@@ -0,0 +1,121 @@
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, PollCommand
+from chatbot.db import DbConnector
+from chatbot.irc_mock import ChatLine, FakeTwitchIRC, run_bot
+from chatbot.polls import PollManager
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import FakeClock
+from tests.test_IrcMock import LocalConfig
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+def test_PollManager_keeps_one_vote_per_user():
+    connector = InMemoryDbConnector()
+    last_wins = PollManager(connector, send=print)
+    first_wins = PollManager(connector, send=print, last_vote_wins=False)
+    for polls in (last_wins, first_wins):
+        polls.start("Best language?", ["python", "rust", "go"])
+        assert polls.parse_vote(" 2 ") == 1
+        for text in ["4", "0", "12", "two", "!2", "²", "³"]:
+            assert polls.parse_vote(text) is None
+        for user_id, choice in [("1", 0), ("2", 0), ("1", 1), ("1", 1)]:
+            polls.vote(user_id, choice)
+
+    assert last_wins.poll.tallies == [1, 1, 0]
+    assert first_wins.poll.tallies == [2, 0, 0]
+    with pytest.raises(ValueError):
+        last_wins.start("Another one?", ["yes", "no"])
+    with pytest.raises(ValueError):
+        PollManager(connector, send=print).start("Only one option?", ["yes"])
+
+
+def test_PollManager_posts_results_at_most_every_interval():
+    clock = FakeClock()
+    sent = []
+    polls = PollManager(InMemoryDbConnector(), send=sent.append, results_interval=30, clock=clock)
+    polls.start("Pizza?", ["yes", "no"])
+    polls.vote("1", 0)
+    clock.now = 10
+    polls.tick()
+    assert sent == []
+
+    clock.now = 30
+    polls.tick()
+    polls.vote("2", 0)
+    clock.now = 59
+    polls.tick()
+    assert sent == ["Pizza? 1) yes: 1 (100%) | 2) no: 0 (0%) (1 votes)"]
+
+    # nothing moved since the last post, nothing to say.
+    clock.now = 60
+    polls.tick()
+    clock.now = 200
+    polls.tick()
+    assert sent[1:] == ["Pizza? 1) yes: 2 (100%) | 2) no: 0 (0%) (2 votes)"]
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_PollCommand_stores_the_final_result_only(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    polls = PollManager(connector, send=print)
+    context = CommandContext(connector, None, services={"polls": polls})
+    poll = PollCommand()
+
+    assert poll.run(context._replace(command_input='start "Best snack?" chips "ice cream"')) == (
+        "Poll: Best snack? Vote by typing the number: 1) chips | 2) ice cream"
+    )
+    for user_id in range(5):
+        polls.vote(str(user_id), user_id % 2)
+    with connector.engine.connect() as conn:
+        assert conn.execute(select(connector.polls)).fetchall() == []
+
+    assert poll.run(context._replace(command_input="end")) == (
+        "Poll closed! Best snack? 1) chips: 3 (60%) | 2) ice cream: 2 (40%) (5 votes)"
+    )
+    assert poll.run(context._replace(command_input="end")) == "No poll running"
+    with connector.engine.connect() as conn:
+        (poll_id, question, *_), *others = conn.execute(select(connector.polls)).fetchall()
+        options = conn.execute(
+            select(connector.poll_options).order_by(connector.poll_options.c.position)
+        ).fetchall()
+    assert question == "Best snack?" and others == []
+    assert [tuple(row) for row in options] == [
+        (poll_id, 1, "chips", 3),
+        (poll_id, 2, "ice cream", 2),
+    ]
+
+
+def test_Bot_counts_votes_the_flood_filter_would_drop(tmp_path):
+    with FakeTwitchIRC() as server:
+        connector = InMemoryDbConnector()
+        bot = Bot(LocalConfig(server, tmp_path), connector)
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_privmsg(
+                "#datafrittata",
+                ChatLine("Streamer", '!poll start "Next game?" chess go', badges="broadcaster/1"),
+            )
+            assert run_bot(bot, lambda: len(server.responses) == 2, timeout=5)
+            for i in range(20):
+                server.send_privmsg("#datafrittata", ChatLine(f"User{i}", "1", user_id=str(i)))
+            server.send_privmsg("#datafrittata", ChatLine("User0", "2", user_id="0"))
+            server.send_privmsg(
+                "#datafrittata", ChatLine("Streamer", "!poll end", badges="broadcaster/1")
+            )
+            assert run_bot(bot, lambda: len(server.responses) == 3, timeout=5)
+        finally:
+            bot.disconnect()
+    assert server.responses[2].text == (
+        "Poll closed! Next game? 1) chess: 19 (95%) | 2) go: 1 (5%) (20 votes)"
+    )
+    # votes never reached the db, not even as new users.
+    assert len(connector.users) == 1
+    assert connector.polls[0]["results"] == [("chess", 19), ("go", 1)]
@@ -0,0 +1,133 @@
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, WatchTimeCommand
+from chatbot.db import DbConnector
+from chatbot.irc_mock import FakeTwitchIRC, run_bot
+from chatbot.presence import PresenceTracker
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import CountingConnector, FakeClock
+from tests.test_IrcMock import LocalConfig
+
+
+def test_PresenceTracker_accrues_in_memory_and_flushes_in_batches():
+    clock = FakeClock()
+    connector = CountingConnector()
+    connector.upsert_watch_time([{"user_name": "viewer", "seconds": 600, "last_seen_at": None}])
+    presence = PresenceTracker(connector, clock=clock)
+
+    presence.join("#chan", "Viewer")
+    presence.join("#chan", "lurker")
+    clock.now = 30
+    presence.join("#chan", "viewer")
+    assert presence.viewers("#chan") == 2
+    presence.part("#chan", "lurker")
+    presence.part("#chan", "nobody")
+    assert presence.viewers("#chan") == 1
+    clock.now = 90
+    assert presence.watch_time("viewer") == 690
+    assert presence.watch_time("lurker") == 30
+    assert connector.calls["upsert_watch_time"] == 1
+
+    presence.flush()
+    assert connector.calls["upsert_watch_time"] == 2
+    assert connector.get_watch_time("viewer") == 690
+    assert connector.get_watch_time("lurker") == 30
+    clock.now = 100
+    assert presence.watch_time("viewer") == 700
+
+    presence.leave_all()
+    presence.flush()
+    presence.flush()
+    assert connector.calls["upsert_watch_time"] == 3
+    assert connector.get_watch_time("viewer") == 700
+    assert presence.viewers("#chan") == 0
+
+
+def test_PresenceTracker_parts_chatters_that_go_quiet():
+    clock = FakeClock()
+    connector = InMemoryDbConnector()
+    presence = PresenceTracker(connector, idle_timeout=600, clock=clock)
+
+    presence.chatted("#chan", "Chatter")
+    presence.join("#chan", "viewer")
+    presence.chatted("#chan", "viewer")
+    clock.now = 300
+    presence.chatted("#chan", "chatter")
+    presence.flush()
+    assert presence.viewers("#chan") == 2
+
+    clock.now = 960
+    presence.flush()
+    # counted until 600 seconds after their last line, the viewer's PART is still to come
+    assert presence.viewers("#chan") == 1
+    assert connector.get_watch_time("chatter") == 900
+    assert connector.get_watch_time("viewer") == 960
+
+    # a JOIN after chatting means a PART will come too
+    presence.chatted("#chan", "late")
+    presence.join("#chan", "late")
+    clock.now = 2000
+    presence.flush()
+    assert set(presence.present["#chan"]) == {"viewer", "late"}
+
+
+def test_PresenceTracker_keeps_watch_time_when_a_flush_fails(tmp_path):
+    clock = FakeClock()
+    connector = DbConnector(db_path=f"{tmp_path}/")
+    presence = PresenceTracker(connector, clock=clock)
+    presence.join("#chan", "viewer")
+
+    clock.now = 60
+    connector.watch_time.drop(connector.engine)
+    presence.flush()
+    assert presence.pending == {"viewer": 60}
+
+    clock.now = 90
+    connector.watch_time.create(connector.engine)
+    presence.flush()
+    assert connector.get_watch_time("viewer") == 90
+    assert presence.watch_time("viewer") == 90
+
+
+def test_WatchTimeCommand():
+    clock = FakeClock()
+    presence = PresenceTracker(InMemoryDbConnector(), clock=clock)
+    presence.join("#chan", "viewer")
+
+    def context(command_input: str = "") -> CommandContext:
+        return CommandContext(
+            InMemoryDbConnector(),
+            None,
+            command_input=command_input,
+            user_name="Viewer",
+            services={"presence": presence},
+        )
+
+    assert WatchTimeCommand().run(context()) == "Viewer has only just got here"
+    clock.now = 3 * 3600 + 12 * 60
+    assert WatchTimeCommand().run(context()) == "Viewer has been watching for 3h 12m"
+    assert WatchTimeCommand().run(context("@viewer")) == "viewer has been watching for 3h 12m"
+    clock.now = 5 * 60
+    assert WatchTimeCommand().run(context()) == "Viewer has been watching for 5m"
+
+    # a localized display name doesn't lower case into the login
+    presence.join("#chan", "hanako")
+    clock.now = 10 * 60
+    localized = context()._replace(user_name="花子", user_login="hanako")
+    assert WatchTimeCommand().run(localized) == "花子 has been watching for 5m"
+
+
+def test_Bot_tracks_membership_over_irc(tmp_path):
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), InMemoryDbConnector())
+        try:
+            assert run_bot(bot, lambda: len(server.responses) == 1, timeout=5)
+            server.send_join("#datafrittata", "viewer")
+            server.send_join("#datafrittata", "lurker")
+            server.send_part("#datafrittata", "lurker")
+            assert run_bot(bot, lambda: "lurker" in bot.presence.pending, timeout=5)
+        finally:
+            bot.disconnect()
+    # the bot's own JOIN doesn't count
+    assert "test_bot" not in bot.presence.present["#datafrittata"]
+    assert bot.presence.viewers("#datafrittata") == 0
+    assert set(bot.presence.pending) == {"viewer", "lurker"}
@@ -0,0 +1,77 @@
+import threading
+import time
+
+from chatbot.commands import CommandContext, ProfileCommand
+from chatbot.profiler import UNATTRIBUTED, SamplingProfiler
+from chatbot.storage import InMemoryDbConnector
+from tests.conftest import Config
+
+
+def busy_command(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        pass
+
+
+def test_SamplingProfiler_attributes_samples(tmp_path):
+    profiler = SamplingProfiler(interval=0.001)
+    assert profiler.start()
+    assert not profiler.start()
+    with profiler.attribute("command:busy"):
+        busy_command(0.2)
+    assert profiler.label == UNATTRIBUTED
+    stacks = profiler.stop()
+    assert not profiler.running
+
+    busy_stacks = [stack for stack in stacks if "busy_command (tests/test_Profiler.py" in stack]
+    assert busy_stacks
+    assert all(stack.startswith("command:busy;") for stack in busy_stacks)
+    assert sum(stacks.values()) == profiler.samples
+
+    output_path = tmp_path / "profile.collapsed"
+    profiler.write(str(output_path))
+    lines = output_path.read_text().splitlines()
+    assert len(lines) == len(stacks)
+    stack, count = lines[0].rsplit(" ", 1)
+    assert stacks[stack] == int(count)
+
+
+def test_SamplingProfiler_window_writes_itself(tmp_path):
+    output_path = tmp_path / "window.collapsed"
+    profiler = SamplingProfiler(interval=0.001)
+    # sample a thread other than the one the window is started from, like the bot's.
+    busy = threading.Thread(target=busy_command, args=(0.3,))
+    busy.start()
+    profiler.start(duration=0.1, output_path=str(output_path), thread_id=busy.ident)
+    busy.join()
+    assert not profiler.running
+    assert "busy_command" in output_path.read_text()
+
+
+def test_ProfileCommand(tmp_path):
+    profiler = SamplingProfiler(interval=0.001)
+    cmd = ProfileCommand()
+    assert cmd.is_restricted is True
+    config = Config()
+    config.profile_dir = str(tmp_path)
+
+    def context(command_input: str) -> CommandContext:
+        return CommandContext(
+            InMemoryDbConnector(),
+            config,
+            command_input=command_input,
+            services={"profiler": profiler},
+        )
+
+    assert cmd.run(context("stop")) == "Not profiling"
+    output = cmd.run(context("5"))
+    assert output.startswith("Profiling for 5s, samples go to ")
+    assert profiler.running
+    assert cmd.run(context("")) == "Already profiling, !profile stop ends it"
+    time.sleep(0.05)
+    assert cmd.run(context("stop")).startswith("Wrote ")
+    assert not profiler.running
+    assert list(tmp_path.glob("profile-*.collapsed"))
+
+    assert cmd.run(context("²")).startswith("Profiling for 30s")
+    cmd.run(context("stop"))
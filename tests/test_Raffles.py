@@ -0,0 +1,110 @@
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from chatbot.commands import CommandContext, GiveawayCommand, RaffleCommand
+from chatbot.db import DbConnector
+from chatbot.raffles import Raffle, RaffleManager
+from chatbot.storage import InMemoryDbConnector
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+def test_RaffleManager_deduplicates_and_weights_by_badge():
+    raffles = RaffleManager(InMemoryDbConnector(), badge_weights={"subscriber": 3, "vip": 2})
+    assert not raffles.enter("1", "nobody", ["subscriber"])
+    raffles.open(seed=1)
+    assert raffles.enter("1", "sub", ["subscriber", "vip"])
+    assert not raffles.enter("1", "sub", [])
+    assert raffles.enter("2", "viewer", ["premium"])
+    assert raffles.raffle.entrants == {"1": ("sub", 3), "2": ("viewer", 1)}
+
+    raffles.raffle.draw()
+    # entries close with the first draw
+    assert not raffles.enter("3", "late", [])
+    with pytest.raises(ValueError):
+        raffles.open()
+
+
+def test_Raffle_draws_are_reproducible_and_without_replacement():
+    def draw_all(seed):
+        raffle = Raffle(seed)
+        for user_id in range(100):
+            raffle.enter(str(user_id), f"user{user_id}", weight=1 + user_id % 3)
+        winners = [raffle.draw() for _ in range(100)]
+        assert raffle.draw() is None
+        return winners
+
+    winners = draw_all(42)
+    assert sorted(winners, key=int) == [str(user_id) for user_id in range(100)]
+    assert draw_all(42) == winners
+    assert draw_all(43) != winners
+    assert Raffle(1).draw() is None
+
+
+def test_Raffle_draw_follows_the_weights():
+    wins = 0
+    for seed in range(2000):
+        raffle = Raffle(seed)
+        raffle.enter("heavy", "heavy", weight=9)
+        for user_id in range(10):
+            raffle.enter(str(user_id), f"user{user_id}", weight=1)
+        wins += raffle.draw() == "heavy"
+    # 9 out of 19 tickets
+    assert 0.42 < wins / 2000 < 0.53
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_giveaway_commands_store_entrants_and_winners_on_close(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    raffles = RaffleManager(connector, badge_weights={"subscriber": 2})
+    context = CommandContext(connector, None, services={"raffles": raffles})
+    giveaway = GiveawayCommand()
+
+    assert giveaway.run(context._replace(command_input="draw")) == (
+        "No giveaway running, !giveaway open starts one"
+    )
+    assert giveaway.run(context._replace(command_input="open ²")) == GiveawayCommand.USAGE
+    assert giveaway.run(context._replace(command_input=f"open {2**63}")) == (
+        "The seed has to be a number below 2^63"
+    )
+    assert raffles.raffle is None
+    assert giveaway.run(context._replace(command_input="open 7")) == (
+        "Giveaway open! Type !raffle to enter"
+    )
+    for user_id, badges in [("1", ()), ("2", ("subscriber",)), ("1", ()), ("3", ())]:
+        entry = context._replace(user_id=user_id, user_name=f"user{user_id}", user_badges=badges)
+        assert RaffleCommand().run(entry) is None
+    assert giveaway.run(context) == "3 entrants so far"
+    with connector.engine.connect() as conn:
+        assert conn.execute(select(connector.raffle_entries)).fetchall() == []
+
+    first = giveaway.run(context._replace(command_input="draw"))
+    second = giveaway.run(context._replace(command_input="draw"))
+    assert first.endswith("Drawn from 3 entrants (seed 7)") and first != second
+    assert giveaway.run(context._replace(command_input="close")) == (
+        "Giveaway closed with 3 entrants"
+    )
+
+    with connector.engine.connect() as conn:
+        ((raffle_id, seed, *_),) = conn.execute(select(connector.raffles)).fetchall()
+        entries = conn.execute(
+            select(
+                connector.raffle_entries.c.user_id,
+                connector.raffle_entries.c.weight,
+                connector.raffle_entries.c.won_rank,
+            ).order_by(connector.raffle_entries.c.position)
+        ).fetchall()
+    assert seed == 7
+    assert [(user_id, weight) for user_id, weight, _ in entries] == [("1", 1), ("2", 2), ("3", 1)]
+    assert sorted(rank for *_, rank in entries if rank is not None) == [1, 2]
+    # replaying the seed over the stored entrants gives the same winners
+    replay = Raffle(seed)
+    for user_id, weight, _ in entries:
+        replay.enter(user_id, "", weight)
+    assert [replay.draw(), replay.draw()] == [
+        user_id for user_id, _, rank in sorted(entries, key=lambda e: e[2] or 99)[:2]
+    ]
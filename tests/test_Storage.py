@@ -0,0 +1,262 @@
+"""Conformance suite every storage backend has to pass."""
+from datetime import date, datetime
+
+import pytest
+
+from chatbot.db import DbConnector
+from chatbot.storage import DEFAULT_COMMANDS, InMemoryDbConnector, StorageBackend
+
+
+@pytest.fixture(params=["sqlalchemy", "in_memory"])
+def storage(request, tmp_path) -> StorageBackend:
+    if request.param == "sqlalchemy":
+        return DbConnector(db_path=f"{tmp_path}/")
+    return InMemoryDbConnector()
+
+
+def test_default_commands(storage):
+    commands, aliases = storage.get_all_commands()
+    assert commands == sorted(DEFAULT_COMMANDS)
+    assert aliases == []
+    for command_name, command_response in DEFAULT_COMMANDS.items():
+        assert storage.retrive_command_response(command_name) == command_response
+
+
+def test_import_and_export_commands(storage):
+    storage.import_commands({"socials": "follow me", "today": "coding"}, {"twitter": "socials"})
+    storage.import_commands(
+        {"socials": "not me", "lurk": "enjoy the lurk"}, {"twitter": "today"}, overwrite=False
+    )
+    commands, aliases = storage.export_commands()
+    assert commands == {
+        **DEFAULT_COMMANDS,
+        "socials": "follow me",
+        "today": "coding",
+        "lurk": "enjoy the lurk",
+    }
+    assert list(commands) == sorted(commands)
+    assert aliases == {"twitter": "socials"}
+    storage.import_commands({}, {})
+    assert storage.export_commands() == (commands, aliases)
+
+
+def test_users(storage):
+    assert storage.get_user_country("1") is None
+    storage.add_new_user(user_id="1", user_name="first")
+    storage.add_new_user(user_id="1", user_name="second")
+
+    storage.update_user_country(user_id="1", user_country="france")
+    storage.update_user_emoji(user_id="1", user_emoji="pizza")
+    storage.update_user_sign(user_id="1", zodiac_sign="Taurus")
+    # updating someone that doesn't exist is a no-op
+    storage.update_user_country(user_id="2", user_country="italy")
+
+    assert storage.get_user_country("1") == "france"
+    assert storage.get_user_emoji("1") == "pizza"
+    assert storage.get_user_sign("1") == "taurus"
+    assert storage.get_user_country("2") is None
+    assert storage.get_user_sign("2") is None
+    assert storage.get_user_emoji("2") is None
+
+
+def test_commands_and_aliases(storage):
+    storage.add_new_command("discord", "join us")
+    storage.add_new_command("discord", "ignored since it already exists")
+    storage.add_command_alias("dc", "discord")
+    storage.add_command_alias("dc", "today")
+    storage.update_command("discord", "join us now")
+    storage.update_command("missing", "not created by an update")
+
+    assert storage.retrive_command_response("discord") == "join us now"
+    assert storage.retrive_command_response("missing") is None
+    assert storage.get_original_command("dc") == "discord"
+    assert storage.get_original_command("discord") is None
+    assert storage.get_all_commands() == (["bot", "discord", "source", "today"], ["dc"])
+
+    storage.remove_command("discord")
+    assert storage.retrive_command_response("discord") is None
+    # aliases are left alone when their command goes away
+    assert storage.get_original_command("dc") == "discord"
+
+
+def test_get_all_commands_when_empty(storage):
+    for command_name in DEFAULT_COMMANDS:
+        storage.remove_command(command_name)
+    assert storage.get_all_commands() == (None, None)
+
+
+def test_unknown_commands(storage):
+    assert storage.get_top_unknown_commands(limit=5) == []
+    now = datetime(2021, 8, 1)
+    storage.upsert_unknown_commands({"lurk": 2, "so2": 2}, {"lurk": {"1", "2"}}, now)
+    storage.upsert_unknown_commands({"lurk": 1, "abc": 3}, {"lurk": {"2", "3"}}, now)
+
+    assert storage.get_top_unknown_commands(limit=5) == [
+        ("lurk", 3, 3),
+        ("abc", 3, 0),
+        ("so2", 2, 0),
+    ]
+    assert storage.get_top_unknown_commands(limit=1) == [("lurk", 3, 3)]
+
+
+def test_drop_results(storage):
+    now = datetime(2021, 8, 1)
+    row = {"drops": 1, "total_score": 10.0, "best_score": 10.0, "last_dropped_at": now}
+    storage.upsert_drop_results([{"user_name": "a", **row}, {"user_name": "b", **row}])
+    storage.upsert_drop_results(
+        [
+            {
+                "user_name": "a",
+                "drops": 2,
+                "total_score": 25.0,
+                "best_score": 15.0,
+                "last_dropped_at": now,
+            }
+        ]
+    )
+
+    assert sorted(storage.get_all_drop_results()) == [("a", 2, 25.0, 15.0), ("b", 1, 10.0, 10.0)]
+
+
+def test_streams(storage):
+    assert storage.register_stream(date(2021, 8, 3)) is None
+    assert storage.register_stream(date(2021, 8, 1)) is None
+    assert storage.register_stream(date(2021, 8, 8)) == date(2021, 8, 3)
+    assert storage.register_stream(date(2021, 8, 8)) == date(2021, 8, 3)
+
+
+def test_user_activity(storage):
+    assert storage.get_user_activity("1") == (0, None, 0, None)
+    storage.add_new_user(user_id="1", user_name="first")
+    message_count, last_stream_date, stream_streak, first_chatted_at = storage.get_user_activity(
+        "1"
+    )
+    assert (message_count, last_stream_date, stream_streak) == (0, None, 0)
+    assert isinstance(first_chatted_at, datetime)
+
+    row = {"user_id": "1", "message_count": 3, "last_stream_date": date(2021, 8, 1)}
+    storage.upsert_user_activity([{**row, "stream_streak": 1}])
+    storage.upsert_user_activity([{**row, "stream_streak": 2}])
+
+    assert storage.get_user_activity("1")[:3] == (6, date(2021, 8, 1), 2)
+
+
+def test_quotes(storage):
+    assert storage.get_random_quote() is None
+    assert storage.search_quotes(["anything"]) == []
+
+    first = storage.add_quote("The frittata is burning again", added_by="a")
+    second = storage.add_quote("Chat told me to do it", added_by="b")
+    third = storage.add_quote("Is the frittata done? The FRITTATA is never done", added_by="c")
+    assert (first, second, third) == (1, 2, 3)
+
+    assert storage.get_quote(2) == (2, "Chat told me to do it")
+    assert storage.get_quote(4) is None
+    assert storage.get_random_quote() in [storage.get_quote(i) for i in (1, 2, 3)]
+
+    assert storage.search_quotes(["chat"], limit=5) == [(2, "Chat told me to do it")]
+    assert storage.search_quotes(["burning", "Frittata"], limit=5) == [
+        (1, "The frittata is burning again")
+    ]
+    assert sorted(storage.search_quotes(["frittata"], limit=5)) == [
+        (1, "The frittata is burning again"),
+        (3, "Is the frittata done? The FRITTATA is never done"),
+    ]
+    assert len(storage.search_quotes(["frittata"])) == 1
+    # chat input can't break out into fts5 query syntax
+    assert storage.search_quotes(['"frittata', "OR", "chat*"], limit=5) == []
+
+
+def test_quotes_full_text_index_follows_the_quotes_table(tmp_path):
+    connector = DbConnector(db_path=f"{tmp_path}/")
+    connector.add_quote("the frittata is burning")
+    connector.add_quote("chat is always right")
+
+    with connector.engine.begin() as conn:
+        conn.execute(
+            connector.quotes.update()
+            .where(connector.quotes.c.quote_id == 1)
+            .values(quote_text="the omelette is burning")
+        )
+        conn.execute(connector.quotes.delete().where(connector.quotes.c.quote_id == 2))
+
+    assert connector.search_quotes(["frittata"]) == []
+    assert connector.search_quotes(["omelette"]) == [(1, "the omelette is burning")]
+    assert connector.search_quotes(["chat"]) == []
+
+
+def test_quotes_search_without_full_text_index(tmp_path):
+    connector = DbConnector(db_path=f"{tmp_path}/")
+    connector.has_full_text_search = False
+    connector.add_quote("the frittata is 100% done")
+    connector.add_quote("the frittata is 1000 degrees")
+
+    assert connector.search_quotes(["FRITTATA", "100%"], limit=5) == [
+        (1, "the frittata is 100% done")
+    ]
+    # chat input is matched literally, not as LIKE wildcards
+    assert connector.search_quotes(["1_0%"], limit=5) == []
+    assert connector.search_quotes(["%"], limit=5) == [(1, "the frittata is 100% done")]
+
+
+def test_watch_time(storage):
+    assert storage.get_watch_time("viewer") == 0
+    storage.upsert_watch_time(
+        [
+            {"user_name": "viewer", "seconds": 60.5, "last_seen_at": datetime(2021, 8, 1)},
+            {"user_name": "lurker", "seconds": 30, "last_seen_at": datetime(2021, 8, 1)},
+        ]
+    )
+    storage.upsert_watch_time(
+        [{"user_name": "viewer", "seconds": 20, "last_seen_at": datetime(2021, 8, 2)}]
+    )
+    storage.upsert_watch_time([])
+    assert storage.get_watch_time("viewer") == 80.5
+    assert storage.get_watch_time("lurker") == 30
+
+
+def test_points(storage):
+    assert storage.get_points("1") == 0
+    assert storage.spend_points("1", 0) is None
+    storage.award_points(
+        [
+            {"user_id": "1", "user_name": "first", "points": 10},
+            {"user_id": "2", "user_name": "second", "points": 5},
+        ]
+    )
+    storage.award_points([{"user_id": "2", "user_name": "Second", "points": 20}])
+    storage.award_points([])
+    assert storage.get_points("2") == 25
+    assert storage.get_top_points(1) == [("Second", 25)]
+
+    assert storage.spend_points("2", 30) is None
+    assert storage.spend_points("2", 20) == 5
+    assert storage.get_points("2") == 5
+    assert storage.get_top_points(5) == [("first", 10), ("Second", 5)]
+
+
+def test_timers(storage):
+    assert storage.get_timers() == []
+    storage.upsert_timer("socials", "follow me everywhere", 15, 10)
+    storage.upsert_timer("bot", "!bot", 30, 0)
+    storage.upsert_timer("socials", "follow me on twitter", 20, 5)
+    assert storage.get_timers() == [
+        ("bot", "!bot", 30, 0),
+        ("socials", "follow me on twitter", 20, 5),
+    ]
+
+    storage.remove_timer("bot")
+    storage.remove_timer("missing")
+    assert storage.get_timers() == [("socials", "follow me on twitter", 20, 5)]
+
+
+def test_banned_terms(storage):
+    assert storage.get_banned_terms() == []
+    storage.add_banned_term("spam*", "delete", added_by="1")
+    storage.add_banned_term("badword", "timeout")
+    storage.add_banned_term("spam*", "log")
+    assert storage.get_banned_terms() == [("badword", "timeout"), ("spam*", "log")]
+
+    storage.remove_banned_term("badword")
+    storage.remove_banned_term("missing")
+    assert storage.get_banned_terms() == [("spam*", "log")]
@@ -0,0 +1,114 @@
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from chatbot.commands import TEMPLATES, CommandContext, SetTextCommand, TextCommand
+from chatbot.db import DbConnector
+from chatbot.templates import Template, TemplateCache
+from tests.conftest import Config
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+KNOWN = {"user", "touser", "count"}
+
+
+class FakeHelix:
+    def __init__(self, started_at=None) -> None:
+        self.started_at = started_at
+        self.calls = 0
+
+    def get_streams(self, user_logins):
+        self.calls += 1
+        if self.started_at is None:
+            return []
+        return [{"started_at": self.started_at.strftime("%Y-%m-%dT%H:%M:%SZ")}]
+
+
+def test_Template_resolves_only_the_variables_it_uses():
+    resolved = []
+
+    def resolve(name):
+        resolved.append(name)
+        return name.upper()
+
+    template = Template("{user} hugs {touser}, {user} is {mood} {}", KNOWN)
+    assert template.variables == {"user", "touser"}
+    assert template.render(resolve) == "USER hugs TOUSER, USER is {mood} {}"
+    assert sorted(resolved) == ["touser", "user"]
+
+    static = Template("follow me on twitter", KNOWN)
+    assert static.parts == ((False, "follow me on twitter"),)
+    assert static.render(resolve) == "follow me on twitter"
+    assert len(resolved) == 2
+
+
+def test_TemplateCache_compiles_once_per_content():
+    cache = TemplateCache(KNOWN)
+    first = cache.get("hug", "{user} hugs {touser}")
+    assert cache.get("hug", "{user} hugs {touser}") is first
+    assert cache.compiled == 1
+
+    changed = cache.get("hug", "{user} hugs {touser} again")
+    assert changed is not first and cache.compiled == 2
+    cache.invalidate("hug")
+    assert len(cache) == 0
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_TextCommand_renders_templates(datafiles, freezer):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_command("hug", "{user} hugs {touser}! Hug #{count}")
+    connector.add_new_command("live", "{channel} has been live for {uptime}")
+    helix = FakeHelix(started_at=datetime.utcnow() - timedelta(hours=1, minutes=2, seconds=3))
+    context = CommandContext(
+        connector, Config(), command_name="hug", user_name="User1", services={"helix": helix}
+    )
+
+    assert TextCommand().run(context) == "User1 hugs User1! Hug #1"
+    assert TextCommand().run(context._replace(command_input="@User2 ")) == (
+        "User1 hugs User2! Hug #2"
+    )
+    # {uptime} is only looked up by the commands that use it
+    assert helix.calls == 0
+    assert TextCommand().run(context._replace(command_name="live")) == (
+        "datafrittata has been live for 1 hours, 2 minutes and 3 seconds"
+    )
+    assert helix.calls == 1
+
+    compiled = TEMPLATES.compiled
+    SetTextCommand().run(context._replace(command_input="hug {user} hugs chat"))
+    assert TextCommand().run(context) == "User1 hugs chat"
+    assert TextCommand().run(context) == "User1 hugs chat"
+    assert TEMPLATES.compiled == compiled + 1
+    # the count lives on in its own table
+    connector.update_command("hug", "{count}")
+    assert TextCommand().run(context) == "3"
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_TextCommand_template_variables_fail_safe(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    connector.add_new_command("hug", "{user} hugs {touser}! Hug #{count}")
+    context = CommandContext(connector, Config(), command_name="hug", user_name="User1")
+
+    # chat can't make the bot type a chat command
+    assert TextCommand().run(context._replace(command_input="/ban User2")) == (
+        "User1 hugs ban! Hug #1"
+    )
+    assert TextCommand().run(context._replace(command_input=".timeout")) == (
+        "User1 hugs timeout! Hug #2"
+    )
+    connector.command_counts.drop(connector.engine)
+    assert TextCommand().run(context) == "User1 hugs User1! Hug #?"
+
+    # no channel configured, nothing to ask twitch about
+    connector.add_new_command("live", "live for {uptime}")
+    config = Config()
+    config.channel = None
+    helix = FakeHelix()
+    live = context._replace(command_name="live", config=config, services={"helix": helix})
+    assert TextCommand().run(live) == "live for offline"
+    assert helix.calls == 0
@@ -0,0 +1,109 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from chatbot.bot import Bot
+from chatbot.commands import CommandContext, ListUnknownCommandsCommand, TextCommand
+from chatbot.db import DbConnector
+from chatbot.irc_mock import FakeTwitchIRC, run_bot
+from chatbot.storage import InMemoryDbConnector
+from chatbot.unknown_commands import UnknownCommandsTracker
+from tests.conftest import Config
+from tests.test_IrcMock import LocalConfig
+
+FIXTURE_DIR = Path(__file__).resolve().parents[1].joinpath("../db/test/")
+os.makedirs(FIXTURE_DIR, exist_ok=True)
+
+
+CONFIG = Config()
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_UnknownCommandsTracker_aggregates_between_flushes(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = UnknownCommandsTracker(connector)
+
+    for user_id in ["1", "2", "1"]:
+        tracker.record("lurk", user_id)
+    tracker.record("discord", "3")
+
+    # nothing hits the db before a flush
+    assert connector.get_top_unknown_commands(limit=5) == []
+
+    tracker.flush()
+    tracker.record("lurk", "3")
+    tracker.record("lurk", "1")
+    tracker.flush()
+
+    assert connector.get_top_unknown_commands(limit=5) == [("lurk", 5, 3), ("discord", 1, 1)]
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_UnknownCommandsTracker_is_bounded(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = UnknownCommandsTracker(connector, max_tracked=2)
+
+    for command_name in ["one", "two", "three", "one"]:
+        tracker.record(command_name, "1")
+
+    assert dict(tracker.attempts) == {"one": 2, "two": 1}
+    assert tracker.dropped == 1
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_TextCommand_records_unknown_command(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = UnknownCommandsTracker(connector)
+
+    services = {"unknown_commands": tracker}
+    for command_name in ["doesnotexist", "bot"]:
+        TextCommand().run(
+            CommandContext(
+                connector, CONFIG, command_name=command_name, user_id="1", services=services
+            )
+        )
+
+    assert dict(tracker.attempts) == {"doesnotexist": 1}
+
+
+@pytest.mark.datafiles(FIXTURE_DIR)
+def test_ListUnknownCommandsCommand(datafiles):
+    connector = DbConnector(db_path=datafiles)
+    tracker = UnknownCommandsTracker(connector)
+    context = CommandContext(
+        connector, CONFIG, command_input="2", services={"unknown_commands": tracker}
+    )
+    cmd = ListUnknownCommandsCommand()
+    assert cmd.is_restricted is True
+    assert cmd.run(context) == "Nobody tried a command the bot doesn't know yet"
+
+    for command_name, user_id in [("lurk", "1"), ("lurk", "2"), ("discord", "1"), ("so2", "1")]:
+        tracker.record(command_name, user_id)
+    tracker.record("discord", "1")
+
+    assert cmd.run(context) == (
+        "Most requested missing commands: !lurk (2x by 2 users), !discord (2x by 1 users)"
+    )
+    assert cmd.run(context._replace(command_input="²")) == (
+        "Most requested missing commands: !lurk (2x by 2 users), !discord (2x by 1 users), "
+        "!so2 (1x by 1 users)"
+    )
+
+
+def test_Bot_keeps_running_when_a_scheduled_flush_fails(tmp_path):
+    runs = []
+
+    def failing_flush():
+        runs.append(1)
+        raise RuntimeError("database is locked")
+
+    with FakeTwitchIRC() as server:
+        bot = Bot(LocalConfig(server, tmp_path), InMemoryDbConnector())
+        bot.schedule_flush(1, failing_flush)
+        try:
+            assert run_bot(bot, lambda: len(runs) == 2, timeout=5)
+            bot.flush()
+        finally:
+            bot.disconnect()
+    assert len(runs) == 3